@@ -21,6 +21,7 @@ from django.urls import reverse
 from django.db import models
 from django.db import transaction
 from django.db.models import Q
+from django.db.models.query import ModelIterable
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
@@ -895,7 +896,62 @@ activity_choices = [
     VideoMovedToTeam, VideoMovedFromTeam, TeamSettingsChanged, SubtitleLanguageChanged,
 ]
 
+def prefetch_related_objects(records):
+    """Fetch the related objects for a list of ActivityRecords
+
+    Records are grouped by the related_model of their type and each model is
+    loaded with a single in_bulk() query.  The results are stored so that
+    ActivityRecord.get_related_obj() doesn't need to query the DB.
+    ActivityQuerySet.with_related_objects() calls this when the queryset
+    fetches its results.
+    """
+    records_by_model = {}
+    for record in records:
+        if hasattr(record, '_related_obj_cache'):
+            continue
+        ModelClass = record.type_obj.related_model
+        if ModelClass is None or record.related_obj_id is None:
+            # No query needed, this either returns None or something like
+            # the MemberJoined role.
+            record._related_obj_cache = record.type_obj.get_related_obj(
+                record.related_obj_id)
+        else:
+            records_by_model.setdefault(ModelClass, []).append(record)
+
+    for ModelClass, model_records in records_by_model.items():
+        related_objs = (ModelClass.objects.all().select_related()
+                        .in_bulk(set(r.related_obj_id for r in model_records)))
+        for record in model_records:
+            related_obj = related_objs.get(record.related_obj_id)
+            if related_obj is None:
+                logger.warn("Missing related object for activity record: "
+                            "{}".format(record.related_obj_id))
+            record._related_obj_cache = related_obj
+
 class ActivityQuerySet(query.QuerySet):
+    _with_related_objects = False
+
+    def with_related_objects(self):
+        """Fetch the related objects for the records in bulk
+
+        Use this for querysets that display a list of records.
+        """
+        qs = self._clone()
+        qs._with_related_objects = True
+        return qs
+
+    def _clone(self, **kwargs):
+        clone = super(ActivityQuerySet, self)._clone(**kwargs)
+        clone._with_related_objects = self._with_related_objects
+        return clone
+
+    def _fetch_all(self):
+        fetching = self._result_cache is None
+        super(ActivityQuerySet, self)._fetch_all()
+        if (fetching and self._with_related_objects and
+                self._iterable_class is ModelIterable):
+            prefetch_related_objects(self._result_cache)
+
     def original(self):
         # For some reason, using copied_from__isnull=True results in an extra
         # join.  So we need a custom WHERE clause
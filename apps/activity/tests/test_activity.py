@@ -415,3 +415,45 @@ class TestViewableByUser(TestCase):
             self.video,
             self.public_team_video,
         ])
+
+class PrefetchRelatedObjectsTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        self.comments = [
+            Comment.objects.create(content_object=self.video,
+                                   user=UserFactory(), content='Foo')
+            for i in range(3)
+        ]
+        for i in range(3):
+            url = VideoURLFactory(video=self.video)
+            videos.signals.video_url_added.send(sender=url, video=self.video,
+                                                new_video=False)
+        TeamMemberFactory(role=ROLE_MANAGER)
+
+    def test_prefetch(self):
+        # Fetching the records should use 1 query for the records, plus 1
+        # query for each related model.
+        with self.assertNumQueries(3):
+            records = list(ActivityRecord.objects.all()
+                           .with_related_objects())
+        with self.assertNumQueries(0):
+            related_objs = [r.get_related_obj() for r in records]
+        assert_items_equal(
+            [obj for obj in related_objs if isinstance(obj, Comment)],
+            self.comments)
+        assert_true(ROLE_MANAGER in related_objs)
+
+    def test_missing_related_obj(self):
+        Comment.objects.filter(pk=self.comments[0].pk).delete()
+        record = (ActivityRecord.objects
+                  .filter(type='comment-added',
+                          related_obj_id=self.comments[0].pk)
+                  .with_related_objects()[0])
+        assert_equal(record.get_related_obj(), None)
+
+    def test_opt_in(self):
+        # Querysets only prefetch if with_related_objects() was called
+        with self.assertNumQueries(1):
+            ActivityRecord.objects.filter(type='comment-added').first()
+        qs = ActivityRecord.objects.with_related_objects()
+        assert_true(qs.filter(type='comment-added')._with_related_objects)
@@ -19,8 +19,8 @@ from __future__ import absolute_import
 
 from rest_framework import authentication
 from rest_framework import exceptions
-from auth.models import AmaraApiKey
-from auth.models import CustomUser as User
+from auth import apikeycache
+from utils import metrics
 
 class TokenAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
@@ -33,15 +33,10 @@ class TokenAuthentication(authentication.BaseAuthentication):
         if not username:
             return None
 
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
-            raise exceptions.AuthenticationFailed('No such user')
-
-        if not user.is_active:
-            raise exceptions.AuthenticationFailed('User disabled')
-
-        if not AmaraApiKey.objects.filter(user=user, key=api_key).exists():
-            raise exceptions.AuthenticationFailed('Invalid API Key')
+        with metrics.timer('api.auth.latency'):
+            try:
+                user = apikeycache.check_credentials(username, api_key)
+            except apikeycache.InvalidCredentials as e:
+                raise exceptions.AuthenticationFailed(str(e))
 
         return (user, None)
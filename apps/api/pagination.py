@@ -17,21 +17,131 @@
 
 """Implement pagination.
 
-This module has a bunch of code to overrides the default paginate_queryset()
-method to use offset/limit based pagination instead of page based pagination.
+AmaraPagination uses offset/limit based pagination by default.
 
-This will get much simpler  once we switch to django-rest-framework 3.1 which
-has built-in support for this.
+Views that set ``cursor_pagination = True`` also support keyset (cursor)
+pagination.  Clients opt-in by passing the ``cursor`` query param (empty for
+the first page), then follow the ``next`` links, which contain an opaque
+cursor.  Rather than using OFFSET, each page filters on the
+(ordering field, id) values of the last item of the previous page, so deep
+pages are as fast as the first one.  We also skip the COUNT(*) query unless
+the client passes ``total_count=true``.
 """
 
+import base64
 from collections import OrderedDict
+import json
 
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.utils.translation import ugettext as _
 from rest_framework import pagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class AmaraPagination(pagination.LimitOffsetPagination):
     default_limit = 20
     max_limit = 100
+    cursor_query_param = 'cursor'
+    total_count_query_param = 'total_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = (
+            self.cursor_query_param in request.query_params and
+            getattr(view, 'cursor_pagination', False) and
+            queryset.query.can_filter())
+        if not self.cursor_mode:
+            return super(AmaraPagination, self).paginate_queryset(
+                queryset, request, view)
+        return self.paginate_queryset_by_cursor(queryset, request)
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = None
+        field, descending = self.get_cursor_ordering(queryset)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            queryset = self.filter_after_cursor(queryset, field, descending,
+                                                cursor)
+        if request.query_params.get(self.total_count_query_param) == 'true':
+            self.count = queryset.count()
+        else:
+            self.count = None
+
+        prefix = '-' if descending else ''
+        ordering = [prefix + field.name]
+        if field.name != queryset.model._meta.pk.name:
+            ordering.append(prefix + 'pk')
+        results = list(queryset.order_by(*ordering)[:self.limit + 1])
+        if len(results) > self.limit:
+            results = results[:self.limit]
+            self.next_cursor = self.encode_cursor(field, results[-1])
+        else:
+            self.next_cursor = None
+        return results
+
+    def get_cursor_ordering(self, queryset):
+        """Get the field to use for cursor pagination
+
+        We use the first field in the queryset ordering.  It must be a
+        non-null field on the model itself, since we need to filter on it.
+
+        Returns:
+            (field, descending) tuple
+        """
+        opts = queryset.model._meta
+        ordering = queryset.query.order_by or opts.ordering
+        if not ordering:
+            return opts.pk, True
+        name = ordering[0]
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        if name == 'pk':
+            return opts.pk, descending
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+        if (field is None or not field.concrete or field.is_relation or
+                field.null):
+            raise ValidationError(_(
+                'Cursor pagination is not supported for this ordering'))
+        return field, descending
+
+    def encode_cursor(self, field, obj):
+        data = [field.value_to_string(obj), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(data))
+
+    def filter_after_cursor(self, queryset, field, descending, cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(str(cursor)))
+            value = field.to_python(value)
+        except (ValueError, TypeError):
+            raise ValidationError(_('Invalid cursor'))
+        lookup = 'lt' if descending else 'gt'
+        if field.primary_key:
+            return queryset.filter(**{'pk__' + lookup: pk})
+        return queryset.filter(
+            Q(**{field.name + '__' + lookup: value}) |
+            Q(**{field.name: value, 'pk__' + lookup: pk}))
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super(AmaraPagination, self).get_next_link()
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(),
+                                 self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.next_cursor)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super(AmaraPagination, self).get_previous_link()
+        # Cursors only go forward
+        return None
 
     def get_paginated_response(self, data):
         return Response(OrderedDict([
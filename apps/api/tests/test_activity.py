@@ -121,6 +121,42 @@ class ActivityTest(TestCase):
             record3, record2, record1)
         self.check_list(url + '?user=test-user&language=fr', record3)
 
+    def test_cursor_pagination(self):
+        video = VideoFactory(user=self.user)
+        self.clear_records()
+        records = [ActivityRecord.objects.create_for_video_added(video)
+                   for i in range(5)]
+        # Make 2 records have the same date to test that we use the id to
+        # break ties
+        ActivityRecord.objects.filter(pk=records[3].pk).update(
+            created=records[2].created)
+        url = reverse('api:video-activity', args=(video.video_id,))
+
+        response = self.client.get(url + '?limit=2&cursor=')
+        assert_equal(response.status_code, status.HTTP_200_OK)
+        assert_equal(response.data['meta']['total_count'], None)
+        assert_equal(response.data['meta']['previous'], None)
+        pages = []
+        while True:
+            assert_equal(response.status_code, status.HTTP_200_OK)
+            pages.append([d['date'] for d in response.data['objects']])
+            next_url = response.data['meta']['next']
+            if next_url is None:
+                break
+            assert_false('offset=' in next_url)
+            response = self.client.get(next_url)
+        assert_equal(map(len, pages), [2, 2, 1])
+        seen = sum(pages, [])
+        assert_equal(seen, [
+            format_datetime_field(r.created)
+            for r in ActivityRecord.objects.filter(video=video)
+        ])
+
+        response = self.client.get(url + '?cursor=&total_count=true')
+        assert_equal(response.data['meta']['total_count'], 5)
+        response = self.client.get(url + '?cursor=bad-cursor')
+        assert_equal(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_user(self):
         video1 = VideoFactory(user=self.user, video_id='video1',
                               primary_audio_language_code='fr')
@@ -23,6 +23,9 @@ from nose.tools import *
 from rest_framework.exceptions import AuthenticationFailed
 
 from api.auth import TokenAuthentication
+from auth.models import CustomUser as User
+from auth import apikeycache
+from caching import lru
 from utils.factories import *
 
 class TestAPIAuth(TestCase):
@@ -49,3 +52,68 @@ class TestAPIAuth(TestCase):
     def test_no_token(self):
         request = self.make_request(None, None)
         assert_equal(self.auth.authenticate(request), None)
+
+class APICredentialsCacheTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.api_key = self.user.get_api_key()
+        self.auth = TokenAuthentication()
+
+    def authenticate(self, api_key=None):
+        request = HttpRequest()
+        request.META['HTTP_X_API_USERNAME'] = self.user.username
+        request.META['HTTP_X_API_KEY'] = api_key or self.api_key
+        return self.auth.authenticate(request)
+
+    def check_stats(self, **counts):
+        stats = apikeycache.get_stats()
+        for name, value in counts.items():
+            assert_equal(stats.get(name.replace('_', '-'), 0), value)
+
+    def test_local_hit(self):
+        assert_equal(self.authenticate(), (self.user, None))
+        assert_equal(self.authenticate(), (self.user, None))
+        self.check_stats(miss=1, local_hit=1, shared_hit=0)
+
+    def test_shared_hit(self):
+        assert_equal(self.authenticate(), (self.user, None))
+        # simulate a different process by clearing the local cache
+        lru.clear_all()
+        assert_equal(self.authenticate(), (self.user, None))
+        self.check_stats(miss=1, local_hit=0, shared_hit=1)
+
+    def test_failures_not_cached(self):
+        for i in range(2):
+            with assert_raises(AuthenticationFailed):
+                self.authenticate('bad-key')
+        self.check_stats(miss=2, local_hit=0, shared_hit=0)
+
+    def test_new_key_invalidates(self):
+        self.authenticate()
+        self.user.api_key.generate_new_key()
+        with assert_raises(AuthenticationFailed):
+            self.authenticate()
+        assert_equal(self.authenticate(self.user.api_key.key),
+                     (self.user, None))
+
+    def test_deactivate_invalidates(self):
+        self.authenticate()
+        self.user.de_activate()
+        with assert_raises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_update_deactivate(self):
+        # Deactivating with update() skips the post_save handler, but we
+        # should still notice the change.
+        self.authenticate()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with assert_raises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_user_is_fresh(self):
+        # The user we return must reflect the current DB data, since it can
+        # get saved.
+        self.authenticate()
+        User.objects.filter(pk=self.user.pk).update(first_name='New name')
+        user, auth = self.authenticate()
+        assert_equal(user.first_name, 'New name')
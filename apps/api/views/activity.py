@@ -331,6 +331,7 @@ class ActivityFilterBackend(filters.BaseFilterBackend):
 
 class VideoActivityView(generics.ListAPIView):
     serializer_class = ActivitySerializer
+    cursor_pagination = True
     filter_backends = (ActivityFilterBackend,)
     enabled_filters = ['type', 'user', 'language', 'before', 'after']
 
@@ -339,10 +340,11 @@ class VideoActivityView(generics.ListAPIView):
         if not videos.permissions.can_view_activity(video, self.request.user):
             # Raise 404 so we don't give away the fact the video exists
             raise Http404()
-        return ActivityRecord.objects.for_video(video)
+        return ActivityRecord.objects.for_video(video).with_related_objects()
 
 class TeamActivityView(generics.ListAPIView):
     serializer_class = ActivitySerializer
+    cursor_pagination = True
     filter_backends = (ActivityFilterBackend,)
     enabled_filters = ['video', 'video_language', 'type', 'user',
                        'language', 'before', 'after']
@@ -355,10 +357,11 @@ class TeamActivityView(generics.ListAPIView):
                 raise Http404()
             else:
                 raise PermissionDenied()
-        return ActivityRecord.objects.for_team(team)
+        return ActivityRecord.objects.for_team(team).with_related_objects()
 
 class UserActivityView(generics.ListAPIView):
     serializer_class = ActivitySerializer
+    cursor_pagination = True
     filter_backends = (ActivityFilterBackend,)
     enabled_filters = ['video', 'team', 'video_language', 'type', 
                        'language', 'before', 'after']
@@ -372,7 +375,7 @@ class UserActivityView(generics.ListAPIView):
             raise Http404()
         if not user.is_active:
             raise Http404()
-        return ActivityRecord.objects.for_user(user)
+        return ActivityRecord.objects.for_user(user).with_related_objects()
 
 class LegacyActivitySerializer(serializers.ModelSerializer):
     type = serializers.IntegerField(source='type_code')
@@ -429,6 +432,7 @@ class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
     lookup_field = 'id'
     serializer_class = LegacyActivitySerializer
     paginate_by = 20
+    cursor_pagination = True
 
     def get_queryset(self):
         params = self.request.query_params
@@ -456,7 +460,8 @@ class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
             qs = video.activity.original()
         else:
             qs = ActivityRecord.objects.for_api_user(self.request.user)
-        return qs.select_related('video', 'user', 'team')
+        return (qs.select_related('video', 'user', 'team')
+                .with_related_objects())
 
     def filter_queryset(self, queryset):
         params = self.request.query_params
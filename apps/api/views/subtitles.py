@@ -292,6 +292,7 @@ import logging
 from django.db import IntegrityError
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from django.utils.translation import ugettext_lazy as _
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics
@@ -566,9 +567,11 @@ class SubtitleLanguageViewSet(mixins.CreateModelMixin,
         }
 
 class SubtitleRenderer(renderers.BaseRenderer):
-    """Render SubtitleSets using babelsubs."""
+    """Render SubtitleVersions and SubtitleSets using babelsubs."""
     def render(self, data, media_type=None, renderer_context=None):
-        if isinstance(data, SubtitleSet):
+        if isinstance(data, SubtitleVersion):
+            return data.get_rendered_subtitles(self.format)
+        elif isinstance(data, SubtitleSet):
             return babelsubs.to(data, self.format)
         else:
             # Fall back to JSON renderer for other responses.  This handles
@@ -608,8 +611,8 @@ class SubtitlesField(serializers.CharField):
         super(SubtitlesField, self).__init__(*args, **kwargs)
 
     def get_attribute(self, version):
-        return babelsubs.to(version.get_subtitles(),
-                            self.context['sub_format'])
+        return version.get_rendered_subtitles(
+            self.context['sub_format']).decode('utf-8')
 
     def to_representation(self, value):
         if self.context['sub_format'] == 'json':
@@ -852,10 +855,15 @@ class SubtitlesView(generics.CreateAPIView):
         # If we're rendering the subtitles directly, then we skip creating a
         # serializer and return the subtitles instead
         if isinstance(request.accepted_renderer, SubtitleRenderer):
-            if user_can_access_subtitles_format(request.user, request.accepted_renderer.format):
-                return Response(version.get_subtitles())
-            else:
+            format = request.accepted_renderer.format
+            if not user_can_access_subtitles_format(request.user, format):
                 raise PermissionDenied()
+            etag = version.rendered_subtitles_etag(format)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = Response(version)
+            response['ETag'] = etag
+            return response
         serializer = self.get_serializer(version)
         if user_can_access_subtitles_format(request.user, serializer.context['sub_format']):
             return Response(serializer.data)
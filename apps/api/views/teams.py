@@ -737,6 +737,7 @@ class TeamMemberViewSet(TeamSubview):
     lookup_field = 'identifier'
     lookup_value_regex = r'[^/]+'
     paginate_by = 20
+    cursor_pagination = True
 
     def get_serializer_class(self):
         if 'identifier' in self.kwargs:
@@ -585,6 +585,7 @@ class VideoViewSet(mixins.CreateModelMixin,
     serializer_class = VideoSerializer
     queryset = Video.objects.all()
     paginate_by = 20
+    cursor_pagination = True
 
     lookup_field = 'video_id'
     lookup_value_regex = r'(\w|-)+'
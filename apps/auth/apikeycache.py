@@ -0,0 +1,140 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+auth.apikeycache -- Cache verified API credentials
+
+API clients send their username and API key with every request.  Checking
+them means looking up the user by username, then checking the API key.  We
+cache the user id for successful checks, so that later requests only need to
+load the user by primary key:
+
+  - The shared cache stores the user id for API_AUTH_CACHE_TIMEOUT seconds,
+    keyed by a hash of the username and API key.
+  - A small process-local cache stores the same data for
+    API_AUTH_LOCAL_CACHE_TIMEOUT seconds, which should be short since we
+    can't invalidate it from other processes.
+
+We don't cache the user itself.  The user we return becomes request.user,
+which can get saved, so it needs to be fresh from the DB.  Loading it also
+lets us re-check is_active and the username, which catches changes made with
+queryset.update() that skip our invalidation.
+
+Only valid credentials are cached.  Since a user has a single API key, there
+is at most 1 entry per user.  We store the entry key for each user so that
+invalidate_user() can delete it when the API key changes or the user is
+deactivated, even if the username has changed since.
+"""
+
+from __future__ import absolute_import
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from caching.lru import LRUCache
+from utils import metrics
+
+METRIC_PREFIX = 'api.auth-cache.'
+
+_local_cache = LRUCache(settings.API_AUTH_LRU_SIZE)
+
+class InvalidCredentials(Exception):
+    pass
+
+def _credentials_key(username, api_key):
+    digest = hashlib.sha1(u'{}\0{}'.format(username, api_key)
+                          .encode('utf-8')).hexdigest()
+    return 'api-auth:{}'.format(digest)
+
+def _user_key(user_id):
+    return 'api-auth-user:{}'.format(user_id)
+
+def check_credentials(username, api_key):
+    """Get the user for an API username and key
+
+    Returns:
+        CustomUser object
+    Raises:
+        InvalidCredentials: the username/API key is not valid.  The
+            exception message says why.
+    """
+    key = _credentials_key(username, api_key)
+    local_value = _local_cache.get(key)
+    if local_value is not None:
+        expires, user_id = local_value
+        if expires > time.time():
+            metrics.increment(METRIC_PREFIX + 'local-hit')
+            return _load_user(key, user_id, username)
+        _local_cache.delete(key)
+
+    user_id = cache.get(key)
+    if user_id is not None:
+        metrics.increment(METRIC_PREFIX + 'shared-hit')
+        user = _load_user(key, user_id, username)
+    else:
+        metrics.increment(METRIC_PREFIX + 'miss')
+        user = _check_credentials_in_db(username, api_key)
+        cache.set_many({
+            key: user.id,
+            _user_key(user.id): key,
+        }, settings.API_AUTH_CACHE_TIMEOUT)
+    _local_cache.set(key, (time.time() + settings.API_AUTH_LOCAL_CACHE_TIMEOUT,
+                           user.id))
+    return user
+
+def _load_user(key, user_id, username):
+    from auth.models import CustomUser as User
+    try:
+        user = User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        user = None
+    if user is None or user.username != username:
+        error = 'No such user'
+    elif not user.is_active:
+        error = 'User disabled'
+    else:
+        return user
+    _local_cache.delete(key)
+    invalidate_user(user_id)
+    raise InvalidCredentials(error)
+
+def _check_credentials_in_db(username, api_key):
+    from auth.models import AmaraApiKey, CustomUser as User
+    try:
+        user = User.objects.get(username=username)
+    except User.DoesNotExist:
+        raise InvalidCredentials('No such user')
+    if not user.is_active:
+        raise InvalidCredentials('User disabled')
+    if not AmaraApiKey.objects.filter(user=user, key=api_key).exists():
+        raise InvalidCredentials('Invalid API Key')
+    return user
+
+def invalidate_user(user_id):
+    """Remove the cached credentials for a user."""
+    user_key = _user_key(user_id)
+    credentials_key = cache.get(user_key)
+    if credentials_key is not None:
+        cache.delete_many([credentials_key, user_key])
+        _local_cache.delete(credentials_key)
+
+def get_stats():
+    """Get the hit/miss counts for check_credentials() in this process."""
+    return metrics.get_counts(METRIC_PREFIX)
@@ -37,11 +37,12 @@ from django.db import IntegrityError
 from django.db import models
 from django.db import transaction
 from django.db.models import Max
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.utils.http import urlquote
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _, ugettext
 
+from auth import apikeycache
 from auth import signals
 from auth.validators import PasswordStrengthValidator
 from caching import CacheGroup, ModelCacheManager
@@ -1000,6 +1001,18 @@ class AmaraApiKey(models.Model):
             self.save()
         return self.key
 
+def invalidate_api_credentials(sender, instance, **kwargs):
+    # Invalidate the cached credentials when the API key changes, or when
+    # the user changes (for example when they get deactivated or renamed).
+    if sender is AmaraApiKey:
+        apikeycache.invalidate_user(instance.user_id)
+    else:
+        apikeycache.invalidate_user(instance.id)
+
+post_save.connect(invalidate_api_credentials, CustomUser)
+post_save.connect(invalidate_api_credentials, AmaraApiKey)
+post_delete.connect(invalidate_api_credentials, AmaraApiKey)
+
 class SentMessageDateManager(models.Manager):
     def sent_message(self, user):
         self.create(user=user, created=dates.now())
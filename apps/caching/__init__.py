@@ -7,4 +7,5 @@ Amara uses a couple tricks for caching things.
 from __future__ import absolute_import
 
 from .cachegroup import CacheGroup, ModelCacheManager
+from .lru import LRUCache
 from .utils import *
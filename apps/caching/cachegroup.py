@@ -86,6 +86,24 @@ CacheGroup we will do a couple things:
 
 This speeds things up by reducing the number of round trips to the cache.
 
+The keys for each pattern are shared between processes using a redis sorted
+set that maps each key to the last time it was used.  Each process keeps a
+local copy and syncs it every CACHE_PATTERN_SYNC_INTERVAL seconds, sending
+the keys that it used since the last sync.  Keys that no process has used
+for CACHE_PATTERN_KEY_MAX_AGE seconds are dropped, so that we stop
+prefetching keys for code that's been removed or changed.
+
+For each pattern, we count these metrics (see
+:func:`get_cache_pattern_stats`):
+
+- prefetched: keys fetched because the pattern remembered them
+- used: prefetched keys that were actually requested
+- round-trips-saved: get()/get_many() calls that we could answer using the
+  prefetched values
+
+The counts are added to a redis hash next to the key set when a process
+syncs, so they cover all processes.
+
 Behind the scenes
 ^^^^^^^^^^^^^^^^^
 
@@ -161,13 +179,17 @@ attribute to your class definition.
 """
 from __future__ import absolute_import
 import collections
+import time
 
 from django.conf import settings
 from django.core.cache import cache
+from django_redis import get_redis_connection
 
-from utils import codes
+from utils import codes, metrics
 from caching.utils import get_or_calc, get_or_calc_many
 
+CACHE_PATTERN_METRIC = 'caching.cache-pattern.'
+
 def get_commit_id():
     return settings.LAST_COMMIT_GUID
 
@@ -194,13 +216,19 @@ class _CacheWrapper(object):
             self._run_get_many(unfetched_keys)
         return dict((key, self._cache_data.get(key)) for key in keys)
 
+    def has_fetched(self, key):
+        return key in self._cache_data
+
     def _run_get_many(self, keys):
         result = cache.get_many([self._prefix_key(key) for key in keys])
         for key in keys:
             self._cache_data[key] = result.get(self._prefix_key(key))
 
     def set(self, key, value, timeout=None):
-        cache.set(self._prefix_key(key), value)
+        if timeout is None:
+            cache.set(self._prefix_key(key), value)
+        else:
+            cache.set(self._prefix_key(key), value, timeout)
         self._cache_data[key] = value
 
     def set_many(self, values, timeout=None):
@@ -214,6 +242,103 @@ class _CacheWrapper(object):
 
 # map cache pattern IDs to the keys we've seen used
 _cache_pattern_memory = collections.defaultdict(set)
+# map cache pattern IDs to keys used since we last synced with redis
+_cache_pattern_pending = collections.defaultdict(set)
+# map cache pattern IDs to the last time we synced with redis
+_cache_pattern_sync_times = {}
+# map cache pattern IDs to stat counts since we last synced with redis
+_cache_pattern_pending_stats = collections.defaultdict(collections.Counter)
+
+# set of all cache pattern IDs that we've stored in redis
+CACHE_PATTERNS_KEY = 'cache-patterns'
+
+def _cache_pattern_redis_key(cache_pattern):
+    return 'cache-pattern:{}'.format(cache_pattern)
+
+def _cache_pattern_stats_redis_key(cache_pattern):
+    return 'cache-pattern:{}:stats'.format(cache_pattern)
+
+def _get_cache_pattern_keys(cache_pattern):
+    """Get the keys to prefetch for a cache pattern
+
+    This syncs with redis if we haven't done so recently.
+    """
+    last_sync = _cache_pattern_sync_times.get(cache_pattern)
+    if (last_sync is None or
+            time.time() - last_sync > settings.CACHE_PATTERN_SYNC_INTERVAL):
+        _sync_cache_pattern(cache_pattern, last_sync is None)
+    return set(_cache_pattern_memory[cache_pattern])
+
+def _remember_cache_pattern_keys(cache_pattern, keys):
+    _cache_pattern_memory[cache_pattern].update(keys)
+    _cache_pattern_pending[cache_pattern].update(keys)
+
+def _sync_cache_pattern(cache_pattern, first_sync):
+    """Send the keys we've used and our stats to redis and fetch the shared
+    key set"""
+    now = time.time()
+    redis_key = _cache_pattern_redis_key(cache_pattern)
+    stats_key = _cache_pattern_stats_redis_key(cache_pattern)
+    used_keys = _cache_pattern_pending.pop(cache_pattern, set())
+    stats = _cache_pattern_pending_stats.pop(cache_pattern, {})
+    if first_sync:
+        # Keys that we knew about before syncing also count as used
+        used_keys.update(_cache_pattern_memory[cache_pattern])
+    max_age = settings.CACHE_PATTERN_KEY_MAX_AGE
+    pipe = get_redis_connection('default').pipeline()
+    if used_keys:
+        zadd_args = []
+        for key in used_keys:
+            zadd_args.extend([now, key])
+        pipe.zadd(redis_key, *zadd_args)
+    pipe.zremrangebyscore(redis_key, 0, now - max_age)
+    pipe.expire(redis_key, max_age)
+    for name, count in stats.items():
+        pipe.hincrby(stats_key, name, count)
+    pipe.expire(stats_key, max_age)
+    pipe.sadd(CACHE_PATTERNS_KEY, cache_pattern)
+    pipe.zrange(redis_key, 0, -1)
+    shared_keys = pipe.execute()[-1]
+    _cache_pattern_memory[cache_pattern] = set(shared_keys)
+    _cache_pattern_sync_times[cache_pattern] = now
+
+def clear_cache_pattern_memory():
+    """Clear the process-local cache pattern data (used by the unittests)"""
+    _cache_pattern_memory.clear()
+    _cache_pattern_pending.clear()
+    _cache_pattern_sync_times.clear()
+    _cache_pattern_pending_stats.clear()
+
+def get_cache_pattern_stats():
+    """Get info on the cache patterns
+
+    Returns:
+        list of dicts, one for each cache pattern, with these keys:
+            - name: cache pattern ID
+            - keys: list of (key, seconds since last use) tuples from the
+              shared key set
+            - stats: dict of counts (prefetched, used, round-trips-saved)
+              summed over all processes.  Each process adds its counts
+              when it syncs with redis, so they can lag by up to
+              CACHE_PATTERN_SYNC_INTERVAL, except for this process's
+              counts, which are always included.
+    """
+    redis = get_redis_connection('default')
+    now = time.time()
+    rv = []
+    for cache_pattern in sorted(redis.smembers(CACHE_PATTERNS_KEY)):
+        keys = redis.zrange(_cache_pattern_redis_key(cache_pattern), 0, -1,
+                            withscores=True)
+        stats = collections.Counter(dict(
+            (name, int(count)) for name, count in redis.hgetall(
+                _cache_pattern_stats_redis_key(cache_pattern)).items()))
+        stats.update(_cache_pattern_pending_stats.get(cache_pattern, {}))
+        rv.append({
+            'name': cache_pattern,
+            'keys': [(key, int(now - last_used)) for key, last_used in keys],
+            'stats': dict(stats),
+        })
+    return rv
 
 class CacheGroup(object):
     """Manage a group of cached values
@@ -222,6 +347,7 @@ class CacheGroup(object):
         prefix(str): prefix keys with this
         cache_pattern(str): :ref:`cache pattern <cache-patterns>` identifier
         invalidate_on_deploy(bool): Invalidate values when we redeploy
+        timeout(int): Default timeout for the values and the version key
 
     .. automethod:: get
     .. automethod:: get_many
@@ -235,17 +361,20 @@ class CacheGroup(object):
 
     """
 
-    def __init__(self, prefix, cache_pattern=None, invalidate_on_deploy=True):
+    def __init__(self, prefix, cache_pattern=None, invalidate_on_deploy=True,
+                 timeout=None):
         self.prefix = prefix
+        self.timeout = timeout
         self.cache_wrapper = _CacheWrapper(prefix)
         if cache_pattern:
             # copy the values from _cache_pattern_memory now.  It's going to
             # change as we fetch keys and for sanity sake we should not care
             # about that
-            self._cache_pattern_keys = \
-                    set(_cache_pattern_memory[cache_pattern])
+            self._cache_pattern_keys = _get_cache_pattern_keys(cache_pattern)
         else:
             self._cache_pattern_keys = None
+        # prefetched keys that haven't been requested yet
+        self._unused_prefetched_keys = set()
         self.cache_pattern = cache_pattern
         self.current_version = None
         if invalidate_on_deploy:
@@ -257,7 +386,8 @@ class CacheGroup(object):
     def invalidate(self):
         """Invalidate all values in this CacheGroup."""
         self.current_version = codes.make_code()
-        self.cache_wrapper.set(self.version_key, self.current_version)
+        self.cache_wrapper.set(self.version_key, self.current_version,
+                               self.timeout)
 
     def ensure_version(self):
         if self.current_version is not None:
@@ -285,13 +415,14 @@ class CacheGroup(object):
         If there is no value set for our version key, we set it now.
         """
         if self.cache_pattern:
-            _cache_pattern_memory[self.cache_pattern].update(keys)
+            _remember_cache_pattern_keys(self.cache_pattern, keys)
+            self._track_prefetched_keys(keys)
         keys_to_fetch = set(keys)
         if self.current_version is None:
             keys_to_fetch.add(self.version_key)
         if self._cache_pattern_keys:
             keys_to_fetch.update(self._cache_pattern_keys)
-            self._cache_pattern_keys = None
+            self._prefetch_started(keys)
         get_many_result = self.cache_wrapper.get_many(keys_to_fetch)
         # first of all, handle the version.
         if self.current_version is None:
@@ -308,14 +439,43 @@ class CacheGroup(object):
                 result[key] = value
         return result
 
+    def _prefetch_started(self, keys):
+        prefetched = self._cache_pattern_keys
+        self._cache_pattern_keys = None
+        self._unused_prefetched_keys = prefetched.difference(keys)
+        self._increment_pattern_metric('prefetched', len(prefetched))
+        self._increment_pattern_metric('used',
+                                       len(prefetched.intersection(keys)))
+
+    def _track_prefetched_keys(self, keys):
+        if not self._unused_prefetched_keys:
+            return
+        used = self._unused_prefetched_keys.intersection(keys)
+        if not used:
+            return
+        self._unused_prefetched_keys.difference_update(used)
+        self._increment_pattern_metric('used', len(used))
+        if all(self.cache_wrapper.has_fetched(key) for key in keys):
+            self._increment_pattern_metric('round-trips-saved')
+
+    def _increment_pattern_metric(self, name, amount=1):
+        if amount:
+            metrics.increment('{}{}.{}'.format(
+                CACHE_PATTERN_METRIC, self.cache_pattern, name), amount)
+            _cache_pattern_pending_stats[self.cache_pattern][name] += amount
+
     def set(self, key, value, timeout=None):
         """Set a value in the cache """
         self.ensure_version()
+        if timeout is None:
+            timeout = self.timeout
         self.cache_wrapper.set(key, self._pack_cache_value(value), timeout)
 
     def set_many(self, values, timeout=None):
         """Set multiple values in the cache """
         self.ensure_version()
+        if timeout is None:
+            timeout = self.timeout
         values_to_set = dict(
             (key, self._pack_cache_value(value))
             for key, value in values.items()
@@ -461,6 +621,21 @@ class ModelCacheManager(object):
         """
         return self.get_cache_group(pk).invalidate()
 
+    def invalidate_many(self, pks):
+        """Invalidate the CacheGroups for several instances
+
+        This works like calling invalidate_by_pk() for each pk, but only
+        makes 1 cache call.
+        """
+        values = {}
+        for pk in pks:
+            cache_group = self.get_cache_group(pk)
+            version_key = cache_group.cache_wrapper._prefix_key(
+                cache_group.version_key)
+            values[version_key] = codes.make_code()
+        if values:
+            cache.set_many(values)
+
     def get_instance(self, pk, cache_pattern=None):
         """Get a cached instance from it's cache group
 
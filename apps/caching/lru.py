@@ -0,0 +1,84 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+caching.lru -- Bounded process-local caches
+
+LRUCache stores values inside the current process.  This is useful for data
+that never changes once it's written (for example parsed SubtitleVersion
+data), since there's no way to invalidate the value in other processes.
+"""
+
+import collections
+import threading
+
+# Track all LRUCache instances so that we can clear them between unittests
+_all_caches = []
+
+class LRUCache(object):
+    """Least-recently-used cache with a maximum size
+
+    Args:
+        max_size: maximum number of values to store.  Once we go over this
+            we drop the value that was least recently used.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        _all_caches.append(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            # re-insert the value to mark it as most recently used
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+def clear_all():
+    """Clear all LRUCache instances."""
+    for cache in _all_caches:
+        cache.clear()
+
+__all__ = [
+    'LRUCache',
+]
@@ -17,17 +17,21 @@
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
 from __future__ import absolute_import
+import time
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
+from django_redis import get_redis_connection
 from django.test import TestCase
 from django.test.utils import override_settings
 from nose.tools import *
 import mock
 
+from caching import cachegroup
 from caching.cachegroup import (CacheGroup, _cache_pattern_memory,
                                 ModelCacheManager)
-from utils import test_utils
+from utils import metrics, test_utils
 from utils.factories import *
 from videos.models import Video
 
@@ -149,7 +153,7 @@ class CacheGroupTest2(CacheGroupTest):
 
 class CachePatternTest(TestCase):
     def tearDown(self):
-        _cache_pattern_memory.clear()
+        cachegroup.clear_cache_pattern_memory()
 
     def test_remember_keys(self):
         # test that we remember fetched keys
@@ -214,6 +218,65 @@ class CachePatternTest(TestCase):
         assert_equal(cache_group.cache_wrapper.get_many.call_args,
                      mock.call(set(['a', 'b', 'c', cache_group.version_key])))
 
+    def test_keys_shared_between_processes(self):
+        make_cache_group(cache_pattern='foo').get_many(['a', 'b'])
+        # sync our keys to redis
+        next_sync = time.time() + settings.CACHE_PATTERN_SYNC_INTERVAL + 1
+        with mock.patch('time.time', return_value=next_sync):
+            make_cache_group(cache_pattern='foo')
+        # simulate a different process by clearing the local memory
+        cachegroup.clear_cache_pattern_memory()
+        cache_group = self.make_mocked_cache_group()
+        cache_group.get('c')
+        assert_equal(cache_group.cache_wrapper.get_many.call_args,
+                     mock.call(set(['a', 'b', 'c', cache_group.version_key])))
+
+    def test_unused_keys_dropped(self):
+        redis = get_redis_connection('default')
+        redis_key = cachegroup._cache_pattern_redis_key('foo')
+        with mock.patch('time.time', return_value=10000000):
+            redis.zadd(redis_key, 10000000, 'a')
+            redis.zadd(redis_key,
+                       10000000 - settings.CACHE_PATTERN_KEY_MAX_AGE - 1, 'b')
+            cache_group = self.make_mocked_cache_group()
+        cache_group.get('c')
+        assert_equal(cache_group.cache_wrapper.get_many.call_args,
+                     mock.call(set(['a', 'c', cache_group.version_key])))
+        assert_equal(redis.zrange(redis_key, 0, -1), ['a'])
+
+    def test_stats(self):
+        _cache_pattern_memory['foo'] = set(['a', 'b', 'c'])
+        cache_group = self.make_mocked_cache_group()
+        cache_group.cache_wrapper.has_fetched.side_effect = \
+                lambda key: key in ('a', 'b', 'c')
+        cache_group.get('a')
+        # b was prefetched, so this shouldn't need a round trip
+        cache_group.get('b')
+        # d wasn't prefetched, so this needs a round trip
+        cache_group.get_many(['c', 'd'])
+        assert_equal(metrics.get_counts('caching.cache-pattern.foo.'), {
+            'prefetched': 3,
+            'used': 3,
+            'round-trips-saved': 1,
+        })
+        assert_equal(
+            [p['name'] for p in cachegroup.get_cache_pattern_stats()],
+            ['foo'])
+
+    def test_stats_shared_between_processes(self):
+        _cache_pattern_memory['foo'] = set(['a', 'b'])
+        self.make_mocked_cache_group().get('a')
+        # sync our stats to redis
+        next_sync = time.time() + settings.CACHE_PATTERN_SYNC_INTERVAL + 1
+        with mock.patch('time.time', return_value=next_sync):
+            make_cache_group(cache_pattern='foo')
+        # simulate a different process by clearing the local memory
+        cachegroup.clear_cache_pattern_memory()
+        _cache_pattern_memory['foo'] = set(['a', 'b'])
+        self.make_mocked_cache_group().get('a')
+        stats = cachegroup.get_cache_pattern_stats()
+        assert_equal(stats[0]['stats'], {'prefetched': 4, 'used': 2})
+
 class ModelCachingTest(TestCase):
     def test_model_to_tuple(self):
         video = VideoFactory()
@@ -285,6 +348,15 @@ class ModelCacheManagerTest(TestCase):
         cache_group2 = self.model_cache_manager.get_cache_group(self.pk)
         assert_equal(cache_group2.get('key'), None)
 
+    def test_invalidate_many(self):
+        other_pk = User.objects.create_user('test-user2').pk
+        for pk in (self.pk, other_pk):
+            self.model_cache_manager.get_cache_group(pk).set('key', 'value')
+        self.model_cache_manager.invalidate_many([self.pk, other_pk])
+        for pk in (self.pk, other_pk):
+            cache_group = self.model_cache_manager.get_cache_group(pk)
+            assert_equal(cache_group.get('key'), None)
+
     def test_get_instance(self):
         # Since the instance is not cached at this point, calling
         # get_instance() should fetch it from the DB
@@ -88,7 +88,8 @@ class YoutubeAccountForm(forms.ModelForm):
     def save(self, commit=True):
         account = super(YoutubeAccountForm, self).save(commit=commit)
         if self.cleaned_data.get('resync_subtitles'):
-            tasks.update_all_subtitles.delay(account.account_type, account.id)
+            tasks.update_all_subtitles.delay(account.account_type, account.id,
+                                              force=True)
         return account
 
     class Meta:
@@ -126,7 +127,8 @@ class VimeoAccountForm(forms.ModelForm):
     def save(self, commit=True):
         account = super(VimeoAccountForm, self).save(commit=commit)
         if self.cleaned_data.get('resync_subtitles'):
-            tasks.update_all_subtitles.delay(account.account_type, account.id)
+            tasks.update_all_subtitles.delay(account.account_type, account.id,
+                                              force=True)
         return account
 
     class Meta:
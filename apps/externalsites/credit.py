@@ -52,7 +52,7 @@ def add_credit_to_video_url(video_url, account):
         video_url=video_url)
     if not created:
         return
-    access_token = google.get_new_access_token(account.oauth_refresh_token)
+    access_token = google.get_access_token(account.oauth_refresh_token)
     video_id = video_url.videoid
     credit_text = calc_credit_text(video_url.video)
     current_description = google.get_video_info(video_id).description
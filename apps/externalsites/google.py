@@ -21,6 +21,7 @@
 from collections import namedtuple
 from email.mime.multipart import MIMEMultipart, MIMEBase
 from lxml import etree
+import hashlib
 import json
 import logging
 import urllib
@@ -30,10 +31,12 @@ import time
 
 from django.conf import settings
 from django.utils.translation import ugettext as _
+from django_redis import get_redis_connection
 import jwt
 import requests
 import pafy, isodate
 
+from utils import metrics
 from utils.subtitles import load_subtitles
 from utils.text import fmt
 
@@ -182,6 +185,95 @@ def revoke_auth_token(refresh_token):
     requests.get('https://accounts.google.com/o/oauth2/revoke',
                  params={'token': refresh_token})
 
+ACCESS_TOKEN_METRIC = 'youtube.access-token.'
+# How long to wait for another worker that's refreshing the same token
+ACCESS_TOKEN_WAIT_TIME = 5.0
+ACCESS_TOKEN_POLL_INTERVAL = 0.1
+
+def _access_token_key(refresh_token):
+    # Key by the refresh token rather than the account, so that relinking an
+    # account automatically stops us using the old access token.
+    return 'google-access-token:{}'.format(
+        hashlib.sha1(refresh_token.encode('utf-8')).hexdigest())
+
+def _access_token_owner_key(access_token):
+    # Maps an access token back to its cache key, so that we can drop it when
+    # the API rejects it without knowing the refresh token.
+    return 'google-access-token-owner:{}'.format(
+        hashlib.sha1(access_token.encode('utf-8')).hexdigest())
+
+def get_access_token(refresh_token):
+    """Get an access token, re-using a cached one if possible
+
+    Access tokens are stored in redis for GOOGLE_ACCESS_TOKEN_TIMEOUT
+    seconds.  When the token is missing, a single worker refreshes it while
+    the others wait for the result, so that a mass sync doesn't send a
+    burst of requests to the token endpoint.  If the waiting takes too long
+    we give up and fetch our own token.
+
+    If the API rejects a cached token (for example because the account's
+    access was revoked), _make_api_request() drops it from the cache so that
+    the next call fetches a new one.
+    """
+    redis = get_redis_connection('storage')
+    key = _access_token_key(refresh_token)
+    access_token = redis.get(key)
+    if access_token is not None:
+        metrics.increment(ACCESS_TOKEN_METRIC + 'hit')
+        return access_token
+
+    lock_key = key + ':lock'
+    have_lock = redis.set(lock_key, 1, nx=True,
+                          ex=settings.GOOGLE_ACCESS_TOKEN_LOCK_TIMEOUT)
+    if not have_lock:
+        access_token = _wait_for_access_token(redis, key)
+        if access_token is not None:
+            metrics.increment(ACCESS_TOKEN_METRIC + 'wait-hit')
+            return access_token
+    metrics.increment(ACCESS_TOKEN_METRIC + 'miss')
+    try:
+        access_token = get_new_access_token(refresh_token)
+        pipe = redis.pipeline()
+        pipe.set(key, access_token, ex=settings.GOOGLE_ACCESS_TOKEN_TIMEOUT)
+        pipe.set(_access_token_owner_key(access_token), key,
+                 ex=settings.GOOGLE_ACCESS_TOKEN_TIMEOUT)
+        pipe.execute()
+    finally:
+        if have_lock:
+            redis.delete(lock_key)
+    return access_token
+
+def _wait_for_access_token(redis, key):
+    lock_key = key + ':lock'
+    give_up_at = time.time() + ACCESS_TOKEN_WAIT_TIME
+    while time.time() < give_up_at:
+        time.sleep(ACCESS_TOKEN_POLL_INTERVAL)
+        access_token = redis.get(key)
+        if access_token is not None or not redis.exists(lock_key):
+            return access_token
+    return None
+
+def invalidate_access_token(refresh_token):
+    """Forget the cached access token for a refresh token
+
+    Call this when the refresh token is revoked.
+    """
+    get_redis_connection('storage').delete(_access_token_key(refresh_token))
+
+def _invalidate_rejected_access_token(access_token):
+    """Forget a cached access token that the API refused to accept."""
+    redis = get_redis_connection('storage')
+    owner_key = _access_token_owner_key(access_token)
+    key = redis.get(owner_key)
+    if key is not None and redis.get(key) == access_token:
+        redis.delete(key)
+        metrics.increment(ACCESS_TOKEN_METRIC + 'rejected')
+    redis.delete(owner_key)
+
+def get_access_token_stats():
+    """Get the hit/miss counts for get_access_token() in this process."""
+    return metrics.get_counts(ACCESS_TOKEN_METRIC)
+
 def multipart_format(parts):
     """Make a multipart message
 
@@ -245,6 +337,8 @@ def _make_api_request(method, access_token, url, **kwargs):
             logger.error("%s parsing youtube response (%s): %s" % (
                 e, response.status_code, response.content))
             message = 'Unkown error'
+        if response.status_code == 401 and access_token is not None:
+            _invalidate_rejected_access_token(access_token)
         raise APIError(message)
     return response
 
@@ -428,7 +522,7 @@ def get_openid_profile(access_token):
 def get_video_info(video_id, accounts=[]):
     for account in accounts:
         try:
-            access_token = get_new_access_token(account.oauth_refresh_token)
+            access_token = get_access_token(account.oauth_refresh_token)
             return _get_video_info(video_id, access_token)
         except Exception, e:
             pass
@@ -483,6 +577,18 @@ def update_video_description(video_id, access_token, description):
     video_put(access_token, video_id, snippet=snippet)
 
 def update_video_metadata(video_id, access_token, primary_audio_language_code, language_code, title, description):
+    update_video_localizations(video_id, access_token,
+                               primary_audio_language_code,
+                               {language_code: (title, description)})
+
+def update_video_localizations(video_id, access_token,
+                               primary_audio_language_code, localizations):
+    """Update the localized title/description for several languages
+
+    Args:
+        localizations: dict mapping language codes to (title, description)
+            tuples
+    """
     response = video_get(access_token, video_id, ['snippet','localizations'])
     item = response.json()['items'][0]
     snippet = item['snippet']
@@ -493,9 +599,10 @@ def update_video_metadata(video_id, access_token, primary_audio_language_code, l
         item = response.json()['items'][0]
         snippet = item['snippet']
     if 'localizations' in item:
-        localizations = response.json()['items'][0]['localizations']
-        localizations[language_code] = {"title": title[:YOUTUBE_TITLE_MAX_LENGTH], "description": description}
-        result = video_put(access_token, video_id, localizations=localizations)
+        current_localizations = response.json()['items'][0]['localizations']
+        for language_code, (title, description) in localizations.items():
+            current_localizations[language_code] = {"title": title[:YOUTUBE_TITLE_MAX_LENGTH], "description": description}
+        result = video_put(access_token, video_id, localizations=current_localizations)
 
 def get_service_account_access_token(scope):
     """Get an access token for our service account
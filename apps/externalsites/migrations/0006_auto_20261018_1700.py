@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 17:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('externalsites', '0005_auto_20181129_0627'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='synchistory',
+            name='retry',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -18,6 +18,7 @@
 
 import collections
 import datetime
+import functools
 from urllib import quote_plus
 import urlparse
 
@@ -145,15 +146,79 @@ class ExternalAccount(models.Model):
         version = language.get_public_tip()
         if version is None or self.should_skip_syncing():
             return
-        sync_history_values = {
+        return self._record_update(
+            video_url, language, version, functools.partial(
+                self.do_update_subtitles, video_url, language, version))
+
+    def update_video_subtitles(self, video_url, languages, force=False):
+        """Update subtitles for several languages of a video
+
+        Only languages whose public tip differs from the version we last
+        synced are updated, unless force is True.
+
+        Returns:
+            list of (language, version, success) tuples for the languages
+            that we tried to sync.
+        """
+        if self.should_skip_syncing():
+            return []
+        if force:
+            synced_versions = {}
+        else:
+            synced_versions = dict(
+                SyncedSubtitleVersion.objects
+                .filter(account_type=self.account_type, account_id=self.id,
+                        video_url=video_url)
+                .values_list('language_id', 'version_id'))
+        to_sync = []
+        for language in languages:
+            version = language.get_public_tip()
+            if (version is not None and
+                    synced_versions.get(language.id) != version.id):
+                to_sync.append((language, version))
+        if not to_sync:
+            return []
+        return self.do_update_video_subtitles(video_url, to_sync)
+
+    def do_update_video_subtitles(self, video_url, to_sync):
+        """Do the work needed to update subtitles for several languages
+
+        Subclasses can override this if their API lets them share work
+        between languages.
+
+        Args:
+            video_url: VideoUrl to sync
+            to_sync: list of (language, version) tuples
+
+        Returns:
+            list of (language, version, success) tuples
+        """
+        return [
+            (language, version, self._record_update(
+                video_url, language, version, functools.partial(
+                    self.do_update_subtitles, video_url, language, version)))
+            for language, version in to_sync
+        ]
+
+    def _update_history_values(self, video_url, language, version):
+        return {
             'account': self,
             'video_url': video_url,
             'language': language,
             'action': SyncHistory.ACTION_UPDATE_SUBTITLES,
             'version': version,
         }
+
+    def _record_update(self, video_url, language, version, do_update):
+        """Run do_update() and record the result
+
+        This creates the SyncHistory entry for the attempt and, if it
+        succeeded, updates the SyncedSubtitleVersion.
+        """
+        sync_history_values = self._update_history_values(
+            video_url, language, version)
         try:
-            self.do_update_subtitles(video_url, language, version)
+            do_update()
         except Exception, e:
             SyncHistory.objects.create_for_error(e, **sync_history_values)
             return False
@@ -730,20 +795,61 @@ class YouTubeAccount(ExternalAccount):
         Subclasses must implement this method.
         """
         if self.sync_subtitles:
-            access_token = google.get_new_access_token(self.oauth_refresh_token)
+            access_token = google.get_access_token(self.oauth_refresh_token)
             syncing.youtube.update_subtitles(video_url.videoid, access_token,
                                              version,
                                              self.enable_language_mapping,
                                              self.sync_metadata)
 
+    def do_update_video_subtitles(self, video_url, to_sync):
+        """Update subtitles for several languages of a video
+
+        We fetch the caption list once and share it between the languages,
+        then push the metadata for all the languages that we synced with a
+        single update.
+        """
+        video_id = video_url.videoid
+        try:
+            access_token = google.get_access_token(self.oauth_refresh_token)
+            caption_id_map = syncing.youtube.get_caption_id_map(
+                access_token, video_id)
+        except Exception, e:
+            for language, version in to_sync:
+                SyncHistory.objects.create_for_error(
+                    e, **self._update_history_values(video_url, language,
+                                                     version))
+            return [(language, version, False)
+                    for language, version in to_sync]
+        results = []
+        synced_versions = []
+        for language, version in to_sync:
+            success = self._record_update(
+                video_url, language, version, functools.partial(
+                    syncing.youtube.update_subtitles, video_id,
+                    access_token, version, self.enable_language_mapping,
+                    self.sync_metadata, caption_id_map=caption_id_map,
+                    update_metadata=False))
+            results.append((language, version, success))
+            if success:
+                synced_versions.append(version)
+        try:
+            syncing.youtube.sync_video_metadata(
+                video_id, access_token, synced_versions,
+                self.enable_language_mapping, self.sync_metadata)
+        except Exception:
+            logger.warn("Error syncing youtube metadata for %s", video_id,
+                        exc_info=True)
+        return results
+
     def do_delete_subtitles(self, video_url, language):
-        access_token = google.get_new_access_token(self.oauth_refresh_token)
+        access_token = google.get_access_token(self.oauth_refresh_token)
         syncing.youtube.delete_subtitles(video_url.videoid, access_token,
                                          language.language_code,
                                          self.enable_language_mapping)
 
     def delete(self):
         google.revoke_auth_token(self.oauth_refresh_token)
+        google.invalidate_access_token(self.oauth_refresh_token)
         super(YouTubeAccount, self).delete()
 
     def should_import_videos(self):
@@ -1162,7 +1268,7 @@ class SyncHistory(models.Model):
     result = models.CharField(max_length=1, choices=RESULT_CHOICES)
     details = models.CharField(max_length=255, blank=True, default='')
     # should we try to resync these subtitles?
-    retry = models.BooleanField(default=False)
+    retry = models.BooleanField(default=False, db_index=True)
     is_latest = models.BooleanField(default=False)
 
     objects = SyncHistoryManager()
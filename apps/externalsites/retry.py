@@ -0,0 +1,245 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+externalsites.retry -- Retry failed subtitle syncs in bulk
+
+SyncHistory rows with the retry flag set are syncs that failed with a
+RetryableSyncingError, or that a user asked us to retry.  The
+retry_failed_sync task calls dispatch_retries() every few seconds, which:
+
+  - Claims up to SYNC_RETRY_BATCH_SIZE rows.  The rows are locked with
+    SELECT FOR UPDATE while we clear their retry flag, so concurrent runs
+    never claim the same row.
+  - Groups the rows by account and schedules a retry_account_syncs job for
+    each one.  The job syncs all languages of a video together (see
+    ExternalAccount.update_video_subtitles()), so the access token and
+    caption list are fetched once per video rather than once per row.
+  - Runs at most SYNC_RETRY_MAX_CONCURRENCY account jobs at once, using a
+    utils.semaphore.Semaphore.  Rows for accounts that we don't have a slot
+    for are left for the next run.  If a worker dies without releasing its
+    slot, the slot expires after SYNC_RETRY_SLOT_TIMEOUT seconds.
+
+When any sync in an account job fails, the account backs off: we don't claim
+its rows for SYNC_RETRY_BACKOFF seconds, doubling for each failed job in a
+row.  After SYNC_RETRY_CIRCUIT_THRESHOLD failed jobs in a row, the circuit
+opens and we leave the account alone for SYNC_RETRY_CIRCUIT_OPEN_TIME
+seconds.  A job where every sync succeeds resets the count.
+
+Metrics:
+  - externalsites.sync-retry.backlog: rows waiting to be retried
+  - externalsites.sync-retry.{claimed,success,error}: counters.  The rate
+    of claimed is the rate the backlog drains.
+  - externalsites.sync-retry.{backoff,circuit-open}: counters for accounts
+    entering backoff/opening their circuit
+"""
+
+from __future__ import absolute_import
+from collections import defaultdict
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Q
+from django_redis import get_redis_connection
+
+from externalsites.models import SyncHistory, get_account
+from utils import metrics
+from utils.semaphore import Semaphore
+from utils.taskqueue import job
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'externalsites.sync-retry.'
+
+# sorted set mapping "<account_type>:<account_id>" to the time when we can
+# retry syncs for the account again
+BACKOFF_KEY = 'sync-retry:backoff'
+
+def _get_semaphore():
+    return Semaphore('sync-retry', settings.SYNC_RETRY_MAX_CONCURRENCY,
+                     settings.SYNC_RETRY_SLOT_TIMEOUT)
+
+def _account_key(account_type, account_id):
+    return '{}:{}'.format(account_type, account_id)
+
+def _failure_count_key(account_type, account_id):
+    return 'sync-retry:failures:{}'.format(
+        _account_key(account_type, account_id))
+
+def dispatch_retries():
+    """Claim failed syncs and schedule jobs to retry them."""
+    redis = get_redis_connection('storage')
+    backlog = SyncHistory.objects.filter(retry=True).count()
+    metrics.record(METRIC_PREFIX + 'backlog', backlog)
+    if not backlog:
+        return
+    semaphore = _get_semaphore()
+    if semaphore.count() >= settings.SYNC_RETRY_MAX_CONCURRENCY:
+        return
+    backed_off = _backed_off_accounts(redis)
+    rows = claim_retries(settings.SYNC_RETRY_BATCH_SIZE, backed_off)
+    by_account = defaultdict(list)
+    for account_type, account_id, history_id in rows:
+        by_account[account_type, account_id].append(history_id)
+
+    unscheduled = []
+    for (account_type, account_id), history_ids in sorted(by_account.items()):
+        # Once we run out of slots, leave the rest of the accounts for the
+        # next run
+        slot_token = None if unscheduled else semaphore.acquire()
+        if slot_token is not None:
+            retry_account_syncs.delay(account_type, account_id, history_ids,
+                                      slot_token)
+        else:
+            unscheduled.extend(history_ids)
+    if unscheduled:
+        SyncHistory.objects.filter(id__in=unscheduled).update(retry=True)
+    if len(rows) > len(unscheduled):
+        metrics.increment(METRIC_PREFIX + 'claimed',
+                          len(rows) - len(unscheduled))
+
+def claim_retries(batch_size, exclude_accounts=()):
+    """Claim SyncHistory rows to retry
+
+    Args:
+        batch_size: max number of rows to claim
+        exclude_accounts: list of (account_type, account_id) tuples to skip
+
+    Returns:
+        list of (account_type, account_id, id) tuples for the claimed rows.
+        Their retry flag has been cleared.
+    """
+    qs = SyncHistory.objects.filter(retry=True)
+    account_ids_by_type = defaultdict(list)
+    for account_type, account_id in exclude_accounts:
+        account_ids_by_type[account_type].append(account_id)
+    for account_type, account_ids in account_ids_by_type.items():
+        qs = qs.exclude(Q(account_type=account_type,
+                          account_id__in=account_ids))
+    with transaction.atomic():
+        rows = list(qs.select_for_update()
+                    .order_by('id')
+                    .values_list('account_type', 'account_id', 'id')
+                    [:batch_size])
+        if rows:
+            SyncHistory.objects.filter(
+                id__in=[row[2] for row in rows]).update(retry=False)
+    return rows
+
+def _backed_off_accounts(redis):
+    now = time.time()
+    redis.zremrangebyscore(BACKOFF_KEY, 0, now)
+    return [_parse_account_key(key)
+            for key in redis.zrange(BACKOFF_KEY, 0, -1)]
+
+def _parse_account_key(key):
+    account_type, account_id = key.split(':')
+    return account_type, int(account_id)
+
+@job
+def retry_account_syncs(account_type, account_id, history_ids,
+                        slot_token=None):
+    """Retry syncs for an account
+
+    This is scheduled by dispatch_retries(), which acquired a concurrency slot
+    for us.
+    """
+    try:
+        _retry_account_syncs(account_type, account_id, history_ids)
+    finally:
+        if slot_token is not None:
+            _get_semaphore().release(slot_token)
+
+def _retry_account_syncs(account_type, account_id, history_ids):
+    try:
+        account = get_account(account_type, account_id)
+    except ObjectDoesNotExist:
+        logger.warn("retry_account_syncs: can't find account %s %s",
+                    account_type, account_id)
+        return
+    languages_by_video_url = defaultdict(dict)
+    history_ids_by_video_url = defaultdict(list)
+    video_urls = {}
+    for sh in (SyncHistory.objects.filter(id__in=history_ids)
+               .select_related('video_url', 'language')):
+        video_urls[sh.video_url_id] = sh.video_url
+        languages_by_video_url[sh.video_url_id][sh.language_id] = sh.language
+        history_ids_by_video_url[sh.video_url_id].append(sh.id)
+
+    success_count = error_count = 0
+    for video_url_id, languages in languages_by_video_url.items():
+        try:
+            results = account.update_video_subtitles(
+                video_urls[video_url_id], languages.values(), force=True)
+        except Exception:
+            logger.exception("Error retrying failed sync")
+            # We cleared the retry flag when we claimed the rows and no new
+            # SyncHistory rows were written, so set it again.  Otherwise
+            # these syncs would never get retried.
+            SyncHistory.objects.filter(
+                id__in=history_ids_by_video_url[video_url_id]).update(
+                    retry=True)
+            error_count += len(languages)
+            continue
+        for language, version, success in results:
+            if success:
+                success_count += 1
+            else:
+                error_count += 1
+    if success_count:
+        metrics.increment(METRIC_PREFIX + 'success', success_count)
+    if error_count:
+        metrics.increment(METRIC_PREFIX + 'error', error_count)
+        # Back off even if some syncs worked.  Otherwise a language that
+        # always fails would get retried on every run.
+        record_failure(account_type, account_id)
+    elif success_count:
+        reset_backoff(account_type, account_id)
+
+def record_failure(account_type, account_id):
+    """Back off retrying syncs for an account after a failure."""
+    redis = get_redis_connection('storage')
+    count_key = _failure_count_key(account_type, account_id)
+    pipe = redis.pipeline()
+    pipe.incr(count_key)
+    pipe.expire(count_key, settings.SYNC_RETRY_CIRCUIT_OPEN_TIME * 2)
+    failures = pipe.execute()[0]
+    if failures >= settings.SYNC_RETRY_CIRCUIT_THRESHOLD:
+        if failures == settings.SYNC_RETRY_CIRCUIT_THRESHOLD:
+            logger.warn("Opening sync retry circuit for account %s %s",
+                        account_type, account_id)
+            metrics.increment(METRIC_PREFIX + 'circuit-open')
+        delay = settings.SYNC_RETRY_CIRCUIT_OPEN_TIME
+    else:
+        metrics.increment(METRIC_PREFIX + 'backoff')
+        delay = min(settings.SYNC_RETRY_BACKOFF * 2 ** (failures - 1),
+                    settings.SYNC_RETRY_CIRCUIT_OPEN_TIME)
+    redis.zadd(BACKOFF_KEY, time.time() + delay,
+               _account_key(account_type, account_id))
+
+def reset_backoff(account_type, account_id):
+    redis = get_redis_connection('storage')
+    redis.delete(_failure_count_key(account_type, account_id))
+    redis.zrem(BACKOFF_KEY, _account_key(account_type, account_id))
+
+def get_stats():
+    """Get the retry counts for this process."""
+    return metrics.get_counts(METRIC_PREFIX)
@@ -124,7 +124,7 @@ def fetch_subs_youtube(video_url, user, team):
         l.language_code for l in
         video_url.video.newsubtitlelanguage_set.having_versions()
     )
-    access_token = google.get_new_access_token(account.oauth_refresh_token)
+    access_token = google.get_access_token(account.oauth_refresh_token)
     captions_list = google.captions_list(access_token, video_id)
     versions = []
     for caption_id, language_code, caption_name in captions_list:
@@ -53,14 +53,23 @@ def convert_language_code(lc, enable_language_mapping):
 def _format_subs_for_youtube(subtitle_set):
     return babelsubs.to(subtitle_set, 'vtt').encode('utf-8')
 
-def find_existing_caption_id(access_token, video_id, language_code,
-                             enable_language_mapping):
-
-    caption_id_map = {
+def get_caption_id_map(access_token, video_id):
+    """Get a dict mapping lower-case language codes to caption ids"""
+    return {
         caption_info[1].lower(): caption_info[0]
         for caption_info in google.captions_list(access_token, video_id)
     }
 
+def find_existing_caption_id(access_token, video_id, language_code,
+                             enable_language_mapping, caption_id_map=None):
+    """Find the caption id for a language
+
+    Pass in caption_id_map, from get_caption_id_map(), to avoid listing the
+    captions again when syncing several languages for a video.
+    """
+    if caption_id_map is None:
+        caption_id_map = get_caption_id_map(access_token, video_id)
+
     # regardless of enable_language_mapping, try the unmapped language first
     try:
         return caption_id_map[language_code.lower()]
@@ -79,8 +88,13 @@ set to sync metadata for its videos. At the same time we maintain the usage of
 the setting teams.models.Team.sync_metadata for old-style teams
 '''
 def update_subtitles(video_id, access_token, subtitle_version,
-                     enable_language_mapping, account_syncs_metadata):
-    """Push the subtitles for a language to YouTube """
+                     enable_language_mapping, account_syncs_metadata,
+                     caption_id_map=None, update_metadata=True):
+    """Push the subtitles for a language to YouTube
+
+    When syncing several languages, pass caption_id_map and set
+    update_metadata=False, then call sync_video_metadata() once at the end.
+    """
     language_code = subtitle_version.language_code
     subs = subtitle_version.get_subtitles()
     if should_add_credit_to_subtitles(subtitle_version, subs):
@@ -89,7 +103,8 @@ def update_subtitles(video_id, access_token, subtitle_version,
 
     caption_id = find_existing_caption_id(access_token, video_id,
                                           language_code,
-                                          enable_language_mapping)
+                                          enable_language_mapping,
+                                          caption_id_map)
     if caption_id:
         google.captions_update(access_token, caption_id, 'text/vtt', content)
     else:
@@ -97,12 +112,25 @@ def update_subtitles(video_id, access_token, subtitle_version,
         google.captions_insert(access_token, video_id, language_code,
                                'text/vtt', content)
 
-    sync_metadata(video_id, access_token, subtitle_version,
-                    enable_language_mapping, account_syncs_metadata)
+    if update_metadata:
+        sync_metadata(video_id, access_token, subtitle_version,
+                      enable_language_mapping, account_syncs_metadata)
 
 def sync_metadata(video_id, access_token, subtitle_version,
                   enable_language_mapping, account_syncs_metadata):
-    video = subtitle_version.video
+    sync_video_metadata(video_id, access_token, [subtitle_version],
+                        enable_language_mapping, account_syncs_metadata)
+
+def sync_video_metadata(video_id, access_token, subtitle_versions,
+                        enable_language_mapping, account_syncs_metadata):
+    """Push the title/description for several languages of a video
+
+    All subtitle_versions must be for the same video.  We update the
+    localizations for all of them with a single API call.
+    """
+    if not subtitle_versions:
+        return
+    video = subtitle_versions[0].video
     team_video = video.get_team_video()
     
     # support for old-style teams
@@ -111,19 +139,24 @@ def sync_metadata(video_id, access_token, subtitle_version,
         not team_video.team.sync_metadata):
         return
 
-    if not (team_video and account_syncs_metadata and            
-            subtitle_version.title and video.primary_audio_language_code):
+    if not (team_video and account_syncs_metadata and
+            video.primary_audio_language_code):
+        return
+    localizations = {}
+    for subtitle_version in subtitle_versions:
+        if subtitle_version.title:
+            language_code = convert_language_code(
+                subtitle_version.language_code, enable_language_mapping)
+            localizations[language_code] = (subtitle_version.title,
+                                             subtitle_version.description)
+    if not localizations:
         return
     primary_audio_language_code = convert_language_code(
         video.primary_audio_language_code, enable_language_mapping)
-    language_code = convert_language_code(subtitle_version.language_code, \
-                                          enable_language_mapping)
-    google.update_video_metadata(video_id,
-                                 access_token,
-                                 primary_audio_language_code,
-                                 language_code,
-                                 subtitle_version.title,
-                                 subtitle_version.description)
+    google.update_video_localizations(video_id,
+                                      access_token,
+                                      primary_audio_language_code,
+                                      localizations)
 
 def delete_subtitles(video_id, access_token, language_code,
                      enable_language_mapping):
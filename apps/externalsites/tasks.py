@@ -22,8 +22,9 @@ from django.core.exceptions import ObjectDoesNotExist
 
 from externalsites import credit
 from externalsites import google
+from externalsites import retry
 from externalsites import subfetch
-from externalsites.models import (get_account, get_sync_account, SyncHistory,
+from externalsites.models import (get_account, get_sync_account,
                                   YouTubeAccount, VimeoSyncAccount)
 from subtitles.models import SubtitleLanguage, SubtitleVersion
 from videos.models import VideoUrl
@@ -87,8 +88,42 @@ def delete_subtitles(account_type, account_id, video_url_id, lang_id):
     account.delete_subtitles(video_url, language)
 
 @job
-def update_all_subtitles(account_type, account_id):
-    """Update all subtitles for a given account."""
+def update_video_subtitles(account_type, account_id, video_url_id,
+                           force=False):
+    """Update all subtitles for a video
+
+    Only languages with a new public version since the last sync are updated,
+    unless force is True.
+    """
+    logger.info("externalsites.tasks.update_video_subtitles(%s, %s, %s)",
+                account_type, account_id, video_url_id)
+    try:
+        account = get_account(account_type, account_id)
+        video_url = VideoUrl.objects.select_related('video').get(
+            id=video_url_id)
+    except ObjectDoesNotExist, e:
+        logger.error(
+            'Lookup error in update_video_subtitles(): %s' % e,
+            exc_info=True,
+            extra={
+                'data': {
+                    'account_type': account_type,
+                    'account_id': account_id,
+                    'video_url_id': video_url_id,
+                }
+            }
+        )
+        return
+    languages = (video_url.video.newsubtitlelanguage_set
+                 .having_public_versions())
+    account.update_video_subtitles(video_url, languages, force)
+
+@job
+def update_all_subtitles(account_type, account_id, force=False):
+    """Update all subtitles for a given account.
+
+    We schedule an update_video_subtitles() job for each video.
+    """
     logger.info("externalsites.tasks.update_all_subtitles(%s, %s)",
                 account_type, account_id)
     try:
@@ -117,11 +152,8 @@ def update_all_subtitles(account_type, account_id):
         for video_url in video.get_video_urls():
             if not account.should_sync_video_url(video, video_url):
                 continue
-            language_qs = (video.newsubtitlelanguage_set
-                           .having_public_versions())
-            for language in language_qs:
-                update_subtitles.delay(account_type, account_id,
-                                       video_url.id, language.id)
+            update_video_subtitles.delay(account_type, account_id,
+                                         video_url.id, force)
 
 @job
 def add_amara_credit(video_url_id):
@@ -150,14 +182,7 @@ def fetch_subs(video_url_id, user_id=None,  team_id=None):
 
 @job
 def retry_failed_sync():
-    sh = SyncHistory.objects.get_attempt_to_resync()
-    if sh is None:
-        return
-    account = sh.get_account()
-    try:
-        account.update_subtitles(sh.video_url, sh.language)
-    except google.OAuthError:
-        logger.exception("Error retrying failed sync")
+    retry.dispatch_retries()
 
 @job
 def import_video_from_youtube_account(account_id):
@@ -23,11 +23,12 @@ import urlparse
 from django.conf import settings
 from django.test import TestCase
 from django.test.utils import override_settings
+from django_redis import get_redis_connection
 from nose.tools import *
 import mock
 import jwt
 
-from utils import dates
+from utils import dates, test_utils
 from utils.factories import *
 from utils.test_utils import *
 from externalsites import google
@@ -218,6 +219,93 @@ class AccessTokenTest(TestCase):
         with mocker:
             google.revoke_auth_token('test-token')
 
+class CachedAccessTokenTest(TestCase):
+    def setUp(self):
+        self.redis = get_redis_connection('storage')
+
+    def test_cache(self):
+        assert_equal(google.get_access_token('test-refresh-token'),
+                     'test-access-token')
+        assert_equal(google.get_access_token('test-refresh-token'),
+                     'test-access-token')
+        assert_equal(test_utils.youtube_get_new_access_token.call_args_list,
+                     [mock.call('test-refresh-token')])
+        assert_equal(google.get_access_token_stats(), {'miss': 1, 'hit': 1})
+
+    def test_separate_refresh_tokens(self):
+        google.get_access_token('test-refresh-token')
+        google.get_access_token('test-refresh-token-2')
+        assert_equal(test_utils.youtube_get_new_access_token.call_count, 2)
+
+    def test_invalidate(self):
+        google.get_access_token('test-refresh-token')
+        google.invalidate_access_token('test-refresh-token')
+        google.get_access_token('test-refresh-token')
+        assert_equal(test_utils.youtube_get_new_access_token.call_count, 2)
+
+    def test_invalidate_on_auth_error(self):
+        access_token = google.get_access_token('test-refresh-token')
+        mocker = RequestsMocker()
+        mocker.expect_request(
+            'get', 'https://www.googleapis.com/youtube/v3/channels', params={
+                'part': 'id',
+                'mine': 'true',
+            }, headers={
+                'Authorization': 'Bearer {}'.format(access_token),
+            }, status_code=401, body=json.dumps({
+                'error': {
+                    'errors': [{'reason': 'authError'}],
+                },
+            }))
+        with mocker:
+            with assert_raises(google.APIError):
+                google.channel_get(access_token, ['id'])
+        google.get_access_token('test-refresh-token')
+        assert_equal(test_utils.youtube_get_new_access_token.call_count, 2)
+        assert_equal(google.get_access_token_stats(),
+                     {'miss': 2, 'rejected': 1})
+
+    def test_auth_error_keeps_newer_token(self):
+        # If another worker already replaced the rejected token, we should
+        # keep using the new one.
+        google.get_access_token('test-refresh-token')
+        key = google._access_token_key('test-refresh-token')
+        self.redis.set(key, 'new-access-token')
+        google._invalidate_rejected_access_token('test-access-token')
+        assert_equal(self.redis.get(key), 'new-access-token')
+
+    def test_expiration(self):
+        google.get_access_token('test-refresh-token')
+        key = google._access_token_key('test-refresh-token')
+        assert_true(0 < self.redis.ttl(key) <=
+                    settings.GOOGLE_ACCESS_TOKEN_TIMEOUT)
+
+    @mock.patch('time.sleep')
+    def test_wait_for_other_worker(self, mock_sleep):
+        # Simulate another worker holding the refresh lock, then storing the
+        # token while we wait.
+        key = google._access_token_key('test-refresh-token')
+        self.redis.set(key + ':lock', 1)
+        def sleep(seconds):
+            self.redis.set(key, 'other-access-token')
+        mock_sleep.side_effect = sleep
+        assert_equal(google.get_access_token('test-refresh-token'),
+                     'other-access-token')
+        assert_equal(test_utils.youtube_get_new_access_token.call_count, 0)
+        assert_equal(google.get_access_token_stats(), {'wait-hit': 1})
+
+    @mock.patch('time.sleep')
+    def test_other_worker_fails(self, mock_sleep):
+        # If the other worker releases the lock without storing a token, we
+        # should fetch it ourselves.
+        key = google._access_token_key('test-refresh-token')
+        self.redis.set(key + ':lock', 1)
+        mock_sleep.side_effect = lambda seconds: self.redis.delete(
+            key + ':lock')
+        assert_equal(google.get_access_token('test-refresh-token'),
+                     'test-access-token')
+        assert_equal(test_utils.youtube_get_new_access_token.call_count, 1)
+
 class OpenIDConnectAuthBackendTest(TestCase):
     # Test logging a user in with Google OpenID Connect
     def run_authenticate(self, sub, email, openid_key=None, **profile_data):
@@ -23,6 +23,7 @@ from django.core.exceptions import PermissionDenied
 from nose.tools import *
 import mock
 
+from externalsites import google
 from externalsites.exceptions import YouTubeAccountExistsError
 from externalsites.models import (BrightcoveCMSAccount, YouTubeAccount,
                                   get_sync_accounts, account_models,
@@ -221,6 +222,14 @@ class YoutubeAccountTest(TestCase):
         test_utils.youtube_revoke_auth_token.assert_called_with(
             account.oauth_refresh_token)
 
+    def test_invalidate_access_token_on_delete(self):
+        account = YouTubeAccountFactory(user=UserFactory())
+        google.get_access_token(account.oauth_refresh_token)
+        account.delete()
+        google.get_access_token(account.oauth_refresh_token)
+        self.assertEquals(
+            test_utils.youtube_get_new_access_token.call_count, 2)
+
     def test_create_or_update(self):
         # if there are no other accounts for a channel_id, create_or_update()
         # should create the account and return it
@@ -0,0 +1,175 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+import time
+
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_redis import get_redis_connection
+from nose.tools import *
+
+from externalsites import retry
+from externalsites.exceptions import RetryableSyncingError
+from externalsites.models import KalturaAccount, SyncHistory
+from subtitles import pipeline
+from utils.factories import *
+from utils.test_utils import patch_for_test
+
+class RetryTest(TestCase):
+    @patch_for_test('externalsites.models.KalturaAccount.do_update_subtitles')
+    def setUp(self, mock_update_subtitles):
+        self.mock_update_subtitles = mock_update_subtitles
+        self.redis = get_redis_connection('storage')
+
+    def make_failed_syncs(self, language_codes=('en', 'fr')):
+        video = KalturaVideoFactory()
+        team_video = TeamVideoFactory(video=video)
+        account = KalturaAccount.objects.create(
+            team=team_video.team, partner_id=1234, secret='abcd')
+        video_url = video.get_primary_videourl_obj()
+        for language_code in language_codes:
+            version = pipeline.add_subtitles(video, language_code, None)
+            SyncHistory.objects.create_for_error(
+                ValueError("Fake Error"), account=account,
+                video_url=video_url, language=version.subtitle_language,
+                version=version, action=SyncHistory.ACTION_UPDATE_SUBTITLES,
+                retry=True)
+        return account
+
+    def retry_count(self, account):
+        return SyncHistory.objects.filter(account_id=account.id,
+                                          retry=True).count()
+
+    def test_retry(self):
+        account = self.make_failed_syncs()
+        retry.dispatch_retries()
+        assert_equal(self.mock_update_subtitles.call_count, 2)
+        assert_equal(self.retry_count(account), 0)
+        assert_equal(SyncHistory.objects.filter(
+            result=SyncHistory.RESULT_SUCCESS).count(), 2)
+        assert_equal(retry.get_stats(), {'claimed': 2, 'success': 2})
+        # we should release the concurrency slot when the job finishes
+        assert_equal(retry._get_semaphore().count(), 0)
+
+    def test_claim_clears_retry_flag(self):
+        account = self.make_failed_syncs()
+        rows = retry.claim_retries(10)
+        assert_equal(len(rows), 2)
+        assert_equal(self.retry_count(account), 0)
+        assert_equal(retry.claim_retries(10), [])
+
+    def test_claim_batch_size(self):
+        account = self.make_failed_syncs(['en', 'fr', 'de'])
+        assert_equal(len(retry.claim_retries(2)), 2)
+        assert_equal(self.retry_count(account), 1)
+
+    @override_settings(SYNC_RETRY_MAX_CONCURRENCY=1)
+    def test_concurrency_limit(self):
+        account1 = self.make_failed_syncs()
+        account2 = self.make_failed_syncs()
+        semaphore = retry._get_semaphore()
+        slot_token = semaphore.acquire()
+        retry.dispatch_retries()
+        assert_equal(self.mock_update_subtitles.call_count, 0)
+        # with a free slot, we should retry one account per run
+        semaphore.release(slot_token)
+        retry.dispatch_retries()
+        assert_equal(self.mock_update_subtitles.call_count, 2)
+        assert_equal(self.retry_count(account1) + self.retry_count(account2),
+                     2)
+
+    def test_backoff(self):
+        account = self.make_failed_syncs()
+        self.mock_update_subtitles.side_effect = RetryableSyncingError(
+            None, 'Temporary error')
+        retry.dispatch_retries()
+        assert_equal(self.mock_update_subtitles.call_count, 2)
+        # the failures set the retry flag again, but we shouldn't retry
+        # until the backoff period is over
+        assert_equal(self.retry_count(account), 2)
+        retry.dispatch_retries()
+        assert_equal(self.mock_update_subtitles.call_count, 2)
+        assert_equal(retry.get_stats(), {
+            'claimed': 2, 'error': 2, 'backoff': 1,
+        })
+
+        # after the backoff period we should retry
+        self.redis.delete(retry.BACKOFF_KEY)
+        retry.dispatch_retries()
+        assert_equal(self.mock_update_subtitles.call_count, 4)
+
+    def test_partial_failure_backs_off(self):
+        # If some syncs keep failing, we should back off even though others
+        # succeed
+        account = self.make_failed_syncs()
+        def update_subtitles(video_url, language, version):
+            if language.language_code == 'fr':
+                raise RetryableSyncingError(None, 'Temporary error')
+        self.mock_update_subtitles.side_effect = update_subtitles
+        retry.dispatch_retries()
+        assert_equal(self.retry_count(account), 1)
+        retry.dispatch_retries()
+        assert_equal(self.mock_update_subtitles.call_count, 2)
+        assert_equal(retry.get_stats()['backoff'], 1)
+
+    @patch_for_test('externalsites.models.KalturaAccount.'
+                    'update_video_subtitles')
+    def test_unexpected_error(self, mock_update_video_subtitles):
+        # If the sync raises before recording any history, we should set the
+        # retry flag again rather than dropping the rows
+        account = self.make_failed_syncs()
+        mock_update_video_subtitles.side_effect = ValueError()
+        retry.dispatch_retries()
+        assert_equal(self.retry_count(account), 2)
+        assert_equal(retry.get_stats()['backoff'], 1)
+
+    def check_backoff_time(self, account, delay):
+        retry_time = self.redis.zscore(
+            retry.BACKOFF_KEY, '{}:{}'.format(account.account_type,
+                                              account.id))
+        assert_almost_equal(retry_time, time.time() + delay, delta=5)
+
+    def test_exponential_backoff(self):
+        account = self.make_failed_syncs()
+        with self.settings(SYNC_RETRY_BACKOFF=10):
+            retry.record_failure(account.account_type, account.id)
+            self.check_backoff_time(account, 10)
+            retry.record_failure(account.account_type, account.id)
+            self.check_backoff_time(account, 20)
+            retry.record_failure(account.account_type, account.id)
+            self.check_backoff_time(account, 40)
+
+    @override_settings(SYNC_RETRY_CIRCUIT_THRESHOLD=3)
+    def test_circuit_breaker(self):
+        account = self.make_failed_syncs()
+        for i in range(3):
+            retry.record_failure(account.account_type, account.id)
+        self.check_backoff_time(account,
+                                settings.SYNC_RETRY_CIRCUIT_OPEN_TIME)
+        assert_equal(retry.get_stats()['circuit-open'], 1)
+
+    def test_success_resets_backoff(self):
+        account = self.make_failed_syncs()
+        retry.record_failure(account.account_type, account.id)
+        retry.record_failure(account.account_type, account.id)
+        self.redis.delete(retry.BACKOFF_KEY)
+        retry.dispatch_retries()
+        retry.record_failure(account.account_type, account.id)
+        self.check_backoff_time(account, settings.SYNC_RETRY_BACKOFF)
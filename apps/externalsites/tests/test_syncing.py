@@ -909,3 +909,104 @@ class YouTubeLanguageMappingTest(TestCase):
         self.mock_google.languages.extend(['zh-cn', 'zh-hans'])
         self.check_update_subtitles_choice('zh-cn', 'zh-cn')
         self.check_delete_subtitles_choice('zh-cn', 'zh-cn')
+
+class YouTubeVideoSyncTest(TestCase):
+    # Test syncing all languages for a video at once
+    @patch_for_test('externalsites.syncing.youtube.google', MockGoogleAPI)
+    def setUp(self, mock_google):
+        self.mock_google = mock_google
+        self.mock_google.captions_list = mock.Mock(return_value=[])
+        self.account = YouTubeAccountFactory(user=UserFactory(),
+                                             channel_id='test-channel-id')
+        self.video = YouTubeVideoFactory(channel_id='test-channel-id',
+                                         primary_audio_language_code='en')
+        TeamVideoFactory(video=self.video, team__sync_metadata=True)
+        self.video_url = self.video.get_primary_videourl_obj()
+        for language_code in ('en', 'fr', 'de'):
+            pipeline.add_subtitles(self.video, language_code,
+                                   SubtitleSetFactory(),
+                                   title='title-' + language_code)
+
+    def update_video_subtitles(self, force=False):
+        self.mock_google.reset_mock()
+        return self.account.update_video_subtitles(
+            self.video_url,
+            self.video.newsubtitlelanguage_set.having_public_versions(),
+            force)
+
+    def inserted_languages(self):
+        return set(call[0][2] for call in
+                   self.mock_google.captions_insert.call_args_list)
+
+    def test_update(self):
+        results = self.update_video_subtitles()
+        assert_equal(len(results), 3)
+        assert_true(all(success for (language, version, success) in results))
+        assert_equal(self.mock_google.captions_list.call_count, 1)
+        assert_equal(self.inserted_languages(), set(['en', 'fr', 'de']))
+        assert_equal(SyncedSubtitleVersion.objects.count(), 3)
+
+    def test_metadata_synced_once(self):
+        self.update_video_subtitles()
+        assert_equal(self.mock_google.update_video_localizations.call_count,
+                     1)
+        localizations = (
+            self.mock_google.update_video_localizations.call_args[0][3])
+        assert_equal(sorted(localizations.keys()), ['de', 'en', 'fr'])
+        assert_equal(localizations['fr'][0], 'title-fr')
+
+    def test_only_sync_stale_languages(self):
+        self.update_video_subtitles()
+        pipeline.add_subtitles(self.video, 'fr', SubtitleSetFactory())
+        self.update_video_subtitles()
+        assert_equal(self.inserted_languages(), set(['fr']))
+
+    def test_nothing_to_sync(self):
+        self.update_video_subtitles()
+        assert_equal(self.update_video_subtitles(), [])
+        assert_equal(self.mock_google.captions_list.call_count, 0)
+
+    def test_force(self):
+        self.update_video_subtitles()
+        self.update_video_subtitles(force=True)
+        assert_equal(self.inserted_languages(), set(['en', 'fr', 'de']))
+
+    def test_captions_list_error(self):
+        self.mock_google.captions_list.side_effect = ValueError()
+        results = self.update_video_subtitles()
+        assert_false(any(success for (language, version, success) in results))
+        assert_equal(SyncHistory.objects.filter(
+            result=SyncHistory.RESULT_ERROR).count(), 3)
+        assert_false(self.mock_google.captions_insert.called)
+
+    def test_access_token_error(self):
+        # If we can't get an access token, we should record an error for
+        # each language rather than letting the exception escape
+        error = externalsites.google.OAuthError('invalid_grant')
+        with mock.patch('externalsites.google.get_access_token',
+                        side_effect=error):
+            results = self.update_video_subtitles()
+        assert_false(any(success for (language, version, success) in results))
+        assert_equal(SyncHistory.objects.filter(
+            result=SyncHistory.RESULT_ERROR).count(), 3)
+        assert_false(self.mock_google.captions_list.called)
+
+class UpdateAllSubtitlesTest(TestCase):
+    def test_one_job_per_video(self):
+        account = YouTubeAccountFactory(user=UserFactory(),
+                                        channel_id='test-channel-id')
+        videos = [
+            YouTubeVideoFactory(channel_id='test-channel-id',
+                                user=account.user)
+            for i in range(2)
+        ]
+        for video in videos:
+            pipeline.add_subtitles(video, 'en', None)
+            pipeline.add_subtitles(video, 'fr', None)
+        test_utils.update_all_subtitles.original_func('Y', account.id)
+        assert_items_equal(
+            test_utils.update_video_subtitles.delay.call_args_list, [
+                mock.call('Y', account.id,
+                          video.get_primary_videourl_obj().id, False)
+                for video in videos
+            ])
@@ -1,40 +1,141 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+Recalculate Message.has_reply_for_user and has_reply_for_author
+
+The most recent message in each thread is the "tip" and should have the flag
+unset, all other messages should have it set.  We calculate this separately
+for the user side (ignoring messages with deleted_for_user set) and the author
+side (ignoring messages with deleted_for_author set).
+
+We work on chunks of threads, ordered by thread id.  For each chunk we fetch
+the data we need in 1 query, then calculate the tips in Python and run at
+most 4 UPDATE statements for the messages whose flags need to change.
+"""
+
+import datetime
+import time
+
 from django.core.management.base import BaseCommand
 from django.db.models import Q
-import logging
+
 from messages.models import Message
 
-logger = logging.getLogger(__name__)
+def calc_thread_tip_changes(rows):
+    """Calculate the has_reply_* changes for a group of threads
+
+    Args:
+        rows: list of (id, thread, created, deleted_for_user,
+            deleted_for_author, has_reply_for_user, has_reply_for_author)
+            tuples for every message in the threads.
+
+    Returns:
+        dict mapping (field_name, value) to sets of message ids that need
+        the field updated to value.
+    """
+    # map (thread id, side) to the (created, id) of the latest message
+    tips = {}
+    for (id, thread, created, deleted_for_user, deleted_for_author,
+         has_reply_for_user, has_reply_for_author) in rows:
+        thread = thread or id
+        for side, deleted in (('user', deleted_for_user),
+                              ('author', deleted_for_author)):
+            if deleted:
+                continue
+            key = (thread, side)
+            if key not in tips or (created, id) > tips[key]:
+                tips[key] = (created, id)
+    tip_ids = set((thread, side, tip[1])
+                  for (thread, side), tip in tips.items())
+
+    changes = {}
+    for (id, thread, created, deleted_for_user, deleted_for_author,
+         has_reply_for_user, has_reply_for_author) in rows:
+        thread = thread or id
+        for side, deleted, current in (
+                ('user', deleted_for_user, has_reply_for_user),
+                ('author', deleted_for_author, has_reply_for_author)):
+            if deleted:
+                continue
+            correct = (thread, side, id) not in tip_ids
+            if current != correct:
+                key = ('has_reply_for_' + side, correct)
+                changes.setdefault(key, set()).add(id)
+    return changes
+
+def update_thread_tips(thread_ids):
+    """Update the has_reply_* fields for a group of threads
+
+    Returns:
+        number of messages updated
+    """
+    rows = list(Message.objects
+                .filter(Q(thread__in=thread_ids) | Q(id__in=thread_ids))
+                .values_list('id', 'thread', 'created', 'deleted_for_user',
+                             'deleted_for_author', 'has_reply_for_user',
+                             'has_reply_for_author'))
+    changes = calc_thread_tip_changes(rows)
+    for (field_name, value), message_ids in changes.items():
+        Message.objects.filter(id__in=message_ids).update(
+            **{field_name: value})
+    return len(set(id for message_ids in changes.values()
+                   for id in message_ids))
 
 class Command(BaseCommand):
+    help = "Recalculate the thread tip fields for messages"
+
     def add_arguments(self, parser):
-        parser.add_argument('--days',
-                    action='store_true',
-                    dest='days',
-                    default=None,
-                    help='Days of history of threads to process, by default all messages in history')
+        parser.add_argument('--days', type=int, default=None,
+                            help='Only process threads with messages in '
+                            'this many days (default: all threads)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Threads to process in each batch')
+        parser.add_argument('--start-thread', type=int, default=0,
+                            help='Thread id to start at (used to resume a '
+                            'previous run)')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to sleep between batches')
 
-    def handle(self, *args, **kwargs):
+    def handle(self, **options):
         threads = Message.objects.filter(thread__isnull=False)
-        if kwargs['days'] is not None:
-            threads = threads.filter(created__gt=datetime.datetime.now() - datetime.timedelta(days=kwargs['days']))
-        threads = set(threads.values_list('thread', flat=True))
-        num_threads = len(threads)
-        self.stdout.write("Adding thread tips, found {} threads to process\n".format(num_threads))
-        processed = 0
-        for thread in threads:
-            messages = Message.objects.filter(Q(thread=thread) | Q(id=thread), deleted_for_user=False).order_by('-created')
-            if messages.count() > 0:
-                messages.update(has_reply_for_user = True)
-                last_message = messages[0]
-                last_message.has_reply_for_user = False
-                last_message.save()
-            messages = Message.objects.filter(Q(thread=thread) | Q(id=thread), deleted_for_author=False).order_by('-created')
-            if messages.count() > 0:
-                messages.update(has_reply_for_author = True)
-                last_message = messages[0]
-                last_message.has_reply_for_author = False
-                last_message.save()
-            processed += 1
-            self.stdout.write("\rProcessed {}/{} threads".format(processed, num_threads))
-            self.stdout.flush()
-        self.stdout.write('\nSuccessfully processed all threads\n')
+        if options['days'] is not None:
+            threads = threads.filter(
+                created__gt=(datetime.datetime.now() -
+                             datetime.timedelta(days=options['days'])))
+        last_thread = options['start_thread'] - 1
+        processed = updated = 0
+        start_time = time.time()
+        while True:
+            thread_ids = list(threads
+                              .filter(thread__gt=last_thread)
+                              .order_by('thread')
+                              .values_list('thread', flat=True)
+                              .distinct()[:options['batch_size']])
+            if not thread_ids:
+                break
+            updated += update_thread_tips(thread_ids)
+            processed += len(thread_ids)
+            last_thread = thread_ids[-1]
+            rate = processed / max(time.time() - start_time, 0.001)
+            self.stdout.write("processed {} threads, updated {} messages "
+                              "({:.1f} threads/s) (last thread: {})\n".format(
+                                  processed, updated, rate, last_thread))
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write('Successfully processed all threads\n')
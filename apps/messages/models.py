@@ -87,8 +87,7 @@ class MessageManager(models.Manager):
 
     def bulk_create(self, object_list, **kwargs):
         super(MessageManager, self).bulk_create(object_list, **kwargs)
-        for user_id in set(m.user_id for m in object_list):
-            User.cache.invalidate_by_pk(user_id)
+        User.cache.invalidate_many(set(m.user_id for m in object_list))
 
     def cleanup(self, days, message_type=None):
         messages_to_clean = self.get_queryset().filter(created__lte=datetime.datetime.now() - datetime.timedelta(days=days))
@@ -20,7 +20,7 @@ import re
 import textwrap
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
@@ -36,6 +36,8 @@ Notifications = Enum('Notifications', [
     ('TEAM_INVITATION', _('Team invitation')),
 ])
 
+NOTIFY_BATCH_SIZE = 500
+
 def notify_users(notification, user_list, subject, template_name,
                  context, send_email=None):
     """
@@ -67,17 +69,36 @@ def notify_users(notification, user_list, subject, template_name,
 @job
 def do_notify_users(notification, user_ids, subject, message, html_message,
                     send_email):
-    user_list = User.objects.filter(id__in=user_ids)
-    for user in user_list:
-        if not user.is_active:
-            continue
-        if should_send_email(user, send_email):
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL,
-                      [user.email], html_message=html_message)
-        if user.notify_by_message:
-            Message.objects.create(user=user, subject=subject,
-                                   message_type=SYSTEM_NOTIFICATION,
-                                   content=html_message, html_formatted=True)
+    """Send the emails/messages for notify_users()
+
+    We handle the users in chunks of NOTIFY_BATCH_SIZE.  For each chunk we
+    send the emails using a single connection and create the Message objects
+    with a single bulk_create() call.
+    """
+    connection = get_connection()
+    for i in xrange(0, len(user_ids), NOTIFY_BATCH_SIZE):
+        user_list = User.objects.filter(
+            id__in=user_ids[i:i+NOTIFY_BATCH_SIZE], is_active=True)
+        emails = []
+        messages = []
+        for user in user_list:
+            if should_send_email(user, send_email):
+                email = EmailMultiAlternatives(
+                    subject, message, settings.DEFAULT_FROM_EMAIL,
+                    [user.email], connection=connection)
+                email.attach_alternative(html_message, 'text/html')
+                emails.append(email)
+            if user.notify_by_message:
+                messages.append(Message(
+                    user=user, subject=subject,
+                    message_type=SYSTEM_NOTIFICATION, content=html_message,
+                    html_formatted=True))
+        if emails:
+            connection.send_messages(emails)
+        if messages and not getattr(settings, "MESSAGES_DISABLED", False):
+            for msg in messages:
+                msg.auto_truncate_subject()
+            Message.objects.bulk_create(messages)
 
 def should_send_email(user, send_email):
     """
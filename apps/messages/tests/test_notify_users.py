@@ -27,10 +27,16 @@ from messages.models import Message
 from utils.factories import *
 
 @pytest.fixture(autouse=True)
-def mock_send_mail(monkeypatch):
-    mock_send_mail = mock.Mock()
-    with mock.patch('messages.notify.send_mail', mock_send_mail):
-        yield mock_send_mail
+def mock_connection(monkeypatch):
+    mock_connection = mock.Mock()
+    with mock.patch('messages.notify.get_connection',
+                    mock.Mock(return_value=mock_connection)):
+        yield mock_connection
+
+def sent_emails(mock_connection):
+    return [email
+            for call in mock_connection.send_messages.call_args_list
+            for email in call[0][0]]
 
 @pytest.fixture(autouse=True)
 def setup_settings(settings):
@@ -59,7 +65,7 @@ def test_should_send_email():
     assert not notify.should_send_email(
         UserFactory(notify_by_email=True), False)
 
-def test_send_email(mock_send_mail):
+def test_send_email(mock_connection):
     """
     Templates often start with a line like "{% load i18n %}\n".  Make sure the
     newline at the end of that doesn't show up as a leading newline in the
@@ -71,11 +77,11 @@ def test_send_email(mock_send_mail):
                         'Test subject', 'tests/test-message.html', {})
 
 
-def test_text_rendering(mock_send_mail):
+def test_text_rendering(mock_connection):
     user = UserFactory(notify_by_email=True)
     notify.notify_users(notify.Notifications.ROLE_CHANGED, [user],
                         'Test subject', 'tests/test-message.html', {})
-    text = mock_send_mail.call_args[0][1]
+    text = sent_emails(mock_connection)[0].body
     assert text == """\
 Here's a link: Home (https://test.amara.org/)
 
@@ -89,7 +95,7 @@ really really really really really really really really really long
 line.
 """
 
-def test_message(mock_send_mail):
+def test_message(mock_connection):
     user = UserFactory(notify_by_message=True)
     notify.notify_users(notify.Notifications.ROLE_CHANGED, [user],
                         'Test subject', 'tests/test-message.html', {})
@@ -98,18 +104,31 @@ def test_message(mock_send_mail):
     last_message = Message.objects.for_user(user).order_by('-id')[:1].get()
     assert last_message.subject == 'Test subject'
 
-def test_notify_by_message_unset(mock_send_mail):
+def test_notify_by_message_unset(mock_connection):
     user = UserFactory(notify_by_message=False)
     notify.notify_users(notify.Notifications.ROLE_CHANGED, [user],
                         'Test subject', 'tests/test-message.html', {})
     # test that we don't send a message
     assert Message.objects.for_user(user).count() == 0
 
-def test_inactive_user(mock_send_mail):
+def test_inactive_user(mock_connection):
     user = UserFactory(notify_by_message=True, notify_by_email=True,
                        is_active=False)
     notify.notify_users(notify.Notifications.ROLE_CHANGED, [user],
                         'Test subject', 'tests/test-message.html', {})
     # test that we don't send a message or an email
     assert Message.objects.for_user(user).count() == 0
-    assert not mock_send_mail.called
+    assert not mock_connection.send_messages.called
+
+def test_batches(mock_connection, monkeypatch):
+    monkeypatch.setattr(notify, 'NOTIFY_BATCH_SIZE', 2)
+    users = [UserFactory(notify_by_message=True, notify_by_email=True)
+             for i in range(5)]
+    notify.notify_users(notify.Notifications.ROLE_CHANGED, users,
+                        'Test subject', 'tests/test-message.html', {})
+    # 3 batches: 2 users, 2 users, then 1 user
+    assert mock_connection.send_messages.call_count == 3
+    assert (sorted(email.to[0] for email in sent_emails(mock_connection)) ==
+            sorted(u.email for u in users))
+    for user in users:
+        assert Message.objects.for_user(user).count() == 1
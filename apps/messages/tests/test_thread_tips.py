@@ -0,0 +1,65 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from datetime import datetime
+
+from django.test import TestCase
+from nose.tools import *
+
+from messages.management.commands import update_thread_tips
+from messages.models import Message
+from utils.factories import *
+
+def test_calc_thread_tip_changes():
+    t1, t2, t3 = [datetime(2018, 1, 1, hour) for hour in (1, 2, 3)]
+    rows = [
+        # (id, thread, created, deleted_for_user, deleted_for_author,
+        #  has_reply_for_user, has_reply_for_author)
+        # Thread 1: message 3 is the tip, but it's deleted for the user
+        (1, None, t1, False, False, False, False),
+        (2, 1, t2, False, False, False, False),
+        (3, 1, t3, True, False, False, False),
+        # Thread 4: message 5 is the tip and the flags are already correct
+        (4, None, t1, False, False, True, True),
+        (5, 4, t2, False, False, False, False),
+    ]
+    assert_equal(update_thread_tips.calc_thread_tip_changes(rows), {
+        ('has_reply_for_user', True): set([1]),
+        ('has_reply_for_author', True): set([1, 2]),
+    })
+
+class UpdateThreadTipsTest(TestCase):
+    def test_update(self):
+        user = UserFactory()
+        author = UserFactory()
+        root = Message.objects.create(user=user, author=author,
+                                      subject='root', message_type='S')
+        reply = Message.objects.create(user=author, author=user,
+                                       subject='reply', thread=root.id,
+                                       message_type='S')
+        # Mess up the flags, then check that update_thread_tips() fixes
+        # them.
+        Message.objects.update(has_reply_for_user=False,
+                               has_reply_for_author=False)
+        assert_equal(update_thread_tips.update_thread_tips([root.id]), 1)
+        root = Message.objects.get(id=root.id)
+        reply = Message.objects.get(id=reply.id)
+        assert_equal((root.has_reply_for_user, root.has_reply_for_author),
+                     (True, True))
+        assert_equal((reply.has_reply_for_user, reply.has_reply_for_author),
+                     (False, False))
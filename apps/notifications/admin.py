@@ -36,7 +36,7 @@ class TeamNotificationSettingsForm(forms.ModelForm):
     class Meta:
         model = TeamNotificationSettings
         fields = ['team', 'type', 'url', 'auth_username', 'auth_password',
-                  'header1', 'header2', 'header3',]
+                  'header1', 'header2', 'header3', 'batch_notifications',]
 
 class TeamNotificationSettingsAdmin(admin.ModelAdmin):
     list_display = ('team', 'type', 'url',)
@@ -0,0 +1,225 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+notifications.delivery -- POST team notifications to partner endpoints
+
+The jobs in notifications.handlers create TeamNotification objects, then
+call deliver() to send them.  Partner endpoints can be slow or broken, so we
+try hard not to let one of them tie up the workers:
+
+  - Each team gets a persistent requests.Session, so notifications sent from
+    the same process reuse connections.
+  - Requests time out after TEAM_NOTIFICATION_TIMEOUT seconds.
+  - At most TEAM_NOTIFICATION_MAX_CONCURRENCY requests per team are in
+    progress at once (see utils.semaphore).  If we're over that limit, we
+    schedule the delivery for later rather than blocking the worker.
+  - Network errors and 5xx responses are retried up to
+    TEAM_NOTIFICATION_RETRIES times, with an exponential backoff starting at
+    TEAM_NOTIFICATION_RETRY_DELAY seconds.
+
+If TeamNotificationSettings.batch_notifications is set, notifications sent
+within TEAM_NOTIFICATION_BATCH_WINDOW seconds are combined into a single POST.
+The body is {"notifications": [...]}, with one item for each notification.
+
+Metrics:
+  - notifications.delivery.latency: time for each POST
+  - notifications.delivery.batch-size: notifications sent in each POST
+  - notifications.delivery.in-flight: requests in progress for the team when
+    we start a POST
+  - notifications.delivery.queue-depth: throttled and retry-pending
+    deliveries for the team when we schedule another one
+  - notifications.delivery.{success,error,throttled,retry}: counters
+"""
+
+from __future__ import absolute_import
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+import requests
+
+from caching.lru import LRUCache
+from notifications.models import TeamNotification
+from utils import metrics
+from utils.semaphore import Semaphore
+from utils.taskqueue import job
+
+METRIC_PREFIX = 'notifications.delivery.'
+# Pending deliveries are dropped from the queue depth this long after they
+# were due, in case the retry job got lost
+PENDING_EXPIRE_MARGIN = 10 * 60
+
+# maps team ids to requests.Session objects
+_sessions = LRUCache(100)
+
+def get_session(team_id):
+    session = _sessions.get(team_id)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.TEAM_NOTIFICATION_MAX_CONCURRENCY)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _sessions.set(team_id, session)
+    return session
+
+def _get_semaphore(team_id):
+    # Slots expire in case a worker dies before releasing them
+    return Semaphore('notifications:{}'.format(team_id),
+                     settings.TEAM_NOTIFICATION_MAX_CONCURRENCY,
+                     settings.TEAM_NOTIFICATION_TIMEOUT * 2 + 60)
+
+def _pending_key(team_id):
+    return 'notifications:{}:pending'.format(team_id)
+
+def _pending_ttl():
+    max_delay = max(settings.TEAM_NOTIFICATION_THROTTLE_DELAY,
+                    settings.TEAM_NOTIFICATION_RETRY_DELAY *
+                    2 ** settings.TEAM_NOTIFICATION_RETRIES)
+    return int(max_delay + PENDING_EXPIRE_MARGIN)
+
+def get_queue_depth(team_id):
+    """Get the number of throttled and retry-pending deliveries for a team"""
+    key = _pending_key(team_id)
+    pipe = get_redis_connection('storage').pipeline()
+    pipe.zremrangebyscore(key, 0, time.time())
+    pipe.zcard(key)
+    return pipe.execute()[1]
+
+def _schedule_retry(delay, team_id, notifications, url, headers,
+                    auth_username, auth_password, batched, attempt):
+    # Pending deliveries are tracked in a sorted set, like the semaphore
+    # slots, so that lost jobs don't inflate the queue depth forever.
+    token = uuid.uuid4().hex
+    now = time.time()
+    key = _pending_key(team_id)
+    pipe = get_redis_connection('storage').pipeline()
+    pipe.zremrangebyscore(key, 0, now)
+    pipe.zadd(key, now + delay + PENDING_EXPIRE_MARGIN, token)
+    pipe.zcard(key)
+    pipe.expire(key, _pending_ttl())
+    metrics.record(METRIC_PREFIX + 'queue-depth', pipe.execute()[2])
+    retry_delivery.enqueue_in(
+        delay, team_id, [n.id for n in notifications], url, headers,
+        auth_username, auth_password, batched, attempt, token)
+
+def deliver(team_id, notifications, url, headers, auth_username,
+            auth_password, batched=False, attempt=0):
+    """POST TeamNotifications to a team's URL
+
+    Args:
+        team_id: PK of the team
+        notifications: list of TeamNotification objects to send.  Unless
+            batched is True, this should only contain 1 notification.
+        url: URL to POST to
+        headers: extra headers to add to the request
+        auth_username: authentication to send with the request
+        auth_password: authentication to send with the request
+        batched: Send the notifications as a batch
+        attempt: Number of previous attempts to send the notifications
+    """
+    semaphore = _get_semaphore(team_id)
+    slot_token = semaphore.acquire()
+    if slot_token is None:
+        metrics.increment(METRIC_PREFIX + 'throttled')
+        _schedule_retry(settings.TEAM_NOTIFICATION_THROTTLE_DELAY, team_id,
+                        notifications, url, headers, auth_username,
+                        auth_password, batched, attempt)
+        return
+    metrics.record(METRIC_PREFIX + 'in-flight', semaphore.count())
+    try:
+        status_code, error_message = _post(team_id, notifications, url,
+                                           headers, auth_username,
+                                           auth_password, batched)
+    finally:
+        semaphore.release(slot_token)
+
+    TeamNotification.objects.filter(
+        id__in=[n.id for n in notifications]).update(
+            response_status=status_code, error_message=error_message)
+    for notification in notifications:
+        notification.response_status = status_code
+        notification.error_message = error_message
+
+    if error_message is None:
+        metrics.increment(METRIC_PREFIX + 'success')
+        return
+    metrics.increment(METRIC_PREFIX + 'error')
+    should_retry = status_code is None or status_code >= 500
+    if should_retry and attempt < settings.TEAM_NOTIFICATION_RETRIES:
+        metrics.increment(METRIC_PREFIX + 'retry')
+        _schedule_retry(settings.TEAM_NOTIFICATION_RETRY_DELAY * 2 ** attempt,
+                        team_id, notifications, url, headers, auth_username,
+                        auth_password, batched, attempt + 1)
+
+def _post(team_id, notifications, url, headers, auth_username,
+          auth_password, batched):
+    """Make the HTTP request for deliver()
+
+    Returns:
+        (status_code, error_message) tuple
+    """
+    if auth_username:
+        auth = HTTPBasicAuth(auth_username, auth_password)
+    else:
+        auth = None
+    if batched:
+        post_data = {
+            'notifications': [json.loads(n.data) for n in notifications],
+        }
+    else:
+        post_data = json.loads(notifications[0].data)
+    headers = headers.copy()
+    headers.update({
+        'Content-type': 'application/json',
+    })
+    metrics.record(METRIC_PREFIX + 'batch-size', len(notifications))
+    try:
+        with metrics.timer(METRIC_PREFIX + 'latency'):
+            response = get_session(team_id).post(
+                url, data=json.dumps(post_data), headers=headers, auth=auth,
+                timeout=settings.TEAM_NOTIFICATION_TIMEOUT)
+    except requests.ConnectionError:
+        return None, "Connection error"
+    except requests.Timeout:
+        return None, "Request timeout"
+    except requests.TooManyRedirects:
+        return None, "Too many redirects"
+    if response.status_code != 200:
+        return response.status_code, 'Response status: {}'.format(
+            response.status_code)
+    return response.status_code, None
+
+@job
+def retry_delivery(team_id, notification_ids, url, headers, auth_username,
+                   auth_password, batched, attempt, pending_token=None):
+    if pending_token is not None:
+        get_redis_connection('storage').zrem(_pending_key(team_id),
+                                             pending_token)
+    notifications = list(TeamNotification.objects
+                         .filter(id__in=notification_ids)
+                         .order_by('number'))
+    if notifications:
+        deliver(team_id, notifications, url, headers, auth_username,
+                auth_password, batched, attempt)
@@ -16,12 +16,11 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
-import json
 import logging
 
-from requests.auth import HTTPBasicAuth
-import requests
+from django.conf import settings
 
+from notifications import delivery
 from notifications.models import TeamNotificationSettings, TeamNotification
 from utils.taskqueue import job
 
@@ -56,15 +55,21 @@ class NotificationHandlerBase(object):
     def send_notification(self, data):
         """Send an HTTP notification
 
-        This method queues up a HTTP POST request in the do_http_post() task.
+        This method queues up a HTTP POST request in the do_http_post() task,
+        or do_batched_http_post() if the team has batch_notifications set.
 
         Args:
             data -- array of primative data to be encoded as json.
               do_http_post() will add the number field which corresponds to
               the TeamNotification.number
         """
-        do_http_post.delay(self.team.id, self.url, data, self.headers,
-                           self.auth_username, self.auth_password)
+        if self.notification_settings.batch_notifications:
+            do_batched_http_post.delay(self.team.id, self.url, [data],
+                                       self.headers, self.auth_username,
+                                       self.auth_password)
+        else:
+            do_http_post.delay(self.team.id, self.url, data, self.headers,
+                               self.auth_username, self.auth_password)
 
     def on_video_added(self, video, old_team):
         pass
@@ -121,33 +126,36 @@ def do_http_post(team_id, url, data, headers, auth_username, auth_password):
         auth_username: authentication to send with the request
         auth_password: authentication to send with the request
     """
-    if auth_username:
-        auth = HTTPBasicAuth(auth_username, auth_password)
-    else:
-        auth = None
     notification = TeamNotification.create_new(team_id, url, data)
-    post_data = data.copy()
-    post_data['number'] = notification.number
-    headers.update({
-        'Content-type': 'application/json',
-    })
-    status_code = None
-    error_message = None
-    try:
-        response = requests.post(url, data=json.dumps(post_data),
-                                 headers=headers, auth=auth)
-    except requests.ConnectionError:
-        notification.error_message = "Connection error"
-    except requests.Timeout:
-        notification.error_message = "Request timeout"
-    except requests.TooManyRedirects:
-        notification.error_message = "Too many redirects"
-    else:
-        notification.response_status = response.status_code
-        if response.status_code != 200:
-            notification.error_message = 'Response status: {}'.format(
-                response.status_code)
-    notification.save()
+    delivery.deliver(team_id, [notification], url, headers, auth_username,
+                     auth_password)
+
+def _merge_batched_calls(calls):
+    args, kwargs = calls[-1]
+    args = list(args)
+    args[2] = [event for call_args, call_kwargs in calls
+               for event in call_args[2]]
+    return args, kwargs
+
+@job(coalesce_key=lambda team_id, *args: team_id,
+     coalesce_delay=settings.TEAM_NOTIFICATION_BATCH_WINDOW,
+     coalesce_merge=_merge_batched_calls)
+def do_batched_http_post(team_id, url, events, headers, auth_username,
+                         auth_password):
+    """Handle the HTTP POST for teams with batch_notifications set
+
+    This works like do_http_post(), but calls made within
+    TEAM_NOTIFICATION_BATCH_WINDOW seconds are merged and sent in a single
+    POST.
+
+    Args:
+        events: list of data to send.  We create a TeamNotification for each
+            one.
+    """
+    notifications = [TeamNotification.create_new(team_id, url, data)
+                     for data in events]
+    delivery.deliver(team_id, notifications, url, headers, auth_username,
+                     auth_password, batched=True)
 
 # maps type strings to NotificationHandlerBase subclasses
 _registry = {}
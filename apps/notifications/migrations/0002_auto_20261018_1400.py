@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 14:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teamnotificationsettings',
+            name='batch_notifications',
+            field=models.BooleanField(default=False, help_text='Combine notifications sent within a short window into a single POST'),
+        ),
+    ]
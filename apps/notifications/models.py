@@ -37,6 +37,9 @@ class TeamNotificationSettings(models.Model):
     header1 = models.CharField(max_length=256, blank=True)
     header2 = models.CharField(max_length=256, blank=True)
     header3 = models.CharField(max_length=256, blank=True)
+    batch_notifications = models.BooleanField(
+        default=False, help_text=_('Combine notifications sent within a '
+                                   'short window into a single POST'))
 
     class Meta:
         verbose_name_plural = 'Team notification settings'
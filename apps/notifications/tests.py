@@ -20,13 +20,13 @@ from contextlib import contextmanager
 from datetime import timedelta
 from django.db.models import Max
 from django.test import TestCase
+from django.test.utils import override_settings
 from nose.tools import *
-from requests.auth import HTTPBasicAuth
-from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
+import base64
 import json
 import mock
 
-from notifications import handlers
+from notifications import delivery, handlers
 from notifications.models import TeamNotificationSettings, TeamNotification
 from notifications.tasks import REMOVE_AFTER, MIN_KEEP, prune_notification_history
 from subtitles import pipeline
@@ -322,18 +322,18 @@ class TestSendNotification(TestCase):
                                settings.get_headers(), settings.auth_username,
                                settings.auth_password))
 
+@override_settings(TEAM_NOTIFICATION_RETRIES=0)
 class TestDoHTTPPost(TestCase):
     def setUp(self):
         self.team = TeamFactory()
         self.data = {'foo': 'bar'}
-        self.url = 'http://example.com/notifications/'
         handlers.do_http_post.run_original_for_test()
         self.now = dates.now.freeze()
 
-    def check_notification(self, status_code, error_message=None):
+    def check_notification(self, url, status_code, error_message=None):
         notification = TeamNotification.objects.get(team=self.team)
         assert_equal(notification.team, self.team)
-        assert_equal(notification.url, self.url)
+        assert_equal(notification.url, url)
         assert_equal(notification.timestamp, self.now)
         assert_equal(notification.response_status, status_code)
         assert_equal(notification.error_message, error_message)
@@ -347,51 +347,136 @@ class TestDoHTTPPost(TestCase):
     def calc_post_data(self):
         post_data = self.data.copy()
         post_data['number'] = TeamNotification.next_number_for_team(self.team)
-        return json.dumps(post_data)
+        return post_data
 
     def test_http_request(self):
-        mocker = RequestsMocker()
-        mocker.expect_request(
-            'post', self.url, data=self.calc_post_data(),
-            headers={
-                'Content-type': 'application/json',
-                'extra-header': '123',
-            },
-            auth=HTTPBasicAuth('alice', '1234'),
-        )
-        with mocker:
-            handlers.do_http_post(self.team.id, self.url, self.data,
+        post_data = self.calc_post_data()
+        with StubHTTPServer() as server:
+            handlers.do_http_post(self.team.id, server.url, self.data,
                                   {'extra-header': '123'}, 'alice', '1234')
-        self.check_notification(200)
+        assert_equal(len(server.requests), 1)
+        request = server.requests[0]
+        assert_equal(request.method, 'POST')
+        assert_equal(json.loads(request.body), post_data)
+        assert_equal(request.headers['content-type'], 'application/json')
+        assert_equal(request.headers['extra-header'], '123')
+        assert_equal(request.headers['authorization'],
+                     'Basic ' + base64.b64encode('alice:1234'))
+        self.check_notification(server.url, 200)
 
     def test_status_code_error(self):
-        mocker = RequestsMocker()
-        mocker.expect_request(
-            'post', self.url, data=self.calc_post_data(),
-            headers={'Content-type': 'application/json'},
-            status_code=500,
-        )
-        with mocker:
-            handlers.do_http_post(self.team.id, self.url, self.data, {}, '', '')
-        self.check_notification(500, "Response status: 500")
-
-    def test_network_errors(self):
-        self.check_network_error(ConnectionError(), 'Connection error')
-        self.check_network_error(Timeout(), 'Request timeout')
-        self.check_network_error(TooManyRedirects(), 'Too many redirects')
-
-    def check_network_error(self, exception, error_message):
-        mocker = RequestsMocker()
-        mocker.expect_request(
-            'post', self.url, data=self.calc_post_data(),
-            headers={'Content-type': 'application/json'},
-            error=exception,
-        )
-        with mocker:
-            handlers.do_http_post(self.team.id, self.url, self.data, {}, '',
-                                  '')
-        self.check_notification(None, error_message)
-        TeamNotification.objects.all().delete()
+        with StubHTTPServer() as server:
+            server.status_code = 500
+            handlers.do_http_post(self.team.id, server.url, self.data, {},
+                                  '', '')
+        self.check_notification(server.url, 500, "Response status: 500")
+
+    def test_connection_error(self):
+        url = unused_url()
+        handlers.do_http_post(self.team.id, url, self.data, {}, '', '')
+        self.check_notification(url, None, 'Connection error')
+
+    @override_settings(TEAM_NOTIFICATION_TIMEOUT=0.1)
+    def test_timeout(self):
+        with StubHTTPServer() as server:
+            server.delay = 0.5
+            handlers.do_http_post(self.team.id, server.url, self.data, {},
+                                  '', '')
+        self.check_notification(server.url, None, 'Request timeout')
+
+    def test_too_many_redirects(self):
+        with StubHTTPServer() as server:
+            server.status_code = 302
+            server.response_headers['Location'] = server.url
+            handlers.do_http_post(self.team.id, server.url, self.data, {},
+                                  '', '')
+        self.check_notification(server.url, None, 'Too many redirects')
+
+    def test_concurrency_slot_released(self):
+        with StubHTTPServer() as server:
+            handlers.do_http_post(self.team.id, server.url, self.data, {},
+                                  '', '')
+        assert_equal(delivery._get_semaphore(self.team.id).count(), 0)
+
+    @override_settings(TEAM_NOTIFICATION_RETRIES=2)
+    def test_retry(self):
+        with StubHTTPServer() as server:
+            server.status_code = 503
+            handlers.do_http_post(self.team.id, server.url, self.data, {},
+                                  '', '')
+        # RUN_JOBS_EAGERLY is set for the tests, so the retries happen
+        # immediately
+        assert_equal(len(server.requests), 3)
+        self.check_notification(server.url, 503, "Response status: 503")
+
+    @override_settings(TEAM_NOTIFICATION_RETRIES=2)
+    @mock.patch('notifications.delivery.metrics.record')
+    def test_queue_depth(self, mock_record):
+        with StubHTTPServer() as server:
+            server.status_code = 503
+            with mock.patch.object(delivery.retry_delivery,
+                                   'enqueue_in') as enqueue_in:
+                handlers.do_http_post(self.team.id, server.url, self.data,
+                                      {}, '', '')
+            assert_equal(delivery.get_queue_depth(self.team.id), 1)
+            assert_in(mock.call('notifications.delivery.queue-depth', 1),
+                      mock_record.call_args_list)
+            # Once the retry job runs, the delivery is no longer pending
+            server.status_code = 200
+            delivery.retry_delivery(*enqueue_in.call_args[0][1:])
+        assert_equal(delivery.get_queue_depth(self.team.id), 0)
+
+    def test_no_retry_for_client_errors(self):
+        with override_settings(TEAM_NOTIFICATION_RETRIES=2):
+            with StubHTTPServer() as server:
+                server.status_code = 400
+                handlers.do_http_post(self.team.id, server.url, self.data,
+                                      {}, '', '')
+        assert_equal(len(server.requests), 1)
+
+class TestBatchedHTTPPost(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        handlers.do_batched_http_post.run_original_for_test()
+
+    def test_batch(self):
+        events = [{'event': 1}, {'event': 2}]
+        with StubHTTPServer() as server:
+            handlers.do_batched_http_post(self.team.id, server.url, events,
+                                          {}, '', '')
+        assert_equal(len(server.requests), 1)
+        assert_equal(json.loads(server.requests[0].body), {
+            'notifications': [
+                {'event': 1, 'number': 1},
+                {'event': 2, 'number': 2},
+            ]
+        })
+        assert_equal(
+            [(n.number, n.response_status) for n in
+             TeamNotification.objects.filter(team=self.team)
+             .order_by('number')],
+            [(1, 200), (2, 200)])
+
+    def test_merge_calls(self):
+        calls = [
+            ([self.team.id, 'http://example.com/', [{'event': 1}], {}, '',
+              ''], {}),
+            ([self.team.id, 'http://example.com/', [{'event': 2}], {}, '',
+              ''], {}),
+        ]
+        assert_equal(handlers._merge_batched_calls(calls), (
+            [self.team.id, 'http://example.com/',
+             [{'event': 1}, {'event': 2}], {}, '', ''], {}))
+
+    def test_send_notification_batched(self):
+        settings = TeamNotificationSettings.objects.create(
+            team=self.team, type='mock-type', url='http://example.com/',
+            batch_notifications=True)
+        handlers.NotificationHandlerBase(settings).send_notification(
+            {'foo': 'bar'})
+        assert_equal(handlers.do_batched_http_post.delay.call_args,
+                     mock.call(self.team.id, settings.url, [{'foo': 'bar'}],
+                               {}, '', ''))
 
 @mock.patch('notifications.tasks.MIN_KEEP', 100)
 @mock.patch('notifications.tasks.REMOVE_AFTER', 15)
@@ -98,7 +98,8 @@ def profile(request, user_id):
     else:
         form = None
     qs = (ActivityRecord.objects.for_user(user)
-          .select_related('video', 'team', 'user'))
+          .select_related('video', 'team', 'user')
+          .with_related_objects())
     if request.user != user:
         qs = qs.viewable_by_user(request.user)
 
@@ -130,7 +131,8 @@ def dashboard(request):
         team_activity = (ActivityRecord.objects
                          .filter(team__in=user.teams.all(), created__gt=since)
                          .exclude(user=user)
-                         .original())
+                         .original()
+                         .with_related_objects())
         user_dashboard_extra_teams = []
         for team in user.teams.all():
             if not team.is_old_style() and team.new_workflow.user_dashboard_extra:
@@ -147,7 +149,8 @@ def dashboard(request):
         video_activity = (ActivityRecord.objects
                           .filter(video__in=user.videos.all(), created__gt=since)
                           .exclude(user=user)
-                          .original())
+                          .original()
+                          .with_related_objects())
     else:
         video_activity = ActivityRecord.objects.none()
     context = {
@@ -14,4 +14,5 @@
 # 
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see 
-# http://www.gnu.org/licenses/agpl-3.0.html.
\ No newline at end of file
+# http://www.gnu.org/licenses/agpl-3.0.html.
+default_app_config = 'search.apps.SearchConfig'
@@ -20,6 +20,7 @@ from django import forms
 from django.db.models import Count
 from django.utils.translation import ugettext_lazy as _
 
+from search.index import get_backend
 from utils.translation import get_language_choices
 from videos.models import Video
 
@@ -64,16 +65,41 @@ class SearchForm(forms.Form):
         self.fields['langs'].choices = sorted_language_choices()
 
     def queryset(self):
+        return self.search()[0]
+
+    def search(self):
+        """Run the search
+
+        Returns:
+            (queryset, language_counts) tuple.  language_counts maps
+            language codes to the number of results with completed subtitles
+            in that language.  It's None if there's no query or the search
+            backend doesn't support it.  If we have language counts, we also
+            add them to the labels of the langs choices.
+        """
         q = self.data.get('q')
         video_lang = self.data.get('video_lang')
         langs = self.data.get('langs')
 
         qs = Video.objects.public()
         if q:
-            qs = qs.search(q)
+            qs, language_counts = (
+                get_backend().search_videos_with_language_counts(
+                    q, qs, language=langs or None,
+                    audio_language=video_lang or None, public_only=True))
+            if language_counts is not None:
+                self._add_language_counts(language_counts)
+            return qs, language_counts
         if video_lang:
             qs = qs.filter(primary_audio_language_code=video_lang)
         if langs:
             qs = qs.has_completed_language(langs)
 
-        return qs
+        return qs, None
+
+    def _add_language_counts(self, language_counts):
+        self.fields['langs'].choices = [
+            (code, u'{} ({})'.format(label, language_counts.get(code, 0))
+             if code else label)
+            for code, label in self.fields['langs'].choices
+        ]
@@ -0,0 +1,540 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+search.index -- Video search backends
+
+We support 2 backends, selected with the SEARCH_BACKEND setting:
+
+- ``database``: MySQL FULLTEXT search on Video.search_text.  search_text is
+  recalculated from scratch in video_changed_tasks.
+- ``inverted-index``: our own inverted index, stored in redis.  It ranks
+  results with BM25, supports filtering by team/project/language, and
+  counts the results for each language (language facets).  Since
+  it doesn't need a search service, it can be tested using mockredis.
+
+The inverted index is updated incrementally.  Each video document is split
+into parts: the ``video`` part contains the video metadata and URLs, and
+there's a ``lang:<code>`` part for the public tip of each language.  Signal
+handlers in search.signalhandlers schedule jobs to update a single part when
+something changes, so we never need to fetch all public tips for a video.
+Jobs for the same video can run at the same time, so each update is done in
+a redis transaction that watches the video's document key.
+
+The signal handlers only keep the index up to date for videos that change.
+Before switching SEARCH_BACKEND to ``inverted-index``, build the index for
+all existing videos with ``manage.py index_videos --inverted-index``.  The
+command works in batches and supports ``--checkpoint`` and ``--rate-limit``,
+so it can run against a live site.  Changes aren't sent to the index until
+SEARCH_BACKEND is switched, so run the command again after switching to pick
+up any videos that changed during the first run.
+
+Use get_backend() to get the current backend.
+
+.. autoclass:: InvertedIndex
+"""
+
+from __future__ import absolute_import
+from collections import Counter, namedtuple
+import json
+import math
+import re
+import uuid
+
+from django.conf import settings
+from django.db.models import Case, When, IntegerField
+from django_redis import get_redis_connection
+
+SearchResults = namedtuple('SearchResults',
+                           'video_ids total language_counts')
+
+_term_re = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text):
+    """Split text into a list of index terms."""
+    if not text:
+        return []
+    if isinstance(text, str):
+        text = text.decode('utf-8', 'replace')
+    return [t for t in _term_re.findall(text.lower()) if len(t) > 1]
+
+class InvertedIndex(object):
+    """Inverted index of video documents
+
+    Redis layout:
+
+    - ``<prefix>:t:<term>``: hash mapping video ids to term frequencies
+    - ``<prefix>:d:<video_id>``: hash that stores the term frequencies for
+      each part (as JSON), the document length, and the filter attributes
+    - ``<prefix>:stats``: hash storing the document count and total length,
+      which BM25 needs.
+    - ``<prefix>:a:<name>:<value>``: set of video ids for each filter
+      attribute value (team, project, audio language, completed language).
+      Private videos are stored in ``<prefix>:a:private``.  These let us
+      filter the candidates before we limit them to MAX_CANDIDATES and
+      count the results for each language.
+    - ``<prefix>:languages``: set of all language codes that have been
+      used in the ``lang`` attribute sets.
+    """
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+    # Maximum number of matching documents that we rank.  For very common
+    # terms we only rank the documents with the highest term frequencies.
+    # This is applied after filtering.
+    MAX_CANDIDATES = 5000
+
+    def __init__(self, prefix='search', connection=None):
+        self.prefix = prefix
+        self._connection = connection
+
+    @property
+    def redis(self):
+        if self._connection is None:
+            self._connection = get_redis_connection('storage')
+        return self._connection
+
+    def _term_key(self, term):
+        return u'{}:t:{}'.format(self.prefix, term).encode('utf-8')
+
+    def _doc_key(self, video_id):
+        return '{}:d:{}'.format(self.prefix, video_id)
+
+    def _stats_key(self):
+        return '{}:stats'.format(self.prefix)
+
+    def _languages_key(self):
+        return '{}:languages'.format(self.prefix)
+
+    def _attribute_key(self, name, value=None):
+        if value is None:
+            return '{}:a:{}'.format(self.prefix, name)
+        return u'{}:a:{}:{}'.format(self.prefix, name, value).encode('utf-8')
+
+    def _attribute_keys(self, attributes):
+        """Get the attribute set keys that a video belongs to."""
+        keys = set()
+        if attributes.get('team') is not None:
+            keys.add(self._attribute_key('team', attributes['team']))
+        if attributes.get('project') is not None:
+            keys.add(self._attribute_key('project', attributes['project']))
+        if not attributes.get('public', True):
+            keys.add(self._attribute_key('private'))
+        if attributes.get('audio_language'):
+            keys.add(self._attribute_key('audio',
+                                         attributes['audio_language']))
+        for code in attributes.get('languages', []):
+            keys.add(self._attribute_key('lang', code))
+        return keys
+
+    def update_part(self, video_id, part, text):
+        """Set the text for one part of a video document."""
+        self._update_term_counts(video_id, part, Counter(tokenize(text)))
+
+    def remove_part(self, video_id, part):
+        self._update_term_counts(video_id, part, Counter())
+
+    def _update_term_counts(self, video_id, part, new_counts):
+        doc_key = self._doc_key(video_id)
+        part_field = 'p:{}'.format(part)
+
+        def update(pipe):
+            # Read the current parts for the document while watching it.  If
+            # another job changes the document before we execute, redis
+            # aborts the transaction and transaction() runs this again.
+            doc = pipe.hgetall(doc_key)
+            parts = dict((field, Counter(json.loads(value)))
+                         for field, value in doc.items()
+                         if field.startswith('p:'))
+            old_counts = parts.get(part_field, Counter())
+            if old_counts == new_counts:
+                return
+            changed_terms = set(
+                term for term in set(old_counts) | set(new_counts)
+                if old_counts[term] != new_counts[term])
+            parts[part_field] = new_counts
+            length_change = (sum(new_counts.values()) -
+                             sum(old_counts.values()))
+
+            pipe.multi()
+            for term in changed_terms:
+                # Store the total frequency for all parts, rather than
+                # incrementing it, so that the posting always matches the
+                # document.
+                term_count = sum(counts[term] for counts in parts.values())
+                if term_count > 0:
+                    pipe.hset(self._term_key(term), video_id, term_count)
+                else:
+                    pipe.hdel(self._term_key(term), video_id)
+            if new_counts:
+                pipe.hset(doc_key, part_field, json.dumps(new_counts))
+            else:
+                pipe.hdel(doc_key, part_field)
+            pipe.hincrby(doc_key, 'length', length_change)
+            pipe.hincrby(self._stats_key(), 'length', length_change)
+            if 'indexed' not in doc:
+                pipe.hset(doc_key, 'indexed', 1)
+                pipe.hincrby(self._stats_key(), 'documents', 1)
+
+        self.redis.transaction(update, doc_key)
+
+    def set_attributes(self, video_id, attributes):
+        """Set the filter attributes for a video
+
+        Attributes is a dict with the following keys:
+            - team: team id or None
+            - project: project id or None
+            - public: is the video public?
+            - audio_language: primary audio language code
+            - languages: list of language codes with completed subtitles
+        """
+        doc_key = self._doc_key(video_id)
+        new_keys = self._attribute_keys(attributes)
+
+        def update(pipe):
+            old_attributes = json.loads(pipe.hget(doc_key, 'attributes') or
+                                        '{}')
+            old_keys = self._attribute_keys(old_attributes)
+            pipe.multi()
+            for key in old_keys - new_keys:
+                pipe.srem(key, video_id)
+            for key in new_keys - old_keys:
+                pipe.sadd(key, video_id)
+            if attributes.get('languages'):
+                pipe.sadd(self._languages_key(), *attributes['languages'])
+            pipe.hset(doc_key, 'attributes', json.dumps(attributes))
+
+        self.redis.transaction(update, doc_key)
+
+    def remove(self, video_id):
+        """Remove a video from the index."""
+        doc_key = self._doc_key(video_id)
+
+        def remove(pipe):
+            doc = pipe.hgetall(doc_key)
+            if not doc:
+                return
+            pipe.multi()
+            for field, value in doc.items():
+                if field.startswith('p:'):
+                    for term in json.loads(value):
+                        pipe.hdel(self._term_key(term), video_id)
+            attributes = json.loads(doc.get('attributes', '{}'))
+            for key in self._attribute_keys(attributes):
+                pipe.srem(key, video_id)
+            pipe.delete(doc_key)
+            if 'indexed' in doc:
+                pipe.hincrby(self._stats_key(), 'length',
+                             -int(doc.get('length', 0)))
+                pipe.hincrby(self._stats_key(), 'documents', -1)
+
+        self.redis.transaction(remove, doc_key)
+
+    def search(self, query, team=None, project=None, language=None,
+               audio_language=None, public_only=False,
+               with_language_counts=False):
+        """Search the index
+
+        All terms in the query must match.  Results are ranked using BM25.
+
+        Returns:
+            SearchResults tuple.  total is the number of matching videos,
+            which can be more than len(video_ids) if there were more than
+            MAX_CANDIDATES matches.  If with_language_counts is True,
+            language_counts maps language codes to the number of matching
+            videos with completed subtitles in that language, calculated
+            before the language filter is applied.  Otherwise it's None.
+        """
+        empty_counts = {} if with_language_counts else None
+        terms = list(set(tokenize(query)))
+        if not terms:
+            return SearchResults([], 0, empty_counts)
+        filter_keys = []
+        if team is not None:
+            filter_keys.append(self._attribute_key('team', team))
+        if project is not None:
+            filter_keys.append(self._attribute_key('project', project))
+        if audio_language:
+            filter_keys.append(self._attribute_key('audio', audio_language))
+        if public_only:
+            filter_keys.append(self._attribute_key('private'))
+        if language:
+            filter_keys.append(self._attribute_key('lang', language))
+        pipe = self.redis.pipeline()
+        for term in terms:
+            pipe.hgetall(self._term_key(term))
+        pipe.hmget(self._stats_key(), 'documents', 'length')
+        for key in filter_keys:
+            pipe.smembers(key)
+        if with_language_counts:
+            pipe.smembers(self._languages_key())
+        results = pipe.execute()
+        postings = dict(zip(terms, results[:len(terms)]))
+        doc_count = int(results[len(terms)][0] or 0)
+        total_length = int(results[len(terms)][1] or 0)
+        filter_sets = results[len(terms) + 1:]
+        if with_language_counts:
+            language_codes = filter_sets.pop()
+        if language:
+            language_ids = filter_sets.pop()
+        if public_only:
+            private_ids = filter_sets.pop()
+
+        # Documents must contain every term and match every filter
+        candidates = None
+        for ids in sorted([set(postings[term]) for term in terms] +
+                          filter_sets, key=len):
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return SearchResults([], 0, empty_counts)
+        if public_only:
+            candidates -= private_ids
+        if with_language_counts:
+            language_counts = self._count_languages(candidates,
+                                                    language_codes)
+        else:
+            language_counts = None
+        if language:
+            candidates &= language_ids
+        if not candidates:
+            return SearchResults([], 0, language_counts)
+
+        idf = dict((term, self._idf(doc_count, len(postings[term])))
+                   for term in terms)
+        total = len(candidates)
+        candidates = list(candidates)
+        if len(candidates) > self.MAX_CANDIDATES:
+            candidates.sort(key=lambda video_id: sum(
+                idf[term] * int(postings[term][video_id])
+                for term in terms), reverse=True)
+            candidates = candidates[:self.MAX_CANDIDATES]
+
+        pipe = self.redis.pipeline()
+        for video_id in candidates:
+            pipe.hget(self._doc_key(video_id), 'length')
+        lengths = pipe.execute()
+
+        avg_length = float(total_length) / doc_count if doc_count else 1.0
+        scores = {}
+        for video_id, length in zip(candidates, lengths):
+            scores[int(video_id)] = self._score(
+                terms, postings, idf, video_id, int(length or 0),
+                avg_length)
+        video_ids = sorted(scores, key=lambda v: (-scores[v], v))
+        return SearchResults(video_ids, total, language_counts)
+
+    def _count_languages(self, video_ids, language_codes):
+        """Count how many videos have completed subtitles in each language
+
+        We do this in redis by intersecting a temporary set of the video ids
+        with the set for each language.
+        """
+        if not video_ids or not language_codes:
+            return {}
+        language_codes = sorted(language_codes)
+        tmp_key = '{}:tmp:{}'.format(self.prefix, uuid.uuid4().hex)
+        dest_key = tmp_key + ':dest'
+        pipe = self.redis.pipeline()
+        pipe.sadd(tmp_key, *video_ids)
+        pipe.expire(tmp_key, 60)
+        for code in language_codes:
+            pipe.sinterstore(dest_key, [
+                tmp_key, self._attribute_key('lang', code)])
+        pipe.delete(tmp_key, dest_key)
+        counts = pipe.execute()[2:-1]
+        return dict((code, count)
+                    for code, count in zip(language_codes, counts)
+                    if count > 0)
+
+    def _idf(self, doc_count, doc_freq):
+        return math.log(1.0 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def _score(self, terms, postings, idf, video_id, length, avg_length):
+        score = 0.0
+        for term in terms:
+            tf = int(postings[term][video_id])
+            score += idf[term] * (tf * (self.K1 + 1)) / (
+                tf + self.K1 * (1 - self.B + self.B * length / avg_length))
+        return score
+
+def video_part_text(video):
+    """Calculate the text for the video part of a document."""
+    parts = [
+        video.title_display(),
+        video.description,
+        video.video_id,
+        video.meta_1_content,
+        video.meta_2_content,
+        video.meta_3_content,
+    ]
+    parts.extend(vurl.url for vurl in video.get_video_urls())
+    return u'\n'.join(unicode(p) for p in parts if p)
+
+def language_part_text(version):
+    """Calculate the text for a language part of a document."""
+    if version is None:
+        return u''
+    parts = [
+        version.title, version.description,
+        version.meta_1_content, version.meta_2_content,
+        version.meta_3_content,
+    ]
+    return u'\n'.join(unicode(p) for p in parts if p)
+
+def video_attributes(video):
+    team_video = video.get_team_video()
+    return {
+        'team': team_video.team_id if team_video else None,
+        'project': team_video.project_id if team_video else None,
+        'public': video.is_public,
+        'audio_language': video.primary_audio_language_code,
+        'languages': list(video.newsubtitlelanguage_set
+                          .filter(subtitles_complete=True)
+                          .values_list('language_code', flat=True)),
+    }
+
+class DatabaseSearchBackend(object):
+    """Search using MySQL FULLTEXT on Video.search_text."""
+    incremental = False
+
+    def search_videos(self, query, qs=None, team=None, project=None,
+                      language=None, audio_language=None, public_only=False):
+        from videos.models import Video
+        if qs is None:
+            qs = Video.objects.all()
+        qs = qs.search(query)
+        if team is not None:
+            qs = qs.filter(teamvideo__team_id=team)
+        if project is not None:
+            qs = qs.filter(teamvideo__project_id=project)
+        if public_only:
+            qs = qs.filter(is_public=True)
+        if audio_language:
+            qs = qs.filter(primary_audio_language_code=audio_language)
+        if language:
+            qs = qs.has_completed_language(language)
+        return qs
+
+    def search_videos_with_language_counts(self, query, qs=None, team=None,
+                                           project=None, language=None,
+                                           audio_language=None,
+                                           public_only=False):
+        """Search videos and count the results for each language
+
+        We don't support language counts, so they are always None.
+        """
+        return (self.search_videos(query, qs, team, project, language,
+                                   audio_language, public_only), None)
+
+    def on_video_changed(self, video):
+        video.update_search_index()
+
+    def on_video_metadata_changed(self, video):
+        # search_text doesn't include any of the metadata_manager fields
+        pass
+
+class InvertedIndexSearchBackend(object):
+    """Search using InvertedIndex."""
+    incremental = True
+    # Maximum number of results we return
+    MAX_RESULTS = 1000
+
+    def __init__(self):
+        self.index = InvertedIndex()
+
+    def search_videos(self, query, qs=None, team=None, project=None,
+                      language=None, audio_language=None, public_only=False):
+        results = self.index.search(query, team=team, project=project,
+                                    language=language,
+                                    audio_language=audio_language,
+                                    public_only=public_only)
+        return self._make_queryset(results, qs)
+
+    def search_videos_with_language_counts(self, query, qs=None, team=None,
+                                           project=None, language=None,
+                                           audio_language=None,
+                                           public_only=False):
+        """Search videos and count the results for each language
+
+        Returns:
+            (queryset, language_counts) tuple.  See InvertedIndex.search()
+            for how language_counts is calculated.
+        """
+        results = self.index.search(query, team=team, project=project,
+                                    language=language,
+                                    audio_language=audio_language,
+                                    public_only=public_only,
+                                    with_language_counts=True)
+        return (self._make_queryset(results, qs), results.language_counts)
+
+    def _make_queryset(self, results, qs):
+        from videos.models import Video
+        if qs is None:
+            qs = Video.objects.all()
+        video_ids = results.video_ids[:self.MAX_RESULTS]
+        if not video_ids:
+            return qs.none()
+        ranking = Case(*[When(pk=video_id, then=i)
+                         for i, video_id in enumerate(video_ids)],
+                       output_field=IntegerField())
+        return (qs.filter(pk__in=video_ids)
+                .annotate(search_rank=ranking)
+                .order_by('search_rank'))
+
+    def on_video_changed(self, video):
+        # The index gets updated by the signal handlers
+        pass
+
+    def on_video_metadata_changed(self, video):
+        # metadata_manager saves with update(), which doesn't send post_save
+        self.index.set_attributes(video.pk, video_attributes(video))
+
+    def update_video(self, video):
+        """Update the video part and attributes for a video."""
+        self.index.update_part(video.pk, 'video', video_part_text(video))
+        self.index.set_attributes(video.pk, video_attributes(video))
+
+    def update_language(self, video, language_code):
+        """Update the part for one language of a video."""
+        from subtitles.models import SubtitleVersion
+        version = (SubtitleVersion.objects.public()
+                   .filter(video=video, language_code=language_code)
+                   .order_by('-version_number').first())
+        self.index.update_part(video.pk, 'lang:{}'.format(language_code),
+                               language_part_text(version))
+        self.index.set_attributes(video.pk, video_attributes(video))
+
+    def remove_video(self, video_id):
+        self.index.remove(video_id)
+
+    def rebuild_video(self, video):
+        """Completely re-index a video."""
+        self.index.remove(video.pk)
+        self.update_video(video)
+        for tip in video.newsubtitleversion_set.public_tips():
+            self.index.update_part(
+                video.pk, 'lang:{}'.format(tip.language_code),
+                language_part_text(tip))
+
+_backends = {
+    'database': DatabaseSearchBackend,
+    'inverted-index': InvertedIndexSearchBackend,
+}
+
+def get_backend():
+    return _backends[settings.SEARCH_BACKEND]()
@@ -28,7 +28,9 @@ from videos.rpc import render_page
 class SearchApiClass(object):
     def search(self, rdata, user):
         form = SearchForm(rdata)
-        output = render_page(rdata.get('page', 1), form.queryset(), 20)
+        qs, language_counts = form.search()
+        output = render_page(rdata.get('page', 1), qs, 20)
+        output['language_counts'] = language_counts
         output['sidebar'] = render_to_string('search/_sidebar.html', {
             'form': form,
             'rdata': rdata,
@@ -0,0 +1,60 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+Keep the inverted search index up to date
+
+These handlers do nothing unless the inverted-index backend is enabled.  The
+database backend gets updated in video_changed_tasks instead.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from search import tasks
+from search.index import get_backend
+from subtitles.models import SubtitleLanguage, SubtitleVersion
+from teams.models import TeamVideo
+from videos.models import Video, VideoUrl
+
+def _incremental():
+    return get_backend().incremental
+
+@receiver(post_save, sender=Video)
+@receiver(post_save, sender=VideoUrl)
+@receiver(post_delete, sender=VideoUrl)
+@receiver(post_save, sender=TeamVideo)
+@receiver(post_delete, sender=TeamVideo)
+def on_video_changed(sender, instance, **kwargs):
+    if not _incremental():
+        return
+    video_id = instance.pk if sender is Video else instance.video_id
+    tasks.update_video_index.delay(video_id)
+
+@receiver(post_delete, sender=Video)
+def on_video_deleted(sender, instance, **kwargs):
+    if _incremental():
+        tasks.remove_video_from_index.delay(instance.pk)
+
+@receiver(post_save, sender=SubtitleVersion)
+@receiver(post_save, sender=SubtitleLanguage)
+@receiver(post_delete, sender=SubtitleLanguage)
+def on_language_changed(sender, instance, **kwargs):
+    if _incremental():
+        tasks.update_language_index.delay(instance.video_id,
+                                          instance.language_code)
@@ -0,0 +1,51 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from search.index import get_backend
+from utils.taskqueue import job
+from videos.models import Video
+
+def _get_video(video_id):
+    try:
+        return Video.objects.get(pk=video_id)
+    except Video.DoesNotExist:
+        return None
+
+@job
+def update_video_index(video_id):
+    """Update the video part of the search index for a video."""
+    video = _get_video(video_id)
+    if video is not None:
+        get_backend().update_video(video)
+
+@job
+def update_language_index(video_id, language_code):
+    """Update the search index for one language of a video."""
+    video = _get_video(video_id)
+    if video is not None:
+        get_backend().update_language(video, language_code)
+
+@job
+def remove_video_from_index(video_id):
+    get_backend().remove_video(video_id)
+
+@job
+def rebuild_video_index(video_id):
+    video = _get_video(video_id)
+    if video is not None:
+        get_backend().rebuild_video(video)
@@ -0,0 +1,194 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+
+from __future__ import absolute_import
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from nose.tools import *
+import mock
+
+from search.index import InvertedIndex, get_backend, tokenize
+from utils.factories import *
+
+class TokenizeTest(TestCase):
+    def test_tokenize(self):
+        assert_equal(tokenize(u'Hello, World! a 123'),
+                     [u'hello', u'world', u'123'])
+        assert_equal(tokenize(u'Caf\xe9 ol\xe9'), [u'caf\xe9', u'ol\xe9'])
+        assert_equal(tokenize(None), [])
+
+class InvertedIndexTest(TestCase):
+    def setUp(self):
+        self.index = InvertedIndex(prefix='test-search')
+
+    def add(self, video_id, text, **attributes):
+        self.index.update_part(video_id, 'video', text)
+        self.index.set_attributes(video_id, attributes)
+
+    def test_all_terms_must_match(self):
+        self.add(1, 'cats and dogs')
+        self.add(2, 'cats only')
+        assert_items_equal(self.index.search('cats').video_ids, [1, 2])
+        assert_equal(self.index.search('cats dogs').video_ids, [1])
+        assert_equal(self.index.search('birds').video_ids, [])
+        assert_equal(self.index.search('').video_ids, [])
+
+    def test_ranking(self):
+        self.add(1, 'cats ' + 'filler ' * 20)
+        self.add(2, 'cats cats cats')
+        self.add(3, 'dogs')
+        assert_equal(self.index.search('cats').video_ids, [2, 1])
+
+    def test_rare_terms_rank_higher(self):
+        self.add(1, 'cats dogs')
+        self.add(2, 'cats cats fish')
+        self.add(3, 'dogs')
+        self.add(4, 'dogs')
+        # fish only matches once, so it counts more than dogs
+        assert_equal(self.index.search('cats fish').video_ids, [2])
+        assert_equal(self.index.search('cats').video_ids[0], 2)
+
+    def test_update_part(self):
+        self.add(1, 'cats')
+        self.index.update_part(1, 'video', 'dogs')
+        assert_equal(self.index.search('cats').video_ids, [])
+        assert_equal(self.index.search('dogs').video_ids, [1])
+
+    def test_multiple_parts(self):
+        self.add(1, 'cats')
+        self.index.update_part(1, 'lang:fr', 'chats')
+        assert_equal(self.index.search('cats chats').video_ids, [1])
+        self.index.remove_part(1, 'lang:fr')
+        assert_equal(self.index.search('chats').video_ids, [])
+        assert_equal(self.index.search('cats').video_ids, [1])
+
+    def test_remove(self):
+        self.add(1, 'cats')
+        self.add(2, 'cats')
+        self.index.remove(1)
+        assert_equal(self.index.search('cats').video_ids, [2])
+
+    def test_filters(self):
+        self.add(1, 'cats', team=1, project=10, public=True,
+                 audio_language='en', languages=['en', 'fr'])
+        self.add(2, 'cats', team=2, project=20, public=False,
+                 audio_language='fr', languages=['fr'])
+        assert_equal(self.index.search('cats', team=1).video_ids, [1])
+        assert_equal(self.index.search('cats', project=20).video_ids, [2])
+        assert_equal(self.index.search('cats', public_only=True).video_ids,
+                     [1])
+        assert_equal(self.index.search('cats',
+                                       audio_language='fr').video_ids, [2])
+        assert_equal(self.index.search('cats', language='en').video_ids,
+                     [1])
+
+    def test_filters_applied_before_limit(self):
+        # Video 2 doesn't make the global top MAX_CANDIDATES, but it should
+        # still be found when we filter by its team.
+        self.add(1, 'cats cats cats', team=1)
+        self.add(2, 'cats', team=2)
+        with mock.patch.object(InvertedIndex, 'MAX_CANDIDATES', 1):
+            assert_equal(self.index.search('cats').video_ids, [1])
+            assert_equal(self.index.search('cats').total, 2)
+            assert_equal(self.index.search('cats', team=2).video_ids, [2])
+
+    def test_attribute_changes(self):
+        self.add(1, 'cats', team=1, public=False, languages=['en'])
+        self.index.set_attributes(1, {'team': 2, 'public': True,
+                                      'languages': ['fr']})
+        assert_equal(self.index.search('cats', team=1).video_ids, [])
+        assert_equal(self.index.search('cats', team=2).video_ids, [1])
+        assert_equal(self.index.search('cats', public_only=True).video_ids,
+                     [1])
+        assert_equal(self.index.search('cats', language='en').video_ids, [])
+        assert_equal(self.index.search('cats', language='fr').video_ids, [1])
+        self.index.remove(1)
+        assert_equal(self.index.redis.smembers('test-search:a:team:2'),
+                     set())
+
+    def test_language_counts(self):
+        self.add(1, 'cats', languages=['en', 'fr'])
+        self.add(2, 'cats', languages=['fr'])
+        self.add(3, 'cats dogs', languages=['de'])
+        results = self.index.search('cats', language='fr',
+                                    with_language_counts=True)
+        assert_items_equal(results.video_ids, [1, 2])
+        # counts are calculated before the language filter
+        assert_equal(results.language_counts, {'en': 1, 'fr': 2, 'de': 1})
+        assert_equal(self.index.search(
+            'dogs', with_language_counts=True).language_counts, {'de': 1})
+        assert_equal(self.index.search('cats').language_counts, None)
+
+    def test_concurrent_update(self):
+        # Simulate another job changing the document while we're updating
+        # it.  The transaction should be retried with the new data.
+        self.add(1, 'cats')
+        real_hgetall = self.index.redis.hgetall
+        def hgetall(key):
+            rv = real_hgetall(key)
+            if not hgetall.called:
+                hgetall.called = True
+                self.index.update_part(1, 'lang:fr', 'cats chats')
+            return rv
+        hgetall.called = False
+        with mock.patch.object(self.index.redis, 'hgetall', hgetall):
+            self.index.update_part(1, 'video', 'cats dogs')
+        assert_equal(self.index.redis.hget('test-search:t:cats', 1), '2')
+        assert_equal(self.index.search('cats chats dogs').video_ids, [1])
+        assert_equal(self.index.redis.hget('test-search:d:1', 'length'), '4')
+
+@override_settings(SEARCH_BACKEND='inverted-index')
+class InvertedIndexBackendTest(TestCase):
+    def setUp(self):
+        self.backend = get_backend()
+
+    def search(self, query, **kwargs):
+        return list(self.backend.search_videos(query, **kwargs))
+
+    def test_video_changes(self):
+        video = VideoFactory(title='Cats and dogs')
+        assert_equal(self.search('cats'), [video])
+        video.title = 'Fish'
+        video.save()
+        assert_equal(self.search('cats'), [])
+        assert_equal(self.search('fish'), [video])
+        video.delete()
+        assert_equal(self.search('fish'), [])
+
+    def test_subtitle_metadata(self):
+        video = VideoFactory(title='Cats')
+        make_version(video, 'fr', title='Chats')
+        assert_equal(self.search('chats'), [video])
+        assert_equal(self.search('chats', language='fr'), [video])
+        assert_equal(self.search('chats', language='de'), [])
+
+    def test_language_counts(self):
+        video = VideoFactory(title='Cats')
+        make_version(video, 'fr', title='Chats')
+        qs, language_counts = self.backend.search_videos_with_language_counts(
+            'cats')
+        assert_equal(list(qs), [video])
+        assert_equal(language_counts, {'fr': 1})
+
+    def test_team_filter(self):
+        team_video = TeamVideoFactory(video__title='Cats')
+        VideoFactory(title='Cats')
+        assert_equal(self.search('cats', team=team_video.team_id),
+                     [team_video.video])
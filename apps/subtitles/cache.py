@@ -16,25 +16,220 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+import copy
+import hashlib
+import marshal
+import zlib
+
+import babelsubs
+from babelsubs.storage import SubtitleSet
+from django.conf import settings
 from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from caching.lru import LRUCache
+from utils import metrics
+from utils.compress import to_bytes
 
 TIMEOUT = 60 * 60 * 24 * 5 # 5 days
 
+# Increment this if the format we store parsed subtitles in changes
+PARSED_SUBTITLES_FORMAT = 2
+PARSED_SUBTITLES_METRIC = 'subtitles.parsed-cache.'
 
-def _lang_is_synced_id(language, public):
-    if public:
-        return u"language-%s-timing-complete-public" % (language.pk,)
-    else:
-        return u"language-%s-timing-complete-private" % (language.pk,)
+# Increment this if the way we render subtitles changes.  This also changes
+# the ETags that we send for rendered subtitles.
+RENDERED_SUBTITLES_FORMAT = 1
+RENDERED_SUBTITLES_METRIC = 'subtitles.render-cache.'
+# Formats to render ahead of time when subtitles are published (if the
+# PRERENDER_SUBTITLES_ON_PUBLISH setting is enabled)
+PRERENDERED_FORMATS = ['srt', 'vtt', 'dfxp', 'sbv', 'ssa', 'txt']
+
+_parsed_subtitles = LRUCache(settings.PARSED_SUBTITLES_LRU_SIZE)
+
+
+# The synced flags for all languages of a video are stored in a single redis
+# hash, so that pages that list many languages can fetch them all at once.
+# The hash fields are "<language_id>:public" and "<language_id>:private".
+def _video_is_synced_id(video_id):
+    return u"video-{}-languages-synced".format(video_id)
+
+def _is_synced_field(language_id, public):
+    return u"{}:{}".format(language_id, 'public' if public else 'private')
+
+def _redis():
+    return get_redis_connection('default')
 
 def invalidate_language_cache(language):
-    cache.delete(_lang_is_synced_id(language, True))
-    cache.delete(_lang_is_synced_id(language, False))
+    _redis().hdel(_video_is_synced_id(language.video_id),
+                  _is_synced_field(language.id, True),
+                  _is_synced_field(language.id, False))
 
 def get_is_synced(language, public):
-    cache_key = _lang_is_synced_id(language, public)
-    return cache.get(cache_key)
+    value = _redis().hget(_video_is_synced_id(language.video_id),
+                          _is_synced_field(language.id, public))
+    if value is None:
+        return None
+    return value == '1'
 
 def set_is_synced(language, public, value):
-    cache_key = _lang_is_synced_id(language, public)
-    cache.set(cache_key, value, TIMEOUT)
+    key = _video_is_synced_id(language.video_id)
+    pipe = _redis().pipeline()
+    pipe.hset(key, _is_synced_field(language.id, public),
+              '1' if value else '0')
+    pipe.expire(key, TIMEOUT)
+    pipe.execute()
+
+def fetch_is_synced(languages):
+    """Fetch the synced flags for a list of languages
+
+    This fetches the flags for each video with a single round trip, then
+    stores them on the languages so that SubtitleLanguage.is_synced() doesn't
+    need to check the cache again.  Flags that aren't in the cache are
+    calculated and stored the first time is_synced() is called.
+    """
+    video_ids = list(set(language.video_id for language in languages))
+    if not video_ids:
+        return
+    pipe = _redis().pipeline()
+    for video_id in video_ids:
+        pipe.hgetall(_video_is_synced_id(video_id))
+    flags_by_video_id = dict(zip(video_ids, pipe.execute()))
+    for language in languages:
+        flags = flags_by_video_id[language.video_id]
+        for public in (True, False):
+            value = flags.get(_is_synced_field(language.id, public))
+            if value is not None:
+                language.set_is_synced_cache(public, value == '1')
+
+def _parsed_subtitles_id(version):
+    return u"version-{}-parsed-subtitles-{}-{}".format(
+        version.pk, PARSED_SUBTITLES_FORMAT, _subtitles_checksum(version))
+
+def get_parsed_subtitles(version, parse_func):
+    """Get the parsed SubtitleSet for a version
+
+    The parsed data is stored by version id and a checksum of the stored
+    subtitle data.  SubtitleVersions normally don't change once saved, but
+    if set_subtitles() is called on a saved version, the key changes, so no
+    process can return the old subtitles.  This means we never need to
+    invalidate the cache.  We use 2 tiers:
+
+      - A process-local LRU cache that stores the SubtitleSet itself.  Hits
+        there skip XML parsing completely.
+      - The shared cache, which stores the subtitle tuples, marshalled and
+        zlib compressed.  Hits there rebuild the SubtitleSet with
+        SubtitleSet.from_list() rather than running the DFXP parser on the
+        whole document.  If the tuples don't round-trip (for example
+        because the subtitles have document-level metadata), we store the
+        normalized XML instead.
+
+    Args:
+        version: saved SubtitleVersion
+        parse_func: function to parse the subtitles on a cache miss
+
+    Returns:
+        A copy of the cached SubtitleSet, so callers can modify it freely.
+    """
+    cache_key = _parsed_subtitles_id(version)
+    subtitles = _parsed_subtitles.get(cache_key)
+    if subtitles is not None:
+        metrics.increment(PARSED_SUBTITLES_METRIC + 'local-hit')
+        return copy.deepcopy(subtitles)
+    data = cache.get(cache_key)
+    if data is not None:
+        metrics.increment(PARSED_SUBTITLES_METRIC + 'shared-hit')
+        subtitles = _load_parsed_subtitles(version.language_code, data)
+    else:
+        metrics.increment(PARSED_SUBTITLES_METRIC + 'miss')
+        subtitles = parse_func()
+        cache.set(cache_key,
+                  _dump_parsed_subtitles(version.language_code, subtitles),
+                  TIMEOUT)
+    _parsed_subtitles.set(cache_key, subtitles)
+    return copy.deepcopy(subtitles)
+
+def _dump_parsed_subtitles(language_code, subtitles):
+    xml = subtitles.to_xml()
+    items = [tuple(item) for item in subtitles.subtitle_items()]
+    try:
+        rebuilt = SubtitleSet.from_list(language_code, items)
+        if rebuilt.to_xml() == xml:
+            return zlib.compress(marshal.dumps(('items', items)))
+    except ValueError:
+        # marshal can't handle something in the subtitle metadata
+        pass
+    if isinstance(xml, unicode):
+        xml = xml.encode('utf-8')
+    return zlib.compress(marshal.dumps(('xml', xml)))
+
+def _load_parsed_subtitles(language_code, data):
+    kind, payload = marshal.loads(zlib.decompress(data))
+    if kind == 'items':
+        return SubtitleSet.from_list(language_code, payload)
+    else:
+        return SubtitleSet(language_code, initial_data=payload)
+
+def get_parsed_subtitles_stats():
+    """Get the hit/miss counts for get_parsed_subtitles() in this process."""
+    return metrics.get_counts(PARSED_SUBTITLES_METRIC)
+
+def _subtitles_checksum(version):
+    # Short hash of the stored subtitle data.  Including this in the cache
+    # keys and ETag means that they change if set_subtitles() is called on a
+    # saved version.
+    data = to_bytes(version.serialized_subtitles)
+    return hashlib.sha1(data).hexdigest()[:16]
+
+def _rendered_subtitles_id(version, format):
+    return u"version-{}-rendered-{}-{}-{}".format(
+        version.pk, format, RENDERED_SUBTITLES_FORMAT,
+        _subtitles_checksum(version))
+
+def _render_subtitles(version, format):
+    rendered = babelsubs.to(version.get_subtitles(), format,
+                            language=version.language_code)
+    if isinstance(rendered, unicode):
+        rendered = rendered.encode('utf-8')
+    return rendered
+
+def get_rendered_subtitles(version, format):
+    """Get the subtitles for a version rendered in a babelsubs format
+
+    Rendered subtitles are stored by (version id, format, checksum of the
+    subtitle data).  They are calculated lazily here, or ahead of time by the
+    prerender_subtitles job.
+
+    Returns:
+        rendered subtitles as a UTF-8 bytestring
+    """
+    if not version.pk:
+        return _render_subtitles(version, format)
+    cache_key = _rendered_subtitles_id(version, format)
+    rendered = cache.get(cache_key)
+    if rendered is not None:
+        metrics.increment(RENDERED_SUBTITLES_METRIC + 'hit')
+        return rendered
+    metrics.increment(RENDERED_SUBTITLES_METRIC + 'miss')
+    rendered = _render_subtitles(version, format)
+    cache.set(cache_key, rendered, TIMEOUT)
+    return rendered
+
+def prerender_subtitles(version, formats=None):
+    """Render and store subtitles for a version in multiple formats."""
+    if formats is None:
+        formats = PRERENDERED_FORMATS
+    cache.set_many(dict(
+        (_rendered_subtitles_id(version, format),
+         _render_subtitles(version, format))
+        for format in formats
+    ), TIMEOUT)
+
+def rendered_subtitles_etag(version, format):
+    """Get a strong ETag for the output of get_rendered_subtitles()
+
+    Since this is only based on the version id, format, and the stored
+    subtitle data, it can be checked without fetching the rendered subtitles.
+    """
+    return '"{}-{}-{}-{}"'.format(version.pk, format, RENDERED_SUBTITLES_FORMAT,
+                                  _subtitles_checksum(version))
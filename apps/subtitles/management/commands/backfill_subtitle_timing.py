@@ -0,0 +1,61 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from subtitles.models import SubtitleVersion
+
+class Command(BaseCommand):
+    help = ("Calculate first_start_time, last_end_time and synced_duration "
+            "for SubtitleVersions created before we stored them")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--start-id', type=int, default=0,
+                            help='SubtitleVersion id to start at (used to '
+                            'resume a previous run)')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to sleep between batches')
+
+    def handle(self, **options):
+        last_id = options['start_id'] - 1
+        count = 0
+        while True:
+            batch = list(SubtitleVersion.objects
+                         .filter(id__gt=last_id, synced_duration__isnull=True)
+                         .order_by('id')
+                         .only('id', 'language_code', 'serialized_subtitles')
+                         [:options['batch_size']])
+            if not batch:
+                break
+            for version in batch:
+                # Use _parse_subtitles() directly to avoid filling up the
+                # parsed subtitles cache
+                version.update_timing_stats(version._parse_subtitles())
+                SubtitleVersion.objects.filter(id=version.id).update(
+                    first_start_time=version.first_start_time,
+                    last_end_time=version.last_end_time,
+                    synced_duration=version.synced_duration)
+            count += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write("updated {} versions (last id: {})\n".format(
+                count, last_id))
+            if options['sleep']:
+                time.sleep(options['sleep'])
@@ -0,0 +1,63 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from subtitles.models import SubtitleVersion
+from utils.compress import compress, decompress, get_codec_name
+
+class Command(BaseCommand):
+    help = ("Re-encode SubtitleVersion.serialized_subtitles with the "
+            "SUBTITLE_STORAGE_CODEC codec")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--start-id', type=int, default=0,
+                            help='SubtitleVersion id to start at (used to '
+                            'resume a previous run)')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to sleep between batches')
+
+    def handle(self, **options):
+        codec = settings.SUBTITLE_STORAGE_CODEC
+        last_id = options['start_id'] - 1
+        checked = reencoded = 0
+        while True:
+            batch = list(SubtitleVersion.objects
+                         .filter(id__gt=last_id)
+                         .order_by('id')
+                         .values_list('id', 'serialized_subtitles')
+                         [:options['batch_size']])
+            if not batch:
+                break
+            for version_id, data in batch:
+                if get_codec_name(data) != codec:
+                    SubtitleVersion.objects.filter(id=version_id).update(
+                        serialized_subtitles=compress(decompress(data),
+                                                      codec=codec))
+                    reencoded += 1
+            checked += len(batch)
+            last_id = batch[-1][0]
+            self.stdout.write("checked {} versions, re-encoded {} "
+                              "(last id: {})\n".format(checked, reencoded,
+                                                       last_id))
+            if options['sleep']:
+                time.sleep(options['sleep'])
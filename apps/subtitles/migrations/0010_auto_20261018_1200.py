@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subtitles', '0009_auto_20181116_1554'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subtitleversion',
+            name='serialized_subtitles',
+            field=models.BinaryField(),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 13:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subtitles', '0010_auto_20261018_1200'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subtitleversion',
+            name='first_start_time',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='subtitleversion',
+            name='last_end_time',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='subtitleversion',
+            name='synced_duration',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
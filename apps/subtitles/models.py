@@ -152,7 +152,7 @@ def get_lineage(parents):
 # SubtitleLanguages -----------------------------------------------------------
 class SubtitleLanguagageQuerySet(query.QuerySet):
     def fetch_and_join(self, public_tips=False, private_tips=False,
-                       video=None):
+                       video=None, is_synced=False):
         """Fetch languages and join them to related models.
 
         This method is an efficient way to fetch languages under a couple
@@ -166,6 +166,8 @@ class SubtitleLanguagageQuerySet(query.QuerySet):
         :param public_tips: set the public tip cache for fetched languages
         :param private_tips: set the private tip cache for fetched languages
         :param video: set the cached video for all languages/versions fetched
+        :param is_synced: fetch the cached is_synced() values for all
+            languages fetched
         :returns: list of SubtitleLanguage objects
         """
         langs = list(self)
@@ -186,6 +188,8 @@ class SubtitleLanguagageQuerySet(query.QuerySet):
             join_tips(SubtitleVersion.objects.public_tips(), 'public')
         if private_tips:
             join_tips(SubtitleVersion.objects.private_tips(), 'extant')
+        if is_synced:
+            cache.fetch_is_synced(langs)
 
         return langs
 
@@ -442,6 +446,7 @@ class SubtitleLanguage(models.Model):
     def __init__(self, *args, **kwargs):
         super(SubtitleLanguage, self).__init__(*args, **kwargs)
         self._tip_cache = {}
+        self._is_synced_cache = {}
         self._translation_source_version_cache = {}
         self._frozen = False
 
@@ -766,6 +771,7 @@ class SubtitleLanguage(models.Model):
 
     def clear_tip_cache(self):
         self._tip_cache = {}
+        self._is_synced_cache = {}
 
     def first_public_version(self):
         """Returns the very fist version to be made public of none"""
@@ -931,12 +937,23 @@ EXISTS(
         return self.get_metadata().convert_for_display()
 
     def is_synced(self, public=True):
+        if public in self._is_synced_cache:
+            return self._is_synced_cache[public]
         value = cache.get_is_synced(self, public)
         if value is None:
             value = self.get_tip(public=public).is_synced()
             cache.set_is_synced(self, public, value)
+        self.set_is_synced_cache(public, value)
         return value
 
+    def set_is_synced_cache(self, public, value):
+        """Set the cached value for is_synced()
+
+        This is used by subtitles.cache.fetch_is_synced() to fill in the
+        values for many languages at once.
+        """
+        self._is_synced_cache[public] = value
+
     def nuke_language(self):
         """Delete all SubtitleVersions for this language, as well as all
         SubtitleVersions for dependent languages.
@@ -1340,7 +1357,8 @@ class SubtitleVersionManager(models.Manager):
 
     def fetch_for_languages(self, languages, select_related=None,
                             prefetch_related=None, order_by=None,
-                            public_only=False, video=None):
+                            public_only=False, video=None,
+                            fetch_is_synced=False):
         """Fetch all versions for a list of languages
 
         This method is an efficient way to fetch all versions for a list of
@@ -1360,6 +1378,9 @@ class SubtitleVersionManager(models.Manager):
             video: Video to set for all versions/languages.  Use this if you
                 know that they all belong to a single video to avoid some DB
                 queries.
+            fetch_is_synced: Also fetch the cached is_synced() values for the
+                languages.  This uses a single cache round trip for each
+                video.
 
         Returns:
             dict mapping language IDs -> version objects
@@ -1401,6 +1422,8 @@ class SubtitleVersionManager(models.Manager):
                 if not public_only:
                     language.set_tip_cache('extant', last_version(extant))
                 language.set_tip_cache('public', last_version(public))
+        if fetch_is_synced:
+            cache.fetch_is_synced(languages)
         return rv
 
 ORIGIN_API = 'api'
@@ -1427,6 +1450,34 @@ SUBTITLE_VERSION_ORIGINS = (
     (ORIGIN_MANAGEMENT_PAGE, _("Management Page")),
 )
 
+def calc_timing_stats(subtitles):
+    """Calculate timing stats for a SubtitleSet
+
+    Returns:
+        (first_start_time, last_end_time, synced_duration) tuple.
+        first_start_time is the first start time in the subtitles (or the
+        first end time if a subtitle somehow has an end time but no start
+        time).  last_end_time is calculated in the same way, from the end.
+        synced_duration is the total duration of the fully synced
+        subtitles.  first_start_time and last_end_time are None if there's
+        no timing info.
+    """
+    first_start_time = last_end_time = None
+    synced_duration = 0
+    for sub in subtitles:
+        if first_start_time is None:
+            if sub.start_time is not None:
+                first_start_time = sub.start_time
+            elif sub.end_time is not None:
+                first_start_time = sub.end_time
+        if sub.end_time is not None:
+            last_end_time = sub.end_time
+        elif sub.start_time is not None:
+            last_end_time = sub.start_time
+        if sub.start_time is not None and sub.end_time is not None:
+            synced_duration += max(sub.end_time - sub.start_time, 0)
+    return first_start_time, last_end_time, synced_duration
+
 class SubtitleVersion(models.Model):
     """SubtitleVersions are the equivalent of a 'changeset' in a VCS.
 
@@ -1501,6 +1552,13 @@ class SubtitleVersion(models.Model):
     # Denormalized count of the number of subtitles this version contains, for
     # easier filtering later.
     subtitle_count = models.PositiveIntegerField(default=0)
+    # Denormalized timing info, calculated in set_subtitles() so that billing
+    # doesn't need to parse the subtitles.  All times are in milliseconds.
+    # synced_duration is NULL for versions that haven't been calculated yet
+    # (see the backfill_subtitle_timing command).
+    first_start_time = models.PositiveIntegerField(null=True, blank=True)
+    last_end_time = models.PositiveIntegerField(null=True, blank=True)
+    synced_duration = models.PositiveIntegerField(null=True, blank=True)
 
     created = models.DateTimeField(editable=False)
 
@@ -1508,10 +1566,10 @@ class SubtitleVersion(models.Model):
     meta_2_content = metadata.MetadataContentField()
     meta_3_content = metadata.MetadataContentField()
 
-    # Subtitles are stored in a text blob, serialized as base64'ed zipped XML
-    # (oh the joys of Django).  Use the subtitles property to get and set them.
-    # You shouldn't be touching this field.
-    serialized_subtitles = models.TextField()
+    # Subtitles are stored in a binary blob, as compressed XML (see
+    # utils.compress).  Use get_subtitles() and set_subtitles() to get and set
+    # them.  You shouldn't be touching this field.
+    serialized_subtitles = models.BinaryField()
 
     # Lineage is stored as a blob of JSON to save on DB rows.  You shouldn't
     # need to touch this field yourself, use the lineage property.
@@ -1539,14 +1597,34 @@ class SubtitleVersion(models.Model):
         """
         # We cache the parsed subs for speed.
         if self._subtitles == None:
-            self._subtitles = load_from(decompress(self.serialized_subtitles),
-                    type='dfxp').to_internal()
-            # force the subtitles to have the correct language code.  For a
-            # while we had a bug where we always set to to "en"
-            self._subtitles.set_language(self.language_code)
+            if self.pk:
+                self._subtitles = cache.get_parsed_subtitles(
+                    self, self._parse_subtitles)
+            else:
+                self._subtitles = self._parse_subtitles()
 
         return self._subtitles
 
+    def _parse_subtitles(self):
+        subtitles = load_from(decompress(self.serialized_subtitles),
+                              type='dfxp').to_internal()
+        # force the subtitles to have the correct language code.  For a
+        # while we had a bug where we always set to to "en"
+        subtitles.set_language(self.language_code)
+        return subtitles
+
+    def get_rendered_subtitles(self, format):
+        """Get our subtitles rendered as a UTF-8 bytestring
+
+        Args:
+            format: babelsubs format name (srt, vtt, dfxp, etc.)
+        """
+        return cache.get_rendered_subtitles(self, format)
+
+    def rendered_subtitles_etag(self, format):
+        """Get an ETag for the output of get_rendered_subtitles()"""
+        return cache.rendered_subtitles_etag(self, format)
+
     def set_subtitles(self, subtitles):
         """Set the SubtitleSet for this version.
 
@@ -1575,12 +1653,37 @@ class SubtitleVersion(models.Model):
                                 % str(type(subtitles)))
 
         self.subtitle_count = len(subtitles)
-        self.serialized_subtitles = compress(subtitles.to_xml())
+        self.update_timing_stats(subtitles)
+        self.serialized_subtitles = compress(
+            subtitles.to_xml(), codec=settings.SUBTITLE_STORAGE_CODEC)
 
         # We cache the parsed subs for speed.
         self._subtitles = subtitles
 
 
+    def update_timing_stats(self, subtitles):
+        """Update first_start_time, last_end_time and synced_duration
+
+        This doesn't save the version.
+        """
+        (self.first_start_time, self.last_end_time,
+         self.synced_duration) = calc_timing_stats(subtitles)
+
+    def ensure_timing_stats(self):
+        """Make sure the timing stats are calculated
+
+        This handles versions created before we stored the stats.  We
+        calculate them from the subtitles and save them.
+        """
+        if self.synced_duration is not None:
+            return
+        self.update_timing_stats(self.get_subtitles())
+        if self.pk:
+            SubtitleVersion.objects.filter(pk=self.pk).update(
+                first_start_time=self.first_start_time,
+                last_end_time=self.last_end_time,
+                synced_duration=self.synced_duration)
+
     def get_lineage(self):
         # We cache the parsed lineage for speed.
         if self._lineage == None:
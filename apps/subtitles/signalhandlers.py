@@ -0,0 +1,28 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.conf import settings
+from django.dispatch import receiver
+
+from subtitles import tasks
+from subtitles.signals import subtitles_published
+
+@receiver(subtitles_published)
+def on_subtitles_published(sender, version=None, **kwargs):
+    if settings.PRERENDER_SUBTITLES_ON_PUBLISH and version is not None:
+        tasks.prerender_subtitles.delay(version.pk)
@@ -0,0 +1,192 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+
+from django.test import TestCase
+from nose.tools import *
+import mock
+
+from caching import lru
+from subtitles import cache
+from subtitles.models import SubtitleLanguage, SubtitleVersion
+from subtitles.tests.utils import make_subtitle_set
+from utils import metrics
+from utils.factories import *
+
+class ParsedSubtitlesCacheTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        self.subtitles = make_subtitle_set('en')
+        self.version = make_version(self.video, 'en',
+                                    subtitle_set=self.subtitles)
+
+    def get_subtitles(self):
+        # fetch a new SubtitleVersion so that we don't use the subtitles
+        # stored on the instance
+        return SubtitleVersion.objects.get(pk=self.version.pk).get_subtitles()
+
+    def check_stats(self, **counts):
+        stats = cache.get_parsed_subtitles_stats()
+        for name, value in counts.items():
+            assert_equal(stats.get(name.replace('_', '-'), 0), value)
+
+    def test_local_hit(self):
+        assert_equal(self.get_subtitles(), self.subtitles)
+        assert_equal(self.get_subtitles(), self.subtitles)
+        self.check_stats(miss=1, local_hit=1, shared_hit=0)
+
+    def test_shared_hit(self):
+        assert_equal(self.get_subtitles(), self.subtitles)
+        # simulate a different process by clearing the local cache
+        lru.clear_all()
+        assert_equal(self.get_subtitles(), self.subtitles)
+        self.check_stats(miss=1, local_hit=0, shared_hit=1)
+
+    def test_shared_hit_skips_xml_parsing(self):
+        self.get_subtitles()
+        lru.clear_all()
+        with mock.patch.object(cache, 'SubtitleSet',
+                               wraps=cache.SubtitleSet) as SubtitleSet:
+            assert_equal(self.get_subtitles(), self.subtitles)
+        # We should rebuild the subtitles with from_list(), rather than
+        # parsing XML with SubtitleSet(initial_data=...)
+        assert_equal(SubtitleSet.call_count, 0)
+        assert_equal(SubtitleSet.from_list.call_count, 1)
+
+    def test_returns_copies(self):
+        subtitles = self.get_subtitles()
+        subtitles.append_subtitle(10000, 11000, 'New sub')
+        assert_equal(self.get_subtitles(), self.subtitles)
+
+    def test_unsaved_versions_not_cached(self):
+        version = SubtitleVersion(subtitle_language=self.version.subtitle_language,
+                                  video=self.video, language_code='en',
+                                  subtitles=self.subtitles)
+        version._subtitles = None
+        assert_equal(version.get_subtitles(), self.subtitles)
+        self.check_stats(miss=0, local_hit=0, shared_hit=0)
+
+    def test_set_subtitles_on_saved_version(self):
+        self.get_subtitles()
+        # Change the subtitles using a different instance.  This doesn't
+        # touch our cached data, so we need the key to change.
+        subtitles = make_subtitle_set('en')
+        subtitles.append_subtitle(10000, 11000, 'New sub')
+        version = SubtitleVersion.objects.get(pk=self.version.pk)
+        version.set_subtitles(subtitles)
+        version.save()
+        assert_equal(self.get_subtitles(), subtitles)
+        self.check_stats(miss=2, local_hit=0, shared_hit=0)
+
+class RenderedSubtitlesCacheTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        self.version = make_version(self.video, 'en',
+                                    subtitle_set=make_subtitle_set('en'))
+
+    def get_version(self):
+        return SubtitleVersion.objects.get(pk=self.version.pk)
+
+    def test_render(self):
+        srt = self.get_version().get_rendered_subtitles('srt')
+        assert_true(isinstance(srt, str))
+        assert_true('Sub 1' in srt)
+        # The second call should be a cache hit
+        assert_equal(self.get_version().get_rendered_subtitles('srt'), srt)
+        assert_equal(metrics.get_counts(cache.RENDERED_SUBTITLES_METRIC),
+                     {'miss': 1, 'hit': 1})
+
+    def test_prerender(self):
+        cache.prerender_subtitles(self.get_version())
+        for format in cache.PRERENDERED_FORMATS:
+            self.get_version().get_rendered_subtitles(format)
+        assert_equal(metrics.get_counts(cache.RENDERED_SUBTITLES_METRIC),
+                     {'hit': len(cache.PRERENDERED_FORMATS)})
+
+    def test_etag(self):
+        etag = self.version.rendered_subtitles_etag('srt')
+        assert_equal(self.get_version().rendered_subtitles_etag('srt'), etag)
+        assert_not_equal(self.version.rendered_subtitles_etag('vtt'), etag)
+
+    def test_set_subtitles_on_saved_version(self):
+        version = self.get_version()
+        srt = version.get_rendered_subtitles('srt')
+        etag = version.rendered_subtitles_etag('srt')
+        subtitles = make_subtitle_set('en')
+        subtitles.append_subtitle(10000, 11000, 'New sub')
+        version.set_subtitles(subtitles)
+        version.save()
+        version = self.get_version()
+        assert_not_equal(version.rendered_subtitles_etag('srt'), etag)
+        assert_not_equal(version.get_rendered_subtitles('srt'), srt)
+        assert_true('New sub' in version.get_rendered_subtitles('srt'))
+
+class IsSyncedCacheTest(TestCase):
+    def setUp(self):
+        self.video = VideoFactory()
+        make_version(self.video, 'en', subtitle_set=make_subtitle_set('en'))
+        unsynced = make_subtitle_set('fr')
+        unsynced.append_subtitle(None, None, 'Unsynced')
+        make_version(self.video, 'fr', subtitle_set=unsynced)
+
+    def get_languages(self):
+        return list(SubtitleLanguage.objects.filter(video=self.video)
+                    .order_by('language_code'))
+
+    def test_is_synced(self):
+        en, fr = self.get_languages()
+        assert_equal(en.is_synced(), True)
+        assert_equal(fr.is_synced(), False)
+        assert_equal(cache.get_is_synced(en, True), True)
+        assert_equal(cache.get_is_synced(fr, True), False)
+
+    def test_fetch_is_synced(self):
+        for language in self.get_languages():
+            language.is_synced()
+        languages = self.get_languages()
+        cache.fetch_is_synced(languages)
+        with mock.patch('subtitles.cache.get_is_synced') as mock_get:
+            assert_equal([l.is_synced() for l in languages], [True, False])
+        assert_equal(mock_get.call_count, 0)
+
+    def test_fetch_for_languages(self):
+        for language in self.get_languages():
+            language.is_synced()
+        languages = self.get_languages()
+        SubtitleVersion.objects.fetch_for_languages(languages,
+                                                    fetch_is_synced=True)
+        with mock.patch('subtitles.cache.get_is_synced') as mock_get:
+            assert_equal([l.is_synced() for l in languages], [True, False])
+        assert_equal(mock_get.call_count, 0)
+
+    def test_fetch_is_synced_missing_values(self):
+        # values not in the cache should be calculated by is_synced()
+        languages = self.get_languages()
+        cache.fetch_is_synced(languages)
+        assert_equal([l.is_synced() for l in languages], [True, False])
+
+    def test_invalidate(self):
+        en, fr = self.get_languages()
+        en.is_synced()
+        fr.is_synced()
+        make_version(self.video, 'fr', subtitle_set=make_subtitle_set('fr'))
+        en, fr = self.get_languages()
+        assert_equal(cache.get_is_synced(en, True), True)
+        assert_equal(cache.get_is_synced(fr, True), None)
+        assert_equal(fr.is_synced(), True)
@@ -300,6 +300,36 @@ class TestSubtitleVersion(TestCase):
         self.assertEqual(list(sv.get_subtitles().subtitle_items()), [])
         self.assertEqual(sv.visibility, 'public')
 
+    def test_timing_stats(self):
+        sv = self.sl_en.add_version(subtitles=[
+            (None, None, "unsynced"),
+            (100, 200, "a"),
+            (300, 450, "b"),
+            (500, None, "partly synced"),
+        ])
+        sv = refresh(sv)
+        self.assertEqual(sv.first_start_time, 100)
+        self.assertEqual(sv.last_end_time, 500)
+        self.assertEqual(sv.synced_duration, 250)
+
+        sv = self.sl_en.add_version(subtitles=[])
+        sv = refresh(sv)
+        self.assertEqual(sv.first_start_time, None)
+        self.assertEqual(sv.last_end_time, None)
+        self.assertEqual(sv.synced_duration, 0)
+
+    def test_ensure_timing_stats(self):
+        sv = self.sl_en.add_version(subtitles=[(100, 200, "a")])
+        # Simulate a version created before we stored the timing stats
+        SubtitleVersion.objects.filter(pk=sv.pk).update(
+            first_start_time=None, last_end_time=None, synced_duration=None)
+        sv = refresh(sv)
+        sv.ensure_timing_stats()
+        sv = refresh(sv)
+        self.assertEqual(sv.first_start_time, 100)
+        self.assertEqual(sv.last_end_time, 200)
+        self.assertEqual(sv.synced_duration, 100)
+
     def test_subtitle_serialization(self):
         """Test basic subtitle serialization."""
 
@@ -30,6 +30,7 @@ from django.conf import settings
 from django.contrib import messages
 from django.template import RequestContext
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
 from django.utils.http import urlencode
 from django.utils.translation import ugettext as _
@@ -39,6 +40,7 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.template.defaultfilters import urlize, linebreaks, force_escape
 from django.views.decorators.clickjacking import xframe_options_exempt
 
+from auth import apikeycache
 from auth.models import CustomUser as User
 from subtitles import shims
 from subtitles.workflows import get_workflow
@@ -433,12 +435,9 @@ def _user_for_download_permissions(request):
     if not username or not api_key:
         return request.user
     try:
-        api_user = User.objects.get(username=username)
-    except User.DoesNotExist:
+        return apikeycache.check_credentials(username, api_key)
+    except apikeycache.InvalidCredentials:
         return request.user
-    if api_user.check_api_key(api_key):
-        return api_user
-    return request.user
 
 def download(request, video_id, language_code, filename, format,
              version_number=None):
@@ -463,13 +462,16 @@ def download(request, video_id, language_code, filename, format,
     if not format in babelsubs.get_available_formats():
         raise HttpResponseServerError("Format not found")
 
-    subs_text = babelsubs.to(version.get_subtitles(), format,
-                             language=version.language_code)
-    # since this is a download, we can afford not to escape tags, specially
-    # true since speaker change is denoted by '>>' and that would get entirely
-    # stripped out
-    response = HttpResponse(subs_text, content_type="text/plain")
-    response['Content-Disposition'] = 'attachment'
+    etag = version.rendered_subtitles_etag(format)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        # since this is a download, we can afford not to escape tags,
+        # specially true since speaker change is denoted by '>>' and that
+        # would get entirely stripped out
+        response = HttpResponse(version.get_rendered_subtitles(format),
+                                content_type="text/plain")
+        response['Content-Disposition'] = 'attachment'
+    response['ETag'] = etag
     return response
 
 
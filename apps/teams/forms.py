@@ -1827,7 +1827,7 @@ class ActivityFiltersForm(FiltersForm):
         return choices
 
     def _get_queryset(self, cleaned_data):
-        qs = ActivityRecord.objects.for_team(self.team)
+        qs = ActivityRecord.objects.for_team(self.team).with_related_objects()
         if not (self.is_bound and self.is_valid()):
             return qs
         type = cleaned_data.get('type')
@@ -21,7 +21,7 @@ from math import ceil
 import csv
 import datetime
 import logging
-from cStringIO import StringIO
+import tempfile
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
@@ -62,9 +62,11 @@ from teams.signals import (member_leave, api_subtitles_approved,
                            team_settings_changed)
 from utils import DEFAULT_PROTOCOL
 from utils import enum
+from utils import jobprogress
 from utils import translation, send_templated_email
 from utils.amazon import S3EnabledImageField, S3EnabledFileField
 from utils.bunch import Bunch
+from utils.extsort import external_sort
 from utils.panslugify import pan_slugify
 from utils.text import fmt
 from utils.translation import get_language_label
@@ -3616,6 +3618,12 @@ class BillingReport(models.Model):
                 self.start_date.strftime('%Y-%m-%d'),
                 self.end_date.strftime('%Y-%m-%d'))
 
+    # Number of approve tasks to process at once
+    APPROVAL_CHUNK_SIZE = 500
+    # Keep the CSV data in memory until it gets this big, then switch to a
+    # temp file
+    CSV_SPOOL_SIZE = 10 * 1024 * 1024
+
     def _get_approved_tasks(self):
         return Task.objects.complete_approve().filter(
             approved=Task.APPROVED_IDS['Approved'],
@@ -3625,8 +3633,66 @@ class BillingReport(models.Model):
     def _report_date(self, datetime):
         return datetime.strftime('%Y-%m-%d %H:%M:%S')
 
+    @property
+    def progress_key(self):
+        return 'billing-report-{}'.format(self.pk)
+
+    def _iter_approved_tasks(self):
+        """Iterate through the approved tasks for this report
+
+        Tasks are fetched in chunks.  For each chunk, we look up the
+        subtitle/translate and review tasks that came before the approve
+        tasks using 1 query each.
+
+        Yields:
+            (approve_task, subtitle_task, review_task) tuples.
+            subtitle_task and review_task are the most recently completed
+            task for the same team video and language, or None.
+        """
+        qs = (self._get_approved_tasks()
+              .select_related('team', 'assignee', 'team_video__video',
+                              'team_video__project',
+                              'new_subtitle_version__subtitle_language__video'))
+        total = qs.count()
+        current = 0
+        last_pk = -1
+        while True:
+            approve_tasks = list(qs.filter(pk__gt=last_pk).order_by('pk')
+                                 [:self.APPROVAL_CHUNK_SIZE])
+            if not approve_tasks:
+                break
+            last_pk = approve_tasks[-1].pk
+            subtitle_tasks = self._latest_tasks(
+                Task.objects.complete_subtitle_or_translate(), approve_tasks)
+            review_tasks = self._latest_tasks(
+                Task.objects.complete_review(), approve_tasks)
+            for approve_task in approve_tasks:
+                key = (approve_task.team_video_id, approve_task.language)
+                yield (approve_task, subtitle_tasks.get(key),
+                       review_tasks.get(key))
+            current += len(approve_tasks)
+            jobprogress.update(self.progress_key, current, total)
+
+    def _latest_tasks(self, qs, approve_tasks):
+        """Find the latest completed tasks for a list of approve tasks
+
+        Returns:
+            dict mapping (team_video_id, language) to tasks
+        """
+        qs = (qs.filter(team_video_id__in=set(t.team_video_id
+                                              for t in approve_tasks),
+                        language__in=set(t.language for t in approve_tasks))
+              .select_related('assignee')
+              .order_by('completed', 'pk'))
+        # Later tasks overwrite the earlier ones
+        return dict(((task.team_video_id, task.language), task)
+                    for task in qs)
+
     def generate_rows_type_approval(self):
-        header = (
+        return list(self.iter_rows_type_approval())
+
+    def iter_rows_type_approval(self):
+        yield (
             'Team',
             'Video Title',
             'Video ID',
@@ -3638,17 +3704,12 @@ class BillingReport(models.Model):
             'Approver',
             'Date',
         )
-        rows = [header]
-        for approve_task in self._get_approved_tasks():
+        for approve_task, subtitle_task, review_task in self._iter_approved_tasks():
             video = approve_task.team_video.video
             project = approve_task.team_video.project.name if approve_task.team_video.project else 'none'
             version = approve_task.new_subtitle_version
             language = version.subtitle_language
-            subtitle_task = (Task.objects.complete_subtitle_or_translate()
-                             .filter(team_video=approve_task.team_video,
-                                     language=approve_task.language)
-                             .order_by('-completed'))[0]
-            rows.append((
+            yield (
                 approve_task.team.name,
                 video.title_display(),
                 video.video_id,
@@ -3656,14 +3717,17 @@ class BillingReport(models.Model):
                 approve_task.language,
                 get_minutes_for_version(version, False),
                 language.is_primary_audio_language(),
-                subtitle_task.type==Task.TYPE_IDS['Translate'],
+                (subtitle_task is not None and
+                 subtitle_task.type == Task.TYPE_IDS['Translate']),
                 unicode(approve_task.assignee),
                 self._report_date(approve_task.completed),
-            ))
-        return rows
+            )
 
     def generate_rows_type_approval_for_users(self):
-        header = (
+        return list(self.iter_rows_type_approval_for_users())
+
+    def iter_rows_type_approval_for_users(self):
+        yield (
             'User',
             'Task Type',
             'Team',
@@ -3678,34 +3742,25 @@ class BillingReport(models.Model):
             'Date',
             'Pay Rate',
         )
-        data_rows = []
-        for approve_task in self._get_approved_tasks():
+        for row in external_sort(self._iter_user_data_rows(),
+                                 key=lambda row: row[0]):
+            yield row
+
+    def _iter_user_data_rows(self):
+        for approve_task, subtitle_task, review_task in self._iter_approved_tasks():
             video = approve_task.team_video.video
             project = approve_task.team_video.project.name if approve_task.team_video.project else 'none'
             version = approve_task.get_subtitle_version()
             language = version.subtitle_language
+            minutes = get_minutes_for_version(version, False)
 
-            all_tasks = [approve_task]
-            try:
-                all_tasks.append((Task.objects.complete_subtitle_or_translate()
-                                  .filter(team_video=approve_task.team_video,
-                                          language=approve_task.language)
-                                  .order_by('-completed'))[0])
-            except IndexError:
-                # no subtitling task, probably the review task was manually
-                # created.
-                pass
-            try:
-                all_tasks.append((Task.objects.complete_review()
-                                  .filter(team_video=approve_task.team_video,
-                                          language=approve_task.language)
-                                  .order_by('-completed'))[0])
-            except IndexError:
-                # review not enabled
-                pass
-
+            # subtitle_task can be None if the review task was manually
+            # created, review_task can be None if review is not enabled.
+            all_tasks = [approve_task, subtitle_task, review_task]
             for task in all_tasks:
-                data_rows.append((
+                if task is None:
+                    continue
+                yield (
                     unicode(task.assignee),
                     task.get_type_display(),
                     approve_task.team.name,
@@ -3713,34 +3768,38 @@ class BillingReport(models.Model):
                     video.video_id,
                     project,
                     language.language_code,
-                    get_minutes_for_version(version, False),
+                    minutes,
                     language.is_primary_audio_language(),
                     unicode(approve_task.assignee),
                     unicode(task.body),
                     self._report_date(task.completed),
                     task.assignee.pay_rate_code,
-                ))
-
-        data_rows.sort(key=lambda row: row[0])
-        return [header] + data_rows
+                )
 
     def generate_rows_type_billing_record(self):
-        rows = []
-        for i,team in enumerate(self.teams.all()):
-            rows = rows + BillingRecord.objects.csv_report_for_team(team,
-                self.start_date, self.end_date, add_header=i == 0)
-        return rows
+        return list(self.iter_rows_type_billing_record())
+
+    def iter_rows_type_billing_record(self):
+        teams = list(self.teams.all())
+        for i, team in enumerate(teams):
+            for row in BillingRecord.objects.csv_report_for_team(
+                    team, self.start_date, self.end_date, add_header=i == 0):
+                yield row
+            jobprogress.update(self.progress_key, i + 1, len(teams))
 
     def generate_rows(self):
+        return list(self.iter_rows())
+
+    def iter_rows(self):
+        """Iterate through the rows of the report, including the header."""
         if self.type == BillingReport.TYPE_BILLING_RECORD:
-            rows = self.generate_rows_type_billing_record()
+            return self.iter_rows_type_billing_record()
         elif self.type == BillingReport.TYPE_APPROVAL:
-            rows = self.generate_rows_type_approval()
+            return self.iter_rows_type_approval()
         elif self.type == BillingReport.TYPE_APPROVAL_FOR_USERS:
-            rows = self.generate_rows_type_approval_for_users()
+            return self.iter_rows_type_approval_for_users()
         else:
             raise ValueError("Unknown type: %s" % self.type)
-        return rows
 
     def convert_unicode_to_utf8(self, rows):
         def _convert(value):
@@ -3748,35 +3807,43 @@ class BillingReport(models.Model):
                 return value.encode("utf-8")
             else:
                 return value
-        return [tuple(_convert(v) for v in row) for row in rows]
+        return (tuple(_convert(v) for v in row) for row in rows)
 
     def process(self):
         """
-        Generate the correct rows (including headers), saves it to a tempo file,
-        then set's that file to the csv_file property, which if , using the S3
-        storage will take care of exporting it to s3.
+        Generate the report rows (including headers), write them to a CSV
+        file and set that file to the csv_file property.  If we are using the
+        S3 storage, that will upload the file to s3.
+
+        Progress is tracked with utils.jobprogress using progress_key.
         """
+        jobprogress.start(self.progress_key)
         try:
-            rows = self.generate_rows()
+            self.make_csv_file(self.iter_rows())
         except StandardError:
             logger.error("Error generating billing report: (id: %s)", self.id)
-        else:
-            self.make_csv_file(rows)
+        finally:
+            jobprogress.complete(self.progress_key)
         self.processed = datetime.datetime.utcnow()
         self.save()
 
     def make_csv_file(self, rows):
-        rows = self.convert_unicode_to_utf8(rows)
-
-        csv_file = StringIO()
+        # Rows are written one at a time to a file that gets moved to disk
+        # once it's large.  The S3 storage uploads large files in parts.
+        csv_file = tempfile.SpooledTemporaryFile(max_size=self.CSV_SPOOL_SIZE)
         writer = csv.writer(csv_file)
-        writer.writerows(rows)
+        for row in self.convert_unicode_to_utf8(rows):
+            writer.writerow(row)
+        csv_file.seek(0)
 
         name = 'bill-%s-teams-%s-%s-%s-%s.csv' % (
             self.teams.all().count(),
             self.start_str, self.end_str,
             self.get_type_display(), self.pk)
-        self.csv_file.save(name, csv_file)
+        try:
+            self.csv_file.save(name, File(csv_file))
+        finally:
+            csv_file.close()
 
     @property
     def start_str(self):
@@ -3989,37 +4056,15 @@ class BillingRecordManager(models.Manager):
 def get_minutes_for_version(version, round_up_to_integer):
     """
     Return the number of minutes the subtitles specified in version
-    """
-    subs = version.get_subtitles()
-
-    if len(subs) == 0:
-        return 0
-
-    for sub in subs:
-        if sub.start_time is not None:
-            start_time = sub.start_time
-            break
-        # we shouldn't have an end time set without a start time, but handle
-        # it just in case
-        if sub.end_time is not None:
-            start_time = sub.end_time
-            break
-    else:
-        return 0
 
-    for sub in reversed(subs):
-        if sub.end_time is not None:
-            end_time = sub.end_time
-            break
-        # we shouldn't have an end time not set, but check for that just in
-        # case
-        if sub.start_time is not None:
-            end_time = sub.start_time
-            break
-    else:
+    This uses the timing stats stored on the version, so it doesn't need to
+    parse the subtitles.
+    """
+    version.ensure_timing_stats()
+    if version.first_start_time is None or version.last_end_time is None:
         return 0
 
-    duration_seconds =  (end_time - start_time) / 1000.0
+    duration_seconds = (version.last_end_time - version.first_start_time) / 1000.0
     minutes = duration_seconds/60.0
     if round_up_to_integer:
         minutes = int(ceil(minutes))
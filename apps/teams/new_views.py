@@ -61,6 +61,7 @@ from activity.models import ActivityRecord
 from auth.models import CustomUser as User
 from auth.forms import CustomUserCreationForm
 from messages import tasks as messages_tasks
+from search.index import get_backend
 from subtitles.models import SubtitleLanguage
 from teams.models import Project
 from teams.workflows import TeamWorkflow, TeamPermissionsRow
@@ -1641,7 +1642,7 @@ def ajax_inviteable_users_multiple_search(request, team):
 @team_view
 def ajax_video_search(request, team):
     query = request.GET.get('q', '')
-    qs = Video.objects.search(query).filter(teamvideo__team=team)[:8]
+    qs = get_backend().search_videos(query, team=team.id)[:8]
     title_set = set(v.title_display() for v in qs)
     has_duplicate_title = len(title_set) != len(qs)
     def get_title(video):
@@ -17,6 +17,7 @@
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
 from collections import namedtuple
+import threading
 
 from django.utils.translation import ugettext as _
 
@@ -73,10 +74,93 @@ def _perms_equal_or_greater(role, include_outsiders=False):
     return roles[:roles.index(role) + 1]
 
 
+# Request-scoped permission contexts
+#
+# Pages that list many videos/tasks call the functions below dozens of times
+# for the same user and team.  While a request is active (see
+# teams.middleware.PermissionContextMiddleware), we store a PermissionContext
+# for each user/team pair and answer role checks from it.  Outside of
+# requests (tasks, management commands, etc), we calculate a new context for
+# each call.
+_request_state = threading.local()
+
+class PermissionContext(object):
+    """Membership data for a user in a team
+
+    This loads the TeamMember and its narrowings once, then calculates the
+    effective role for each project/language target from memory.
+
+    Attributes:
+        member: TeamMember object, or None if the user isn't a member
+        role: the member's general role in the team
+    """
+    def __init__(self, user, team):
+        self.member = team.get_member(user)
+        self.role = get_role(self.member)
+        self.project_narrowings = set()
+        self.language_narrowings = set()
+        if self.member is not None:
+            for narrowing in self.member.narrowings_fast():
+                if narrowing.project_id:
+                    self.project_narrowings.add(narrowing.project_id)
+                if narrowing.language:
+                    self.language_narrowings.add(narrowing.language)
+        self._role_cache = {}
+
+    def get_role_for_target(self, project=None, lang=None):
+        # The default project is the same as "no project".
+        if project and not project.is_default_project:
+            project_id = project.id
+        else:
+            project_id = None
+        key = (project_id, lang)
+        if key not in self._role_cache:
+            self._role_cache[key] = self._calc_role_for_target(project_id,
+                                                               lang)
+        return self._role_cache[key]
+
+    def _calc_role_for_target(self, project_id, lang):
+        if (self.project_narrowings and
+                project_id not in self.project_narrowings):
+            return ROLE_CONTRIBUTOR
+        if self.language_narrowings and lang not in self.language_narrowings:
+            return ROLE_CONTRIBUTOR
+        return self.role
+
+def start_request_cache():
+    """Start caching PermissionContext objects for the current request."""
+    _request_state.contexts = {}
+
+def end_request_cache():
+    """Stop caching PermissionContext objects."""
+    _request_state.contexts = None
+
+def get_permission_context(user, team):
+    """Get a PermissionContext for a user/team pair."""
+    contexts = getattr(_request_state, 'contexts', None)
+    if contexts is None:
+        return PermissionContext(user, team)
+    key = (team.id, user.id)
+    if key not in contexts:
+        contexts[key] = PermissionContext(user, team)
+    return contexts[key]
+
+def invalidate_permission_context(member):
+    """Drop any cached permission data for a TeamMember
+
+    Call this when the TeamMember or its MembershipNarrowing objects change.
+    """
+    member._cached_narrowings = None
+    contexts = getattr(_request_state, 'contexts', None)
+    if contexts:
+        for key in contexts.keys():
+            if key[1] == member.user_id:
+                del contexts[key]
+
 # Utility functions
 def get_member(user, team):
     """Return the TeamMember object (or None) for the given user/team."""
-    return team.get_member(user)
+    return get_permission_context(user, team).member
 
 def get_role(member):
     """Return the member's general role in the team.
@@ -95,29 +179,8 @@ def get_role_for_target(user, team, project=None, lang=None):
     `lang` should be a string (the language code).
 
     """
-    member = get_member(user, team)
-    role = get_role(member)
-    narrowings = get_narrowings(member)
-
-    # If the user has no narrowings, just return their overall role.
-    if not narrowings:
-        return role
-
-    # Otherwise the narrowings must match the target.
-    project_narrowings = [n.project for n in narrowings if n.project]
-    lang_narrowings = [n.language for n in narrowings if n.language]
-
-    # The default project is the same as "no project".
-    if project and project.is_default_project:
-        project = None
-
-    if project_narrowings and project not in project_narrowings:
-        return ROLE_CONTRIBUTOR
-
-    if lang_narrowings and lang not in lang_narrowings:
-        return ROLE_CONTRIBUTOR
-
-    return role
+    return get_permission_context(user, team).get_role_for_target(project,
+                                                                  lang)
 
 
 def roles_user_can_assign(team, user, to_user=None):
@@ -315,10 +378,10 @@ def can_assign_role(team, user, role, to_user):
     return role in roles_user_can_assign(team, user, to_user)
 
 def can_change_project_managers(team, user):
-    return team.get_member(user).is_admin()
+    return get_member(user, team).is_admin()
 
 def can_change_language_managers(team, user):
-    return team.get_member(user).is_admin()
+    return get_member(user, team).is_admin()
 
 def can_join_team(team, user):
     """Return whether the given user can join a team.
@@ -388,11 +451,11 @@ def can_add_member(team, user, role):
     ).exists()
 
 def can_edit_member(team, user):
-    member = team.get_member(user)
+    member = get_member(user, team)
     return member.is_admin()
 
 def can_remove_member(team, user):
-    member = team.get_member(user)
+    member = get_member(user, team)
     return can_add_member(team, user, member.role)
 
 def can_move_videos(team, user):
@@ -534,7 +597,7 @@ def can_view_management_tab(team, user):
     return team.user_is_manager(user)
 
 def can_view_project_or_language_management_tab(team, user):
-    member = team.get_member(user)
+    member = get_member(user, team)
     if not member:
         return False
     return (member.is_a_project_or_language_manager() and
@@ -1075,7 +1138,7 @@ def can_manage_subtitles(user, team_video, language_code=None):
       - a language manager for the team video's language
       - a project manager for the team video's project
     """
-    member = team_video.team.get_member(user)
+    member = get_member(user, team_video.team)
     if not member:
         return False
     return (member.is_language_manager(language_code) or
@@ -1085,5 +1148,5 @@ def can_set_soft_limits(team, user, video, language_code):
     """Can a user set soft limits for a video's subtitles?
 
     """
-    member = team.get_member(user)
+    member = get_member(user, team)
     return member and member.is_admin()
@@ -21,6 +21,7 @@ from django.db.models.signals import post_save, post_delete
 
 from auth.models import CustomUser as User
 from subtitles.signals import subtitles_published, subtitles_added
+from teams import permissions
 from teams import stats
 from teams.models import (TeamVideo, TeamMember, MembershipNarrowing,
                           TeamSubtitlesCompleted)
@@ -37,14 +38,17 @@ def on_feed_imported(signal, sender, new_videos, **kwargs):
 @receiver(post_delete, sender=TeamMember)
 def on_team_member_change(sender, instance, **kwargs):
     User.cache.invalidate_by_pk(instance.user_id)
+    permissions.invalidate_permission_context(instance)
 
 @receiver(post_save, sender=MembershipNarrowing)
 @receiver(post_delete, sender=MembershipNarrowing)
 def on_membership_narrowing_change(sender, instance, **kwargs):
     try:
-        User.cache.invalidate_by_pk(instance.member.user_id)
+        member = instance.member
     except TeamMember.DoesNotExist:
-        pass
+        return
+    User.cache.invalidate_by_pk(member.user_id)
+    permissions.invalidate_permission_context(member)
 
 @receiver(subtitles_published)
 def on_subtitles_published(sender, **kwargs):
@@ -4,10 +4,13 @@ import logging
 logger = logging.getLogger('teams.tasks')
 
 from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
 from django.db.models import F
+from django.template.loader import render_to_string
 from django.utils.translation import ugettext_lazy as _
 import requests
 
+from utils import metrics
 from utils import send_templated_email
 from utils.panslugify import pan_slugify
 from utils.translation import SUPPORTED_LANGUAGE_CODES
@@ -21,6 +24,8 @@ from utils.taskqueue import job
 from utils.text import fmt
 from videos.tasks import video_changed_tasks
 
+NEW_VIDEO_EMAIL_BATCH_SIZE = 100
+
 @job
 def invalidate_video_caches(team_id):
     """Invalidate all TeamVideo caches for all the given team's videos."""
@@ -52,13 +57,15 @@ def invalidate_video_visibility_caches(team):
 def update_video_public_field(team_id):
     from teams.models import Team
 
-    team = Team.objects.get(pk=team_id)
+    from videos import metadata_manager
 
-    for team_video in team.teamvideo_set.all():
-        video = team_video.video
-        video.is_public = team.videos_public()
-        video.save()
-        video_changed_tasks(video.id)
+    team = Team.objects.get(pk=team_id)
+    video_ids = list(team.teamvideo_set.values_list('video_id', flat=True))
+    for i in xrange(0, len(video_ids), 500):
+        changed = metadata_manager.update_metadata_for_videos(
+            video_ids[i:i+500])
+        for video_id in changed:
+            video_changed_tasks.delay(video_id)
 
 @job
 def expire_tasks():
@@ -99,38 +106,57 @@ def add_videos_notification_hourly(*args, **kwargs):
 
 def _notify_teams_of_new_videos(team_qs):
     from messages.tasks import team_sends_notification
-    from teams.models import TeamVideo
-    domain = settings.HOSTNAME
-
+    connection = get_connection(fail_silently=not settings.DEBUG)
     for team in team_qs:
         if not team_sends_notification(team, 'block_new_video_message'):
             continue
-        team_videos = TeamVideo.objects.filter(team=team, created__gt=team.last_notification_time)
+        with metrics.timer('teams.new-video-notification.team-time'):
+            _notify_team_of_new_videos(team, connection)
 
-        team.last_notification_time = datetime.now()
-        team.save()
-        members = team.users.filter( notify_by_email=True, is_active=True) \
-            .distinct()
-
-        subject = fmt(_(u'New %(team)s videos ready for subtitling!'),
-                      team=team)
-
-        for user in members:
-            if not user.email:
-                continue
-
-            context = {
-                'domain': domain,
-                'user': user,
-                'team': team,
-                'team_videos': team_videos,
-                "STATIC_URL": settings.STATIC_URL,
-            }
-
-            send_templated_email(user, subject,
-                                 'teams/email_new_videos.html',
-                                 context, fail_silently=not settings.DEBUG)
+def _notify_team_of_new_videos(team, connection):
+    """Send the new videos email to a team's members
 
+    The email is the same for all members, so we render it once and send
+    copies in batches of NEW_VIDEO_EMAIL_BATCH_SIZE using a shared mail
+    connection.
+    """
+    from teams.models import TeamVideo
+    team_videos = list(TeamVideo.objects
+                       .filter(team=team,
+                               created__gt=team.last_notification_time)
+                       .select_related('video'))
+
+    team.last_notification_time = datetime.now()
+    team.save()
+    emails = list(team.users
+                  .filter(notify_by_email=True, is_active=True)
+                  .exclude(email='')
+                  .values_list('email', flat=True)
+                  .distinct())
+
+    subject = fmt(_(u'New %(team)s videos ready for subtitling!'),
+                  team=team)
+    body = render_to_string('teams/email_new_videos.html', {
+        'domain': settings.HOSTNAME,
+        'url_base': "%s://%s" % (settings.DEFAULT_PROTOCOL,
+                                 settings.HOSTNAME),
+        'team': team,
+        'team_videos': team_videos,
+        "STATIC_URL": settings.STATIC_URL,
+    })
+    batch = []
+    for email in emails:
+        message = EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL,
+                               [email], bcc=settings.EMAIL_BCC_LIST,
+                               connection=connection)
+        message.content_subtype = 'html'
+        batch.append(message)
+        if len(batch) >= NEW_VIDEO_EMAIL_BATCH_SIZE:
+            connection.send_messages(batch)
+            batch = []
+    if batch:
+        connection.send_messages(batch)
+    metrics.increment('teams.new-video-notification.emails', len(emails))
 
 @job
 def api_notify_on_subtitles_activity(team_pk, event_name, version_pk):
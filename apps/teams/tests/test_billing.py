@@ -210,9 +210,9 @@ class ProcessReportTest(TestCase):
             type=BillingReport.TYPE_APPROVAL)
         self.report.teams.add(self.team)
 
-    @test_utils.patch_for_test("teams.models.BillingReport.generate_rows")
-    def test_success(self, mock_generate_rows):
-        mock_generate_rows.return_value = [
+    @test_utils.patch_for_test("teams.models.BillingReport.iter_rows")
+    def test_success(self, mock_iter_rows):
+        mock_iter_rows.return_value = [
             ('Foo', 'Bar'),
             ('foo value', 'bar value'),
         ]
@@ -220,9 +220,9 @@ class ProcessReportTest(TestCase):
         self.assertNotEquals(self.report.processed, None)
         self.assertNotEquals(self.report.csv_file, None)
 
-    @test_utils.patch_for_test("teams.models.BillingReport.generate_rows")
-    def test_error(self, mock_generate_rows):
-        mock_generate_rows.side_effect = ValueError()
+    @test_utils.patch_for_test("teams.models.BillingReport.iter_rows")
+    def test_error(self, mock_iter_rows):
+        mock_iter_rows.side_effect = ValueError()
         self.report.process()
         self.assertNotEquals(self.report.processed, None)
         self.assertEquals(self.report.csv_file, None)
@@ -0,0 +1,65 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+from datetime import datetime
+
+from django.core import mail
+from django.test import TestCase
+from nose.tools import *
+import mock
+
+from teams import tasks
+from teams.models import Team
+from utils.factories import *
+
+class NewVideoNotificationTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory(notify_interval=Team.NOTIFY_HOURLY,
+                                last_notification_time=datetime(2000, 1, 1))
+        self.members = [
+            TeamMemberFactory(team=self.team,
+                              user__notify_by_email=True).user
+            for i in range(3)
+        ]
+        TeamMemberFactory(team=self.team, user__notify_by_email=False)
+        self.team_videos = [TeamVideoFactory(team=self.team)
+                            for i in range(2)]
+
+    def test_send(self):
+        tasks.add_videos_notification_hourly()
+        assert_items_equal([m.to for m in mail.outbox],
+                           [[u.email] for u in self.members])
+        # All members get the same body, which lists all the new videos
+        assert_equal(len(set(m.body for m in mail.outbox)), 1)
+        for tv in self.team_videos:
+            assert_in(tv.video.video_id, mail.outbox[0].body)
+
+    def test_batches(self):
+        with mock.patch('teams.tasks.NEW_VIDEO_EMAIL_BATCH_SIZE', 2):
+            with mock.patch('teams.tasks.get_connection') as get_connection:
+                tasks.add_videos_notification_hourly()
+        connection = get_connection.return_value
+        assert_equal([len(call[0][0]) for call in
+                      connection.send_messages.call_args_list], [2, 1])
+
+    def test_updates_last_notification_time(self):
+        tasks.add_videos_notification_hourly()
+        mail.outbox = []
+        tasks.add_videos_notification_hourly()
+        assert_equal(mail.outbox, [])
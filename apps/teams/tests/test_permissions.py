@@ -21,6 +21,7 @@ from __future__ import absolute_import
 import datetime
 from django.test import TestCase
 from django.urls import reverse
+from nose.tools import *
 from teams.models import Team, TeamVideo, TeamMember, Workflow, Task
 from auth.models import CustomUser as User
 from contextlib import contextmanager
@@ -28,6 +29,7 @@ from testhelpers import views as helpers
 from utils.factories import *
 from utils.translation import ALL_LANGUAGE_CODES
 
+from teams import permissions
 from teams.permissions_const import *
 from teams.permissions import (
     remove_role, add_role, can_message_all_members, can_add_video,
@@ -1199,3 +1201,55 @@ class TestViews(BaseTestPermission):
         save_role(self.team, member, role, [], [], owner.user)
         self.team.uncache_member(member.user)
         self.assertEquals(self.team.get_member(member.user).role, role)
+
+class PermissionContextTest(TestCase):
+    def setUp(self):
+        self.team = TeamFactory()
+        self.project = ProjectFactory(team=self.team)
+        self.team_video = TeamVideoFactory(team=self.team,
+                                           project=self.project)
+        self.member = TeamMemberFactory(team=self.team,
+                                        role=TeamMember.ROLE_MANAGER)
+        self.user = self.member.user
+        permissions.start_request_cache()
+
+    def tearDown(self):
+        permissions.end_request_cache()
+
+    def get_team(self):
+        # Fetch a new team object so that we don't use Team._member_cache
+        return Team.objects.get(pk=self.team.pk)
+
+    def test_cached_for_request(self):
+        with self.assertNumQueries(2):
+            permissions.get_role_for_target(self.user, self.get_team())
+        with self.assertNumQueries(0):
+            for lang in ('en', 'fr', 'de'):
+                assert_equal(permissions.get_role_for_target(
+                    self.user, self.team, self.project, lang),
+                    ROLE_MANAGER)
+
+    def test_narrowings(self):
+        permissions.add_narrowing_to_member(self.member, language='fr')
+        team = self.get_team()
+        assert_equal(permissions.get_role_for_target(
+            self.user, team, self.project, 'fr'), ROLE_MANAGER)
+        assert_equal(permissions.get_role_for_target(
+            self.user, team, self.project, 'en'), ROLE_CONTRIBUTOR)
+
+    def test_narrowing_change_invalidates(self):
+        team = self.get_team()
+        assert_equal(permissions.get_role_for_target(
+            self.user, team, None, 'en'), ROLE_MANAGER)
+        permissions.add_narrowing_to_member(team.get_member(self.user),
+                                            language='fr')
+        assert_equal(permissions.get_role_for_target(
+            self.user, team, None, 'en'), ROLE_CONTRIBUTOR)
+
+    def test_role_change_invalidates(self):
+        team = self.get_team()
+        assert_false(permissions.can_view_settings_tab(team, self.user))
+        member = team.get_member(self.user)
+        member.role = TeamMember.ROLE_ADMIN
+        member.save()
+        assert_true(permissions.can_view_settings_tab(team, self.user))
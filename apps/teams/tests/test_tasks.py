@@ -6,11 +6,14 @@ import json
 from django.test import TestCase
 from django.test.client import Client
 from django.urls import reverse
+from nose.tools import *
+import mock
 
 from auth.models import CustomUser as User
 from caching.tests.utils import assert_invalidates_model_cache
 from teams.forms import TaskCreateForm, TaskAssignForm
-from teams.models import Task, Team, TeamVideo, TeamMember
+from teams.models import Task, Team, TeamVideo, TeamMember, VideoVisibility
+from teams.tasks import update_video_public_field
 from utils.testeditor import MockEditor
 from utils.factories import *
 from videos.models import Video
@@ -662,3 +665,21 @@ class VideoCacheTest(TestCase):
             task = Task(team=team_video.team, team_video=team_video,
                         language='en', type=Task.TYPE_IDS['Translate'])
             task.save()
+
+class UpdateVideoPublicFieldTest(TestCase):
+    def test_update(self):
+        team = TeamFactory(video_visibility=VideoVisibility.PUBLIC)
+        videos = [TeamVideoFactory(team=team).video for i in range(2)]
+        team.video_visibility = VideoVisibility.PRIVATE
+        team.save()
+        with mock.patch('teams.tasks.video_changed_tasks') as mock_tasks:
+            update_video_public_field(team.id)
+        for video in videos:
+            assert_false(Video.objects.get(pk=video.pk).is_public)
+        # Changed videos should get the usual follow-up work
+        assert_items_equal(mock_tasks.delay.call_args_list,
+                           [mock.call(video.pk) for video in videos])
+        # Videos that are already up to date don't need it
+        with mock.patch('teams.tasks.video_changed_tasks') as mock_tasks:
+            update_video_public_field(team.id)
+        assert_equal(mock_tasks.delay.call_count, 0)
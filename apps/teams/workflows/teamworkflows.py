@@ -267,7 +267,8 @@ class TeamWorkflow(object):
         qs = (ActivityRecord.objects
               .for_team(self.team)
               .filter(user=user)
-              .order_by('-created'))
+              .order_by('-created')
+              .with_related_objects())
         if query:
             qs = qs.filter(video__in=Video.objects.search(query))
         return qs
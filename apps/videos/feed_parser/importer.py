@@ -21,7 +21,18 @@
 from .parser import FeedParser
 
 class VideoImporter(object):
-    """Import videos from a feed URL."""
+    """Import videos from a feed URL.
+
+    Attributes:
+        validators: dict of data from the last import, used to skip work
+            when the feed hasn't changed.  Set this before calling
+            import_videos(), then save the updated value afterwards.  Keys:
+
+            - etag / last_modified: used for conditional GETs
+            - content_hash: FeedParser.content_hash() value
+            - last_link: link for the latest entry.  We stop processing
+              entries once we see this link.
+    """
     def __init__(self, url, user, team):
         """Create a VideoImporter
 
@@ -34,16 +45,31 @@ class VideoImporter(object):
         self.team = team
         self.checked_entries = 0
         self.last_link = ''
+        self.validators = {}
 
     def import_videos(self, import_next=False):
         self._created_videos = []
-        feed_parser = FeedParser(self.url)
+        feed_parser = FeedParser(self.url,
+                                 etag=self.validators.get('etag'),
+                                 modified=self.validators.get('last_modified'))
+        if feed_parser.not_modified():
+            return []
+        content_hash = feed_parser.content_hash()
+        if content_hash == self.validators.get('content_hash'):
+            return []
         # the link at the top of the feed should be the latest link
         try:
             self.last_link = feed_parser.feed.entries[0]['link']
         except (IndexError, KeyError):
             pass
-        self._create_videos(feed_parser)
+        self._create_videos(feed_parser,
+                            since=self.validators.get('last_link'))
+        self.validators = {
+            'etag': feed_parser.etag,
+            'last_modified': feed_parser.modified,
+            'content_hash': content_hash,
+            'last_link': self.last_link or self.validators.get('last_link'),
+        }
         if import_next and 'youtube' in self.url:
             self._import_extra_links_from_youtube(feed_parser)
         rv = self._created_videos
@@ -66,22 +92,26 @@ class VideoImporter(object):
             self._create_videos(feed_parser)
             next_urls = self._next_urls(feed_parser)
 
-    def _create_videos(self, feed_parser):
-        from videos.models import VideoUrl
-
-        items = list(feed_parser.items(ignore_error=True))
+    def _create_videos(self, feed_parser, since=None):
+        from videos.models import VideoUrl, url_hash
 
-        urls = [
-            vt.convert_to_video_url()
+        if since:
+            # Only process entries newer than the last link we saw
+            items = feed_parser.items(ignore_error=True, since=since)
+        else:
+            items = feed_parser.items(ignore_error=True)
+        items = [
+            (vt, info, entry, vt.convert_to_video_url() if vt else None)
             for vt, info, entry in items
-            if vt is not None
         ]
+        urls = [url for vt, info, entry, url in items if url is not None]
         existing_urls = set(VideoUrl.objects
-                            .filter(url__in=urls)
+                            .filter(url_hash__in=[url_hash(url)
+                                                  for url in urls])
                             .values_list('url', flat=True))
 
-        for vt, info, entry in items:
-            if vt and vt.convert_to_video_url() not in existing_urls:
+        for vt, info, entry, url in items:
+            if vt and url not in existing_urls:
                 self._create_video(vt, info, entry)
             self.checked_entries += 1
 
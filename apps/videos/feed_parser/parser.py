@@ -16,6 +16,8 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+import hashlib
+
 from videos.types import video_type_registrar, VideoTypeError
 import feedparser
 from socket import gaierror
@@ -41,11 +43,42 @@ class FeedParser(object):
     See videos.tests.TestFeedParser for details.
     """
 
-    def __init__(self, feed_url):
+    def __init__(self, feed_url, etag=None, modified=None):
+        """Create a FeedParser
+
+        If etag or modified are passed, we use them to make a conditional
+        GET request.  Check not_modified() to see if the server told us the
+        feed hasn't changed.
+        """
         self.feed_url = feed_url
-        self.feed = feedparser.parse(feed_url)
+        self.feed = feedparser.parse(feed_url, etag=etag, modified=modified)
         self.parser = None
 
+    def not_modified(self):
+        return self.feed.get('status') == 304
+
+    @property
+    def etag(self):
+        return self.feed.get('etag')
+
+    @property
+    def modified(self):
+        return self.feed.get('modified')
+
+    def content_hash(self):
+        """Calculate a hash of the feed entries
+
+        Use this to detect unchanged feeds for servers that don't support
+        conditional GETs.
+        """
+        hasher = hashlib.sha1()
+        for entry in self.feed['entries']:
+            for key in ('id', 'link', 'updated'):
+                value = entry.get(key) or u''
+                hasher.update(value.encode('utf-8'))
+                hasher.update('\0')
+        return hasher.hexdigest()
+
     def items(self, reverse=False, until=False, since=False, ignore_error=False):
         """
         Iterator witch parse every entry and return VideoType instance if possible and
@@ -60,7 +93,7 @@ class FeedParser(object):
         if since or until:
             links = [entry.link for entry in entries]
 
-            since_index = self._get_index(links, since, default=0)
+            since_index = self._get_index(links, since, default=-1)
             last_index = self._get_index(links, until, default=len(links))
 
             entries = entries[since_index+1:last_index]
@@ -29,6 +29,7 @@ from django.core.management.base import BaseCommand
 from django.db import connection
 
 from externalsites.models import YouTubeAccount
+from utils import metrics
 from videos.models import VideoFeed
 
 logger = logging.getLogger(__name__)
@@ -39,6 +40,10 @@ def commit():
 class Command(BaseCommand):
     """
     Long-running process that updates our video feeds
+
+    Each pass takes FEEDWORKER_PASS_DURATION seconds.  We update all YouTube
+    accounts, but only the video feeds whose next_update time is before the
+    end of the pass (see VideoFeed.schedule_next_update()).
     """
 
     def add_arguments(self, parser):
@@ -64,7 +69,10 @@ class Command(BaseCommand):
                 time.sleep(seconds_per_task)
 
     def fetch_tasks(self):
-        video_feeds = VideoFeed.objects.values_list('id', flat=True)
+        video_feeds = (VideoFeed.objects
+                       .due_during_pass(VideoFeed.now())
+                       .order_by('next_update')
+                       .values_list('id', flat=True))
         youtube_accounts = (YouTubeAccount.objects
                             .accounts_to_import()
                             .values_list('id', flat=True))
@@ -102,12 +110,22 @@ def init_worker():
 def update_video_feed(feed_id):
     try:
         video_feed = VideoFeed.objects.get(pk=feed_id)
-        video_feed.update()
+        start_time = time.time()
+        new_videos = video_feed.update()
+        poll_time = time.time() - start_time
     except VideoFeed.DoesNotExist:
         logger.info('update_video_feed: VideoFeed does not exist. '
                     'ID: %s'.format(feed_id))
     else:
-        logger.info('Updated {}'.format(video_feed))
+        metrics.record('feedworker.poll-time', poll_time)
+        # A "hit" is a poll that found new videos
+        if new_videos:
+            metrics.increment('feedworker.poll.hit')
+        else:
+            metrics.increment('feedworker.poll.miss')
+        logger.info('Updated {} ({} new videos in {:.2f}s, next update: '
+                    '{})'.format(video_feed, len(new_videos), poll_time,
+                                 video_feed.next_update))
     commit()
     sys.stdout.flush()
 
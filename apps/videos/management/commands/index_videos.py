@@ -16,25 +16,145 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+from collections import defaultdict
+import multiprocessing
+import os
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Case, When, Value, TextField
 
-from videos.models import Video
-import time
+from search.index import InvertedIndexSearchBackend
+from subtitles.models import SubtitleVersion
+from videos.models import (Video, VideoUrl, build_search_text,
+                           make_title_from_url, MAX_SEACH_TEXT_LENGTH)
+
+VIDEO_FIELDS = ('id', 'title', 'description', 'video_id', 'meta_1_content',
+                'meta_2_content', 'meta_3_content')
+TIP_FIELDS = ('video_id', 'title', 'description', 'meta_1_content',
+              'meta_2_content', 'meta_3_content')
+
+def fetch_batch(last_id, batch_size):
+    """Fetch the data to index a batch of videos
+
+    This uses 3 queries for the entire batch: one for the videos, one for
+    their URLs and one for their public tips.
+
+    Returns:
+        list of (video_row, urls, primary_url, tip_parts) tuples.  These only
+        contain simple values so that they can be sent to the worker
+        processes.
+    """
+    video_rows = list(Video.objects.filter(id__gt=last_id).order_by('id')
+                      .values_list(*VIDEO_FIELDS)[:batch_size])
+    video_ids = [row[0] for row in video_rows]
+    urls = defaultdict(list)
+    primary_urls = {}
+    url_qs = (VideoUrl.objects.filter(video_id__in=video_ids)
+              .order_by('video', '-primary')
+              .values_list('video_id', 'url', 'primary'))
+    for video_id, url, primary in url_qs:
+        urls[video_id].append(url)
+        if primary:
+            primary_urls.setdefault(video_id, url)
+    tip_parts = defaultdict(list)
+    tip_qs = (SubtitleVersion.objects.public_tips()
+              .filter(video_id__in=video_ids)
+              .values_list(*TIP_FIELDS))
+    for row in tip_qs:
+        tip_parts[row[0]].extend(row[1:])
+    return [
+        (row, urls[row[0]], primary_urls.get(row[0]), tip_parts[row[0]])
+        for row in video_rows
+    ]
+
+def calc_search_text(item):
+    """Calculate the search text for a video
+
+    This mirrors Video.calc_search_text(), using the data from fetch_batch()
+    """
+    video_row, urls, primary_url, tip_parts = item
+    pk, title, description, video_id, meta_1, meta_2, meta_3 = video_row
+    if not title:
+        title = make_title_from_url(primary_url) if primary_url else 'No title'
+    parts = [title, description, video_id, meta_1, meta_2, meta_3]
+    parts.extend(urls)
+    parts.extend(tip_parts)
+    return pk, build_search_text(parts, MAX_SEACH_TEXT_LENGTH)
+
+# Max size of the search text in a single UPDATE statement.  This needs to
+# stay well below MySQL's max_allowed_packet.
+MAX_UPDATE_SIZE = 1000 * 1000
+
+def split_by_size(search_texts, max_size=MAX_UPDATE_SIZE):
+    """Split a list of (pk, search_text) tuples into chunks to write
+
+    Each chunk contains at most max_size bytes of search text, except when a
+    single search text is bigger than that.  Those get a chunk to
+    themselves.
+    """
+    chunk = []
+    chunk_size = 0
+    for pk, text in search_texts:
+        size = len(text.encode('utf-8'))
+        if chunk and chunk_size + size > max_size:
+            yield chunk
+            chunk = []
+            chunk_size = 0
+        chunk.append((pk, text))
+        chunk_size += size
+    if chunk:
+        yield chunk
+
+def write_search_texts(search_texts):
+    """Write search texts to the DB
+
+    This uses a single UPDATE statement for each chunk from split_by_size().
+    It only touches the search_text column and doesn't send any signals.
+    """
+    for chunk in split_by_size(search_texts):
+        Video.objects.filter(id__in=[pk for pk, text in chunk]).update(
+            search_text=Case(*[
+                When(id=pk, then=Value(text)) for pk, text in chunk
+            ], output_field=TextField()))
 
 class Command(BaseCommand):
     help = "Recalculate the search index for all videos"
     def add_arguments(self, parser):
         parser.add_argument('-b', '--batch-size', dest='batch-size', default=100,
-                    help='Set amount of videos to update at once'),
+                    type=int, help='Set amount of videos to update at once'),
         parser.add_argument('-l', '--rate-limit', dest='rate-limit', metavar='COUNT',
                     help='Only update COUNT videos per second')
+        parser.add_argument('--bulk', action='store_true',
+                    help='Fetch and write the search text for each batch '
+                    'using bulk queries')
+        parser.add_argument('-p', '--processes', type=int, default=1,
+                    help='Number of processes to calculate the search text '
+                    'with (bulk mode only)')
+        parser.add_argument('--checkpoint', metavar='FILE',
+                    help='Store the last indexed video id in FILE after each '
+                    'batch and resume from it on the next run (bulk and '
+                    'inverted index modes only)')
+        parser.add_argument('--inverted-index', action='store_true',
+                    help='Build the inverted search index instead of '
+                    'Video.search_text.  Run this before setting '
+                    'SEARCH_BACKEND to inverted-index')
 
     def handle(self, **options):
-        batch_size = options['batch-size']
         if options['rate-limit']:
-            rate_limit = float(options['rate-limit'])
+            self.rate_limit = float(options['rate-limit'])
+        else:
+            self.rate_limit = None
+        if options['inverted_index']:
+            self.handle_inverted_index(options)
+        elif options['bulk']:
+            self.handle_bulk(options)
         else:
-            rate_limit = None
+            self.handle_single(options)
+
+    def handle_single(self, options):
+        batch_size = options['batch-size']
         start_time = time.time()
         last_id = -1
         count = 0
@@ -56,5 +176,107 @@ class Command(BaseCommand):
             self.stdout.write('indexed {} videos ({:.2f} videos/sec last_id: {})\n'.format(
                 count, rate, last_id))
             self.stdout.flush()
-            if rate_limit is not None and rate > rate_limit:
-                time.sleep((count / rate_limit) - (current_time - start_time))
+            self.apply_rate_limit(count, start_time)
+
+    def handle_bulk(self, options):
+        batch_size = options['batch-size']
+        checkpoint = options['checkpoint']
+        last_id = self.read_checkpoint(checkpoint)
+        if options['processes'] > 1:
+            # Don't share DB connections with the worker processes
+            connections.close_all()
+            pool = multiprocessing.Pool(options['processes'])
+            calc_all = lambda items: pool.map(calc_search_text, items,
+                                              chunksize=10)
+        else:
+            pool = None
+            calc_all = lambda items: map(calc_search_text, items)
+
+        stage_times = {'fetch': 0.0, 'calc': 0.0, 'write': 0.0}
+        start_time = time.time()
+        count = 0
+        try:
+            while True:
+                stage_start = time.time()
+                items = fetch_batch(last_id, batch_size)
+                stage_times['fetch'] += time.time() - stage_start
+                if not items:
+                    break
+
+                stage_start = time.time()
+                search_texts = calc_all(items)
+                stage_times['calc'] += time.time() - stage_start
+
+                stage_start = time.time()
+                write_search_texts(search_texts)
+                stage_times['write'] += time.time() - stage_start
+
+                count += len(items)
+                last_id = items[-1][0][0]
+                self.write_checkpoint(checkpoint, last_id)
+                self.stdout.write(
+                    'indexed {} videos ({:.2f} videos/sec last_id: {}) '
+                    '{}\n'.format(count, count / (time.time() - start_time),
+                                  last_id,
+                                  self.format_stage_rates(count, stage_times)))
+                self.stdout.flush()
+                self.apply_rate_limit(count, start_time)
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    def handle_inverted_index(self, options):
+        # Use the backend directly rather than get_backend(), since we
+        # need to build the index before switching SEARCH_BACKEND to it.
+        backend = InvertedIndexSearchBackend()
+        batch_size = options['batch-size']
+        checkpoint = options['checkpoint']
+        last_id = self.read_checkpoint(checkpoint)
+        start_time = time.time()
+        count = 0
+        while True:
+            videos = list(Video.objects.filter(id__gt=last_id)
+                          .order_by('id')[:batch_size])
+            if not videos:
+                break
+            for video in videos:
+                backend.rebuild_video(video)
+                count += 1
+            last_id = videos[-1].id
+            self.write_checkpoint(checkpoint, last_id)
+            self.stdout.write(
+                'indexed {} videos ({:.2f} videos/sec last_id: {})\n'.format(
+                    count, count / (time.time() - start_time), last_id))
+            self.stdout.flush()
+            self.apply_rate_limit(count, start_time)
+
+    def format_stage_rates(self, count, stage_times):
+        return ' '.join(
+            '{}: {:.2f}/sec'.format(stage, count / stage_times[stage]
+                                    if stage_times[stage] else 0)
+            for stage in ('fetch', 'calc', 'write'))
+
+    def apply_rate_limit(self, count, start_time):
+        if self.rate_limit is None:
+            return
+        elapsed = time.time() - start_time
+        if count / elapsed > self.rate_limit:
+            time.sleep((count / self.rate_limit) - elapsed)
+
+    def read_checkpoint(self, path):
+        if path is None or not os.path.exists(path):
+            return -1
+        with open(path) as f:
+            last_id = int(f.read().strip())
+        self.stdout.write('resuming after video id {}\n'.format(last_id))
+        return last_id
+
+    def write_checkpoint(self, path, last_id):
+        if path is None:
+            return
+        # Write to a temp file and rename it so that we never leave a partial
+        # checkpoint if we get killed
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('{}\n'.format(last_id))
+        os.rename(tmp_path, path)
@@ -16,58 +16,115 @@
 # along with this program.  If not, see
 # http://www.gnu.org/licenses/agpl-3.0.html.
 
+"""
+metadata_manager -- Keep the denormalized Video fields up to date
+
+update_metadata() recalculates is_public, is_subtitled, was_subtitled,
+languages_count and complete_date for a video, then saves the changed fields
+with a single UPDATE statement.  update_metadata_for_videos() does the same
+thing for many videos at once.  It fetches the languages with a fixed number
+of queries, but checking if a completed language is synced still needs to
+look up its tip, so that part is one check per completed language.
+"""
+
+from collections import defaultdict
 from datetime import datetime
 
 def update_metadata(video_pk):
     from videos.models import Video
-    video = Video.objects.get(pk=video_pk)
-    video.edited = datetime.now()
-    video.save()
-    _update_is_public(video)
-    _update_is_was_subtitled(video)
-    _update_languages_count(video)
-    _update_complete_date(video)
-    _invalidate_cache(video)
+    video = (Video.objects.select_related('teamvideo__team')
+             .get(pk=video_pk))
+    changes = _calc_changes([video])[video.pk]
+    changes['edited'] = datetime.now()
+    _save_changes(video, changes)
 
-def _update_is_was_subtitled(video):
+def update_metadata_for_videos(video_pks):
+    """Refresh the metadata for many videos at once
+
+    Unlike update_metadata(), this doesn't touch the edited timestamp and
+    doesn't write anything for videos whose metadata is already up to date.
+
+    Returns:
+        list of pks for the videos that were changed
+    """
+    from videos.models import Video
+    videos = list(Video.objects.select_related('teamvideo__team')
+                  .filter(pk__in=video_pks))
+    all_changes = _calc_changes(videos)
+    changed = []
+    for video in videos:
+        if all_changes[video.pk]:
+            _save_changes(video, all_changes[video.pk])
+            changed.append(video.pk)
+    return changed
+
+def _calc_changes(videos):
+    """Calculate the changed metadata fields for a list of videos
+
+    Returns:
+        dict mapping video pks to dicts of changed field values
+    """
     from subtitles.models import SubtitleLanguage
-    language_code = video.primary_audio_language_code
-    has_version = (SubtitleLanguage.objects.having_nonempty_tip()
-                                           .filter(video=video, 
-                                                   language_code=language_code)
-                                           .exists())
-
-    if not has_version:
-        if video.is_subtitled:
-            video.is_subtitled = False
-            video.save()
-    else:
-        if not video.is_subtitled or not video.was_subtitled:
-            video.is_subtitled = True
-            video.was_subtitled = True
-            video.save()
-
-def _update_languages_count(video):
-    video.languages_count = video.newsubtitlelanguage_set.having_nonempty_tip().count()
-    video.save()
-
-def _update_complete_date(video):
-    is_complete = video.is_complete
-    if is_complete and video.complete_date is None:
-        video.complete_date = datetime.now()
-        video.save()
-    elif not is_complete and video.complete_date is not None:
-        video.complete_date = None
-        video.save()
 
-def _invalidate_cache(video):
-    from widget import video_cache
-    video_cache.invalidate_cache(video.video_id)
+    video_pks = [v.pk for v in videos]
+    nonempty_languages = defaultdict(set)
+    qs = (SubtitleLanguage.objects.having_nonempty_tip()
+          .filter(video_id__in=video_pks)
+          .values_list('video_id', 'language_code'))
+    for video_id, language_code in qs:
+        nonempty_languages[video_id].add(language_code)
+
+    complete_video_pks = set()
+    qs = SubtitleLanguage.objects.filter(video_id__in=video_pks,
+                                         subtitles_complete=True)
+    for language in qs:
+        if (language.video_id not in complete_video_pks and
+                language.is_complete_and_synced()):
+            complete_video_pks.add(language.video_id)
+
+    all_changes = {}
+    for video in videos:
+        new_values = {
+            'is_public': _calc_is_public(video),
+            'languages_count': len(nonempty_languages[video.pk]),
+        }
+        if video.primary_audio_language_code in nonempty_languages[video.pk]:
+            new_values['is_subtitled'] = True
+            new_values['was_subtitled'] = True
+        else:
+            new_values['is_subtitled'] = False
+        if video.pk in complete_video_pks:
+            if video.complete_date is None:
+                new_values['complete_date'] = datetime.now()
+        elif video.complete_date is not None:
+            new_values['complete_date'] = None
+        all_changes[video.pk] = dict(
+            (name, value) for name, value in new_values.items()
+            if getattr(video, name) != value)
+    return all_changes
 
-def _update_is_public(video):
+def _calc_is_public(video):
     team_video = video.get_team_video()
     if team_video:
-        video.is_public = team_video.team.videos_public()
+        return team_video.team.videos_public()
     else:
-        video.is_public = True
-    video.save()
+        return True
+
+def _save_changes(video, changes):
+    from search.index import get_backend
+    from videos.models import Video
+
+    if not changes:
+        return
+    for name, value in changes.items():
+        setattr(video, name, value)
+    Video.objects.filter(pk=video.pk).update(**changes)
+    # update() skips the post_save handler that normally invalidates these
+    video.cache.invalidate()
+    _invalidate_cache(video)
+    if set(changes) != set(['edited']):
+        get_backend().on_video_metadata_changed(video)
+
+def _invalidate_cache(video):
+    from widget import video_cache
+    video_cache.invalidate_cache(video.video_id)
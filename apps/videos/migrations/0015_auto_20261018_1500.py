@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 15:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0014_auto_20181129_0617'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofeed',
+            name='last_new_video',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videofeed',
+            name='next_update',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videofeed',
+            name='poll_interval',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 16:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0015_auto_20261018_1500'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofeed',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='videofeed',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='videofeed',
+            name='last_link',
+            field=models.URLField(blank=True, max_length=512),
+        ),
+        migrations.AddField(
+            model_name='videofeed',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
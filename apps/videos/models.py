@@ -129,6 +129,17 @@ def make_title_from_url(url):
     else:
         return url
 
+def build_search_text(parts, max_length=None):
+    """Join the parts of a video's search text together
+
+    This is used by Video.calc_search_text() and the bulk mode of the
+    index_videos command.
+    """
+    text = '\n'.join(p for p in parts if p is not None)
+    if max_length is not None:
+        text = text[:max_length]
+    return text
+
 class AlreadyEditingException(Exception):
     def __init__(self, msg):
         self.msg = msg
@@ -251,14 +262,14 @@ class SubtitleLanguageFetcher(object):
         return languages
 
     def prefetch_languages(self, video, languages, with_public_tips,
-                           with_private_tips):
+                           with_private_tips, with_is_synced=False):
         language_qs = video.newsubtitlelanguage_set.all()
         if languages is not None:
             language_qs = language_qs.filter(
                 language_code__in=languages)
         fetched_languages = language_qs.fetch_and_join(
             video=video, public_tips=with_public_tips,
-            private_tips=with_private_tips)
+            private_tips=with_private_tips, is_synced=with_is_synced)
         for lang in fetched_languages:
             self.cache[lang.language_code] = lang
         if languages is None:
@@ -477,10 +488,7 @@ class Video(models.Model):
                 tip.meta_1_content, tip.meta_2_content, tip.meta_3_content,
             ])
 
-        text = '\n'.join(p for p in parts if p is not None)
-        if max_length is not None:
-            text = text[:max_length]
-        return text
+        return build_search_text(parts, max_length)
 
     def title_display(self, use_language_title=True):
         """
@@ -1124,7 +1132,7 @@ class Video(models.Model):
         return None
 
     def prefetch_languages(self, languages=None, with_public_tips=False,
-                           with_private_tips=False):
+                           with_private_tips=False, with_is_synced=False):
         """Prefetch and cache languages/versions for this video
 
         This method fetches subtitle languages and subtitle versions for this
@@ -1137,10 +1145,13 @@ class Video(models.Model):
         cache them
         :with_private_tips: fetch the private tips for all the languages and
         cache them
+        :with_is_synced: fetch the cached is_synced() values for all the
+        languages
         """
         self._language_fetcher.prefetch_languages(self, languages,
                                                   with_public_tips,
-                                                  with_private_tips)
+                                                  with_private_tips,
+                                                  with_is_synced)
 
     def clear_language_cache(self):
         self._language_fetcher.clear_cache()
@@ -2370,14 +2381,45 @@ pre_delete.connect(video_cache.on_video_url_delete, VideoUrl)
 
 
 # VideoFeed
+class VideoFeedManager(models.Manager):
+    def due_for_update(self, now):
+        return self.filter(Q(next_update__isnull=True) |
+                           Q(next_update__lte=now))
+
+    def due_during_pass(self, pass_start):
+        """Get feeds that are due before the end of a feedworker pass
+
+        The feedworker only fetches feeds at the start of each pass, so we
+        need to include the feeds that become due during the pass.
+        Otherwise a feed that's due just after the pass starts would wait
+        for the next pass, almost doubling its poll interval.
+        """
+        return self.due_for_update(pass_start + timedelta(
+            seconds=settings.FEEDWORKER_PASS_DURATION))
+
 class VideoFeed(models.Model):
     url = models.URLField()
     created = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, blank=True, null=True)
     team = models.ForeignKey("teams.Team", blank=True, null=True)
     last_update = models.DateTimeField(null=True)
+    # Polling schedule for the feedworker.  Feeds that have new videos get
+    # polled every FEEDWORKER_MIN_INTERVAL seconds.  Each poll without new
+    # videos doubles poll_interval, up to FEEDWORKER_MAX_INTERVAL.
+    poll_interval = models.PositiveIntegerField(null=True, blank=True)
+    next_update = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_new_video = models.DateTimeField(null=True, blank=True)
+    # Data from the last poll, used to skip unchanged feeds (see
+    # VideoImporter.validators)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=40, blank=True)
+    last_link = models.URLField(max_length=512, blank=True)
+
+    objects = VideoFeedManager()
 
     YOUTUBE_PAGE_SIZE = 25
+    VALIDATOR_FIELDS = ('etag', 'last_modified', 'content_hash', 'last_link')
 
     def __unicode__(self):
         return self.url
@@ -2391,10 +2433,19 @@ class VideoFeed(models.Model):
 
     def update(self):
         importer = VideoImporter(self.url, self.user, self.team)
+        importer.validators = dict(
+            (name, getattr(self, name)) for name in self.VALIDATOR_FIELDS
+            if getattr(self, name))
         new_videos = importer.import_videos(
             import_next=self.last_update is None)
+        for name in self.VALIDATOR_FIELDS:
+            value = importer.validators.get(name) or ''
+            if len(value) > self._meta.get_field(name).max_length:
+                value = ''
+            setattr(self, name, value)
 
         self.last_update = VideoFeed.now()
+        self.schedule_next_update(len(new_videos))
         self.save()
         # create videos last-to-first so that the latest video is at the top
         # of the list when viewing the imported videos
@@ -2403,6 +2454,21 @@ class VideoFeed(models.Model):
         signals.feed_imported.send(sender=self, new_videos=new_videos)
         return new_videos
 
+    def schedule_next_update(self, new_video_count):
+        """Calculate next_update after polling the feed
+
+        Call this after setting last_update.
+        """
+        if new_video_count:
+            self.last_new_video = self.last_update
+        if new_video_count or self.poll_interval is None:
+            self.poll_interval = settings.FEEDWORKER_MIN_INTERVAL
+        else:
+            self.poll_interval = min(self.poll_interval * 2,
+                                     settings.FEEDWORKER_MAX_INTERVAL)
+        self.next_update = (self.last_update +
+                            timedelta(seconds=self.poll_interval))
+
     def count_imported_videos(self):
         return self.importedvideo_set.count()
 
@@ -338,7 +338,7 @@ def _get_related_task(request):
 
 def activity(request, video_id):
     video = get_object_or_404(Video, video_id=video_id)
-    qs = ActivityRecord.objects.for_video(video)
+    qs = ActivityRecord.objects.for_video(video).with_related_objects()
 
     extra_context = {
         'video': video,
@@ -785,18 +785,19 @@ def video_debug(request, video_id):
 
     video = get_object_or_404(Video, video_id=video_id)
     vid = video.video_id
+    cache_group = vc._video_cache_group(vid)
     get_subtitles_dict = {}
 
     for l in video.newsubtitlelanguage_set.all():
-        cache_key = vc._subtitles_dict_key(vid, l.pk, None)
-        get_subtitles_dict[l.language_code] = cache.get(cache_key)
+        cache_key = vc._subtitles_dict_key(l.pk)
+        get_subtitles_dict[l.language_code] = cache_group.get(cache_key)
 
     cache = {
-        "get_video_urls": cache.get(vc._video_urls_key(vid)),
+        "get_video_urls": cache_group.get('video-urls'),
         "get_subtitles_dict": get_subtitles_dict,
-        "get_video_languages": cache.get(vc._video_languages_key(vid)),
+        "get_video_languages": cache_group.get('languages'),
 
-        "get_video_languages_verbose": cache.get(vc._video_languages_verbose_key(vid)),
+        "get_video_languages_verbose": cache_group.get('languages-verbose'),
         "writelocked_langs": cache.get(vc._video_writelocked_langs_key(vid)),
     }
 
@@ -26,6 +26,7 @@ import requests
 from babelsubs.storage import diff as diff_subtitles
 from messages.models import Message
 from messages import tasks
+from search.index import get_backend
 from utils import send_templated_email, DEFAULT_PROTOCOL
 from videos.models import (VideoFeed, Video, VIDEO_TYPE_YOUTUBE, VideoUrl)
 from subtitles.models import (
@@ -74,25 +75,55 @@ def update_video_feed(video_feed_id):
             '**update_video_feed**. VideoFeed does not exist. ID: %s',
             video_feed_id)
 
-@job
-def video_changed_tasks(video_pk, new_version_id=None):
+def _video_changed_tasks_args(video_pk, new_version_id=None,
+                              new_version_ids=None):
+    version_ids = set(new_version_ids or [])
+    if new_version_id is not None:
+        version_ids.add(new_version_id)
+    return video_pk, version_ids
+
+def _merge_video_changed_tasks(calls):
+    """Merge pending video_changed_tasks calls into one call
+
+    The merged call handles the union of all the new versions.
+    """
+    video_pk = None
+    all_version_ids = set()
+    for args, kwargs in calls:
+        video_pk, version_ids = _video_changed_tasks_args(*args, **kwargs)
+        all_version_ids.update(version_ids)
+    return (video_pk,), {'new_version_ids': sorted(all_version_ids)}
+
+@job(coalesce_key=lambda *args, **kwargs: _video_changed_tasks_args(
+        *args, **kwargs)[0],
+     coalesce_delay=settings.VIDEO_CHANGED_TASKS_COALESCE_DELAY,
+     coalesce_merge=_merge_video_changed_tasks)
+def video_changed_tasks(video_pk, new_version_id=None, new_version_ids=None):
+    """Update a video after it changes
+
+    Calls for the same video get coalesced into one job (see
+    utils.taskqueue).  new_version_ids contains the new versions from all the
+    merged calls.
+    """
     from videos import metadata_manager
     from videos.models import Video
     from teams.models import TeamVideo, BillingRecord
 
     metadata_manager.update_metadata(video_pk)
-    if new_version_id is not None:
-        send_new_version_notification(new_version_id)
+    video_pk, version_ids = _video_changed_tasks_args(
+        video_pk, new_version_id, new_version_ids)
+    for version_id in sorted(version_ids):
+        send_new_version_notification(version_id)
         try:
             BillingRecord.objects.insert_record(
-                SubtitleVersion.objects.get(pk=new_version_id))
+                SubtitleVersion.objects.get(pk=version_id))
         except Exception, e:
             logger.error("Could not add billing record", extra={
-                "version_pk": new_version_id,
+                "version_pk": version_id,
                 "exception": str(e)})
 
     video = Video.objects.get(pk=video_pk)
-    video.update_search_index()
+    get_backend().on_video_changed(video)
 
 @job
 def subtitles_complete_changed(language_pk):
@@ -30,7 +30,7 @@ LIMIT = settings.RECENT_ACTIVITIES_ONPAGE
 
 @register.inclusion_tag('videos/_recent_activity.html')
 def recent_activity(user):
-    qs = ActivityRecord.objects.for_user(user)
+    qs = ActivityRecord.objects.for_user(user).with_related_objects()
 
     return {
         'records': qs[:LIMIT],
@@ -39,7 +39,7 @@ def recent_activity(user):
 
 @register.inclusion_tag('videos/_video_activity.html')
 def video_activity(video, user, use_old_messages):
-    qs = ActivityRecord.objects.for_video(video)
+    qs = ActivityRecord.objects.for_video(video).with_related_objects()
 
     return {
         'records': qs[:LIMIT],
@@ -206,7 +206,8 @@ def multi_video_create_subtitles_data_attrs(video):
 @cached_by_video('language-list')
 def language_list(video):
     video.prefetch_languages(with_public_tips=True,
-                             with_private_tips=True)
+                             with_private_tips=True,
+                             with_is_synced=True)
     return mark_safe(render_to_string('videos/_language-list.html', {
         'video': video,
         'language_list': LanguageList(video),
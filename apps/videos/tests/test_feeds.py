@@ -79,6 +79,30 @@ class TestFeedParser(FeedImportTest):
         feed_url = 'http://www.dailymotion.com/rss/ru/featured/channel/tech/1'
         self.check_video_types(feed_url, DailymotionVideoType)
 
+    def test_items_since(self):
+        self.set_feed_data(VIMEO_FEED_XML)
+        feed_parser = FeedParser('http://vimeo.com/blakewhitman/videos/rss')
+        links = [entry['link'] for vt, info, entry in feed_parser.items()]
+        self.assertEquals(
+            [entry['link'] for vt, info, entry in
+             feed_parser.items(since=links[0])],
+            links[1:])
+        # If we don't find the link, we should return all entries
+        self.assertEquals(
+            [entry['link'] for vt, info, entry in
+             feed_parser.items(since='http://example.com/unknown')],
+            links)
+
+    def test_content_hash(self):
+        self.set_feed_data(VIMEO_FEED_XML)
+        content_hash = FeedParser('http://example.com/feed').content_hash()
+        self.assertEquals(FeedParser('http://example.com/feed').content_hash(),
+                          content_hash)
+        self.set_feed_data(DAILY_MOTION_XML)
+        self.assertNotEquals(
+            FeedParser('http://example.com/feed').content_hash(),
+            content_hash)
+
 class EntryDataTest(FeedImportTest):
     def setUp(self):
         FeedImportTest.setUp(self)
@@ -59,6 +59,8 @@ class VideoImporterTestCase(TestCase):
         return.
         """
         self.feed_parser = mock.Mock()
+        self.feed_parser.not_modified.return_value = False
+        self.feed_parser.content_hash.return_value = 'hash'
         self.feed_parser.feed.entries = [self.entry(name)
                                     for (name, extra) in item_info]
         self.feed_parser.feed.feed = {}
@@ -200,6 +202,40 @@ class VideoImporterTestCase(TestCase):
         self.run_import_videos(import_next=False)
         self.assertEquals(urls_parsed, [self.feed_url()])
 
+    def test_not_modified(self):
+        self.setup_feed_items([('item-1', {})])
+        self.feed_parser.not_modified.return_value = True
+        import_obj = importer.VideoImporter(self.feed_url(), self.user, None)
+        import_obj.validators = {'etag': 'abc'}
+        assert_equal(import_obj.import_videos(), [])
+        self.mock_feedparser_class.assert_called_with(
+            self.feed_url(), etag='abc', modified=None)
+        assert_equal(Video.objects.count(), 0)
+
+    def test_content_hash_unchanged(self):
+        self.setup_feed_items([('item-1', {})])
+        import_obj = importer.VideoImporter(self.feed_url(), self.user, None)
+        import_obj.validators = {'content_hash': 'hash'}
+        assert_equal(import_obj.import_videos(), [])
+        assert_equal(Video.objects.count(), 0)
+
+    def test_validators(self):
+        self.setup_feed_items([('item-2', {}), ('item-1', {})])
+        self.feed_parser.etag = 'abc'
+        self.feed_parser.modified = 'Sat, 01 Jan 2000 00:00:00 GMT'
+        import_obj = importer.VideoImporter(self.feed_url(), self.user, None)
+        import_obj.validators = {'last_link': self.url('item-1')}
+        import_obj.import_videos()
+        # We should only process entries after the last link
+        self.feed_parser.items.assert_called_with(ignore_error=True,
+                                                  since=self.url('item-1'))
+        assert_equal(import_obj.validators, {
+            'etag': 'abc',
+            'last_modified': 'Sat, 01 Jan 2000 00:00:00 GMT',
+            'content_hash': 'hash',
+            'last_link': self.url('item-2'),
+        })
+
 class VideoFeedTest(TestCase):
     @test_utils.patch_for_test('videos.models.VideoImporter')
     def setUp(self, MockVideoImporter):
@@ -275,3 +311,58 @@ class VideoFeedTest(TestCase):
         self.assertEquals(feed.last_update, now)
         self.assertEquals([iv.video for iv in feed.importedvideo_set.all()],
                           videos2 + videos)
+
+    @test_utils.patch_for_test('videos.models.VideoFeed.now')
+    def test_pass_boundaries(self, mock_now):
+        active_feed = VideoFeed.objects.create(url='http://example.com/1')
+        idle_feed = VideoFeed.objects.create(url='http://example.com/2',
+                                             poll_interval=3600)
+        pass_start = datetime.datetime(2000, 1, 1)
+        def due_during_pass(n):
+            return set(VideoFeed.objects.due_during_pass(
+                pass_start + datetime.timedelta(hours=n)))
+        with self.settings(FEEDWORKER_PASS_DURATION=3600,
+                           FEEDWORKER_MIN_INTERVAL=3600,
+                           FEEDWORKER_MAX_INTERVAL=3600 * 8):
+            # Poll both feeds halfway through the first pass
+            mock_now.return_value = (pass_start +
+                                     datetime.timedelta(minutes=30))
+            self.mock_video_importer.import_videos.return_value = [
+                VideoFactory()]
+            active_feed.update()
+            self.mock_video_importer.import_videos.return_value = []
+            idle_feed.update()
+            # The active feed is due halfway through the next pass, so it
+            # should get picked up then rather than waiting another pass
+            assert_equal(due_during_pass(1), set([active_feed]))
+            # The idle feed backed off to 2 hours, so it's due in the pass
+            # after that
+            assert_equal(due_during_pass(2), set([active_feed, idle_feed]))
+
+    @test_utils.patch_for_test('videos.models.VideoFeed.now')
+    def test_adaptive_polling(self, mock_now):
+        feed = VideoFeed.objects.create(url='http://example.com/feed.rss')
+        now = datetime.datetime(2000, 1, 1)
+        mock_now.return_value = now
+        with self.settings(FEEDWORKER_MIN_INTERVAL=60,
+                           FEEDWORKER_MAX_INTERVAL=300):
+            # New feeds are due right away
+            assert_true(VideoFeed.objects.due_for_update(now).filter(
+                id=feed.id).exists())
+            # Polls without new videos back off exponentially
+            self.mock_video_importer.import_videos.return_value = []
+            intervals = []
+            for i in range(5):
+                feed.update()
+                intervals.append(feed.poll_interval)
+            assert_equal(intervals, [60, 120, 240, 300, 300])
+            assert_equal(feed.next_update,
+                         now + datetime.timedelta(seconds=300))
+            assert_false(VideoFeed.objects.due_for_update(now).filter(
+                id=feed.id).exists())
+            # Finding new videos resets the interval
+            self.mock_video_importer.import_videos.return_value = [
+                VideoFactory()]
+            feed.update()
+            assert_equal(feed.poll_interval, 60)
+            assert_equal(feed.last_new_video, now)
@@ -18,12 +18,18 @@
 
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+from StringIO import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 from nose.tools import *
 
 from utils.test_utils import *
 from utils.factories import *
+from search.index import InvertedIndexSearchBackend
 from subtitles import pipeline
+from videos.management.commands import index_videos
+from videos.models import Video
 
 class VideoIndexingTest(TestCase):
     @patch_for_test('videos.models.Video.calc_search_text')
@@ -84,6 +90,46 @@ class VideoIndexingTest(TestCase):
         index_text = video.calc_search_text(max_length=100)
         assert_equal(len(index_text), 100)
 
+    def test_bulk_index(self):
+        video = VideoFactory(title='video_title',
+                             video_url__url='http://example.com/url_1')
+        VideoURLFactory(video=video, url='http://example.com/url_2')
+        untitled_video = VideoFactory(title='',
+                                      video_url__url='http://example.com/3')
+        pipeline.add_subtitles(
+            video, 'en', SubtitleSetFactory(), title='en_title',
+            visibility='public')
+        pipeline.add_subtitles(
+            video, 'es', SubtitleSetFactory(), title='es_title',
+            visibility='private')
+        items = index_videos.fetch_batch(-1, 100)
+        search_texts = map(index_videos.calc_search_text, items)
+        index_videos.write_search_texts(search_texts)
+        for v in (video, untitled_video):
+            assert_equal(Video.objects.get(pk=v.pk).search_text,
+                         v.calc_search_text())
+
+    def test_split_by_size(self):
+        search_texts = [(1, u'a' * 5), (2, u'\xe9' * 5), (3, u'b' * 20),
+                        (4, u'c')]
+        # \xe9 is 2 bytes in UTF-8, so the second text is 10 bytes
+        assert_equal(list(index_videos.split_by_size(search_texts, 15)), [
+            [(1, u'a' * 5), (2, u'\xe9' * 5)],
+            [(3, u'b' * 20)],
+            [(4, u'c')],
+        ])
+
+    def test_build_inverted_index(self):
+        video = VideoFactory(title='Cats')
+        make_version(video, 'fr', title='Chats')
+        VideoFactory(title='Dogs')
+        # With the database backend, creating the videos doesn't update the
+        # inverted index
+        backend = InvertedIndexSearchBackend()
+        assert_equal(list(backend.search_videos('cats')), [])
+        call_command('index_videos', inverted_index=True, stdout=StringIO())
+        assert_equal(list(backend.search_videos('cats chats')), [video])
+
     # FIXME we should have searching tests, but we can't since we use sqlite
     # databases for our unittests and it has a different matching syntax then
     # MySQL
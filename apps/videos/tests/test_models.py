@@ -29,7 +29,8 @@ import mock
 from auth.models import CustomUser as User
 from subtitles import pipeline
 from subtitles.models import SubtitleLanguage
-from videos import signals
+from teams.models import VideoVisibility
+from videos import metadata_manager, signals
 from videos.models import Video, VideoUrl, VideoTypeUrlPattern
 from videos.tasks import video_changed_tasks
 from videos.tests.data import (
@@ -288,6 +289,42 @@ class TestModelsSaving(TestCase):
         video = _refresh(video)
         self.assertIsNotNone(video.complete_date)
 
+class MetadataManagerTest(TestCase):
+    def test_update_metadata(self):
+        video = VideoFactory(primary_audio_language_code='en')
+        make_version(video, 'en')
+        metadata_manager.update_metadata(video.pk)
+        video = Video.objects.get(pk=video.pk)
+        assert_equal(video.languages_count, 1)
+        assert_true(video.is_subtitled)
+        assert_true(video.was_subtitled)
+        assert_not_equal(video.edited, None)
+
+    def test_only_changed_fields_are_saved(self):
+        video = VideoFactory()
+        # Change a field behind the video object's back.  Since
+        # update_metadata() only writes the changed fields, it shouldn't
+        # overwrite it.
+        Video.objects.filter(pk=video.pk).update(title='New title')
+        metadata_manager.update_metadata(video.pk)
+        assert_equal(Video.objects.get(pk=video.pk).title, 'New title')
+
+    def test_update_metadata_for_videos(self):
+        team = TeamFactory(video_visibility=VideoVisibility.PUBLIC)
+        videos = [TeamVideoFactory(team=team).video for i in range(3)]
+        video_pks = [v.pk for v in videos]
+        assert_equal(metadata_manager.update_metadata_for_videos(video_pks),
+                     [])
+
+        team.video_visibility = VideoVisibility.PRIVATE
+        team.save()
+        assert_items_equal(
+            metadata_manager.update_metadata_for_videos(video_pks), video_pks)
+        for video in Video.objects.filter(pk__in=video_pks):
+            assert_false(video.is_public)
+        assert_equal(metadata_manager.update_metadata_for_videos(video_pks),
+                     [])
+
 class TestSubtitleLanguageCaching(TestCase):
     def setUp(self):
         self.videos, self.langs, self.versions = bulk_subs({
@@ -142,6 +142,14 @@ class TestViews(WebUseTest):
         response = self.client.get(self.video.get_absolute_url(), follow=True)
         self.assertEqual(response.status_code, 200)
 
+    def test_video_debug(self):
+        pipeline.add_subtitles(self.video, 'en', None)
+        video_cache.get_video_urls(self.video.video_id)
+        response = self._simple_test('videos:video_debug',
+                                     [self.video.video_id])
+        self.assertEqual(response.context['cache']['get_video_urls'],
+                         video_cache.get_video_urls(self.video.video_id))
+
     def test_legacy_history(self):
         # TODO: write tests
         pass
@@ -317,8 +317,9 @@ def video(request, video_id, video_url=None, title=None):
         allow_delete = allow_make_primary = False
 
     customization = behaviors.video_page_customize(request, video)
-    all_activities = ActivityRecord.objects.for_video(
-        video, customization.team)
+    all_activities = (ActivityRecord.objects
+                      .for_video(video, customization.team)
+                      .with_related_objects())
 
     if request.is_ajax() and request.GET.get('show-all', None):
         response_renderer = AJAXResponseRenderer(request)
@@ -526,7 +527,7 @@ def _get_related_task(request):
 
 def activity(request, video_id):
     video = get_object_or_404(Video, video_id=video_id)
-    qs = ActivityRecord.objects.for_video(video)
+    qs = ActivityRecord.objects.for_video(video).with_related_objects()
 
     extra_context = {
         'video': video,
@@ -624,7 +625,7 @@ def subtitles(request, video_id, lang, lang_id, version_id=None):
 
     customization = behaviors.subtitles_page_customize(request, video, subtitle_language)
     all_activities = (ActivityRecord.objects.for_video(video, customization.team)
-                .filter(language_code=lang))
+                .filter(language_code=lang).with_related_objects())
 
     if request.is_ajax() and request.GET.get('show-all', None):
         response_renderer = AJAXResponseRenderer(request)
@@ -1032,22 +1033,24 @@ def video_staff_delete(request, video_id):
 def video_debug(request, video_id):
     from widget import video_cache as vc
     from django.core.cache import cache
+    from caching.cachegroup import get_cache_pattern_stats
     from videos.models import VIDEO_TYPE_YOUTUBE
 
     video = get_object_or_404(Video, video_id=video_id)
     vid = video.video_id
+    cache_group = vc._video_cache_group(vid)
     get_subtitles_dict = {}
 
     for l in video.newsubtitlelanguage_set.all():
-        cache_key = vc._subtitles_dict_key(vid, l.pk, None)
-        get_subtitles_dict[l.language_code] = cache.get(cache_key)
+        cache_key = vc._subtitles_dict_key(l.pk)
+        get_subtitles_dict[l.language_code] = cache_group.get(cache_key)
 
     cache = {
-        "get_video_urls": cache.get(vc._video_urls_key(vid)),
+        "get_video_urls": cache_group.get('video-urls'),
         "get_subtitles_dict": get_subtitles_dict,
-        "get_video_languages": cache.get(vc._video_languages_key(vid)),
+        "get_video_languages": cache_group.get('languages'),
 
-        "get_video_languages_verbose": cache.get(vc._video_languages_verbose_key(vid)),
+        "get_video_languages_verbose": cache_group.get('languages-verbose'),
         "writelocked_langs": cache.get(vc._video_writelocked_langs_key(vid)),
     }
 
@@ -1059,7 +1062,8 @@ def video_debug(request, video_id):
             'video': video,
             'is_youtube': is_youtube,
             'tasks': tasks,
-            "cache": cache
+            "cache": cache,
+            "cache_patterns": get_cache_pattern_stats(),
     })
 
 def reset_metadata(request, video_id):
@@ -0,0 +1,54 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+
+from django.core.cache import cache
+from django.test import TestCase
+from nose.tools import *
+import mock
+
+from utils import test_utils
+from utils.factories import *
+from widget import video_cache
+
+class InvalidateCacheTest(TestCase):
+    def setUp(self):
+        test_utils.invalidate_widget_video_cache.run_original_for_test()
+        self.team_video = TeamVideoFactory()
+        self.video = self.team_video.video
+        VideoURLFactory(video=self.video)
+
+    def test_invalidate(self):
+        video_id = self.video.video_id
+        assert_equal(len(video_cache.get_video_urls(video_id)), 2)
+        VideoURLFactory(video=self.video)
+        video_cache.invalidate_cache(video_id)
+        assert_equal(len(video_cache.get_video_urls(video_id)), 3)
+
+    def test_round_trips(self):
+        # invalidate_cache() should use a constant number of cache round
+        # trips, no matter how many languages/URLs the video has.
+        cache_mock = mock.Mock(wraps=cache)
+        with mock.patch('widget.video_cache.cache', cache_mock), \
+                mock.patch('caching.cachegroup.cache', cache_mock):
+            video_cache.invalidate_cache(self.video.video_id)
+        assert_equal([c[0] for c in cache_mock.method_calls],
+                     ['set', 'delete_many'])
+        deleted_keys = cache_mock.delete_many.call_args[0][0]
+        assert_equal(len(deleted_keys), 3)
@@ -18,18 +18,27 @@
 import datetime
 import hashlib
 
-from django.conf import settings
 from django.core.cache import cache
 from django.utils.translation import (
     ugettext_lazy as _
 )
 
+from caching import CacheGroup
 from videos.types import video_type_registrar
 from videos.types.base import VideoTypeError
 import unilangs
 
 TIMEOUT = 60 * 60 * 24 * 5 # 5 days
 
+def _video_cache_group(video_id):
+    """Get the CacheGroup that stores the per-video widget values.
+
+    Storing the values in a CacheGroup means we can invalidate all of them by
+    changing the group's version key, rather than deleting each key.
+    """
+    return CacheGroup('widget-video:{0}'.format(video_id),
+                      invalidate_on_deploy=False, timeout=TIMEOUT)
+
 
 def get_video_id(video_url, public_only=False, referer=None):
     """
@@ -69,49 +78,31 @@ def associate_extra_url(video_url, video_id):
 
 # Invalidation
 def invalidate_cache(video_id):
-    cache.delete(_video_urls_key(video_id))
-
-    try:
-        from videos.models import Video
-        video = Video.objects.get(video_id=video_id)
-        for l in video.newsubtitlelanguage_set.all():
-            cache.delete(_subtitles_dict_key(video_id, l.pk))
-    except Video.DoesNotExist:
-        pass
-
-    for language in settings.ALL_LANGUAGES:
-        cache.delete(_subtitle_language_pk_key(video_id, language[0]))
-
-    cache.delete(_subtitle_language_pk_key(video_id, None))
-    cache.delete(_subtitles_dict_key(video_id, None))
-    cache.delete(_subtitles_count_key(video_id))
-    cache.delete(_video_languages_key(video_id))
-    cache.delete(_video_languages_verbose_key(video_id))
-    cache.delete(_video_is_moderated_key(video_id))
-    cache.delete(_video_visibility_policy_key(video_id))
-    cache.delete(_video_filename_key(video_id))
-
-    from videos.models import Video
-    try:
-        video = Video.objects.get(video_id=video_id)
-        for url in video.videourl_set.all():
-            cache.delete(_video_id_key(url.url))
-
-        team_video = video.get_team_video()
-
-        if team_video:
-            cache.delete(_video_completed_languages(team_video.id))
-    except Video.DoesNotExist:
-        pass
+    # All per-video values are invalidated with a single cache set.
+    _video_cache_group(video_id).invalidate()
+
+    # The video id lookups are keyed by URL and the completed languages are
+    # keyed by the team video, so they need to be deleted explicitly.  Fetch
+    # everything we need with 1 query and delete the keys with 1 call.
+    from videos.models import VideoUrl
+    keys_to_delete = set()
+    url_qs = (VideoUrl.objects.filter(video__video_id=video_id)
+              .values_list('url', 'video__teamvideo__id'))
+    for url, team_video_id in url_qs:
+        keys_to_delete.add(_video_id_key(url))
+        if team_video_id is not None:
+            keys_to_delete.add(_video_completed_languages(team_video_id))
+    if keys_to_delete:
+        cache.delete_many(list(keys_to_delete))
 
 def invalidate_video_id(video_url):
     cache.delete(_video_id_key(video_url))
 
 def invalidate_video_moderation(video_id):
-    cache.delete(_video_is_moderated_key(video_id))
+    _video_cache_group(video_id).invalidate()
 
 def invalidate_video_visibility(video_id):
-    cache.delete(_video_visibility_policy_key(video_id))
+    _video_cache_group(video_id).invalidate()
 
 def on_video_url_delete(sender, instance, **kwargs):
     if instance.video and instance.video.video_id:
@@ -120,73 +111,55 @@ def on_video_url_delete(sender, instance, **kwargs):
 def _video_id_key(video_url):
     return 'video_id_{0}'.format(hashlib.sha1(video_url).hexdigest())
 
-def _video_urls_key(video_id):
-    return 'widget_video_urls_{0}'.format(video_id)
-
-def _subtitles_dict_key(video_id, language_pk, version_no=None):
-    return 'widget_subtitles_{0}{1}{2}'.format(video_id, language_pk, version_no)
-
-def _subtitles_count_key(video_id):
-    return "subtitle_count_{0}".format(video_id)
-
-def _video_languages_key(video_id):
-    return "widget_video_languages_{0}".format(video_id)
-
-def _video_languages_verbose_key(video_id):
-    return "widget_video_languages_verbose_{0}".format(video_id)
-
 def _video_completed_languages(video_id):
     return "video_completed_verbose_{0}".format(video_id)
 
 def _video_writelocked_langs_key(video_id):
     return "writelocked_langs_{0}".format(video_id)
 
-def _subtitle_language_pk_key(video_id, language_code):
-    return "sl_pk_{0}{1}".format(video_id, language_code)
-
-def _video_is_moderated_key(video_id):
-    return 'widget_video_is_moderated_{0}'.format(video_id)
-
-def _video_filename_key(video_id):
-    return 'widget_video_filename_{0}'.format(video_id)
+# Keys inside the per-video CacheGroup
+def _subtitles_dict_key(language_pk, version_no=None):
+    return 'subtitles:{0}:{1}'.format(language_pk, version_no)
 
-def _video_visibility_policy_key(video_id):
-    return 'widget_video_vis_key_{0}'.format(video_id)
+def _subtitle_language_pk_key(language_code):
+    return 'sl-pk:{0}'.format(language_code)
 
 
 def pk_for_default_language(video_id, language_code):
     # the widget sends langauge code as an empty dict
     # don't ask me why
     language_code = language_code or None
-    cache_key = _subtitle_language_pk_key(video_id, language_code)
-    value = cache.get(cache_key)
+    cache_group = _video_cache_group(video_id)
+    cache_key = _subtitle_language_pk_key(language_code)
+    value = cache_group.get(cache_key)
 
     if value is None:
         from videos.models import Video
         sl = Video.objects.get(video_id=video_id).subtitle_language(
             language_code)
         value = None if sl is None else sl.pk
-        cache.set(cache_key, value, TIMEOUT)
+        cache_group.set(cache_key, value)
 
     return value
 
 def get_video_urls(video_id):
-    cache_key = _video_urls_key(video_id)
-    video_urls = cache.get(cache_key)
+    cache_group = _video_cache_group(video_id)
+    video_urls = cache_group.get('video-urls')
 
     if video_urls is None:
         from videos.models import Video
         video_urls = [vu.url for vu
                  in Video.objects.get(video_id=video_id).videourl_set.all()]
-        cache.set(cache_key, video_urls, TIMEOUT)
+        cache_group.set('video-urls', video_urls)
 
     return video_urls
 
 def get_subtitles_dict(video_id, language_pk, version_number, 
                        subtitles_dict_fn, is_remote=False):
 
-    cache_key = _subtitles_dict_key(video_id, language_pk, version_number)
-    cached_value = cache.get(cache_key)
+    cache_group = _video_cache_group(video_id)
+    cache_key = _subtitles_dict_key(language_pk, version_number)
+    cached_value = cache_group.get(cache_key)
 
     if cached_value is None:
         from videos.models import Video
@@ -209,15 +182,15 @@ def get_subtitles_dict(video_id, language_pk, version_number,
             else:
                 cached_value = None
 
-            cache.set(cache_key, cached_value, TIMEOUT)
+            cache_group.set(cache_key, cached_value)
 
     return cached_value
 
 def get_video_languages(video_id):
     from widget.rpc import language_summary
 
-    cache_key = _video_languages_key(video_id)
-    value = cache.get(cache_key)
+    cache_group = _video_cache_group(video_id)
+    value = cache_group.get('languages')
 
     if value is None:
         from videos.models import Video
@@ -230,7 +203,7 @@ def get_video_languages(video_id):
             languages = languages.filter(language_code__in=team_video.team.get_readable_langs())
 
         value = [language_summary(l) for l in languages]
-        cache.set(cache_key, value, TIMEOUT)
+        cache_group.set('languages', value)
 
     return value
 
@@ -250,8 +223,8 @@ def get_video_completed_languages(team_video_id):
 def get_video_languages_verbose(video_id, max_items=6):
     # FIXME: we should probably merge a better method with get_video_languages
     # maybe accepting a 'verbose' param?
-    cache_key = _video_languages_verbose_key(video_id)
-    data = cache.get(cache_key)
+    cache_group = _video_cache_group(video_id)
+    data = cache_group.get('languages-verbose')
 
     if data is None:
         from videos.models import Video
@@ -279,37 +252,37 @@ def get_video_languages_verbose(video_id, max_items=6):
                     'is_complete': lang.is_complete,
                     'language_url': lang.get_absolute_url(),
                 })
-        cache.set(cache_key, data, TIMEOUT)
+        cache_group.set('languages-verbose', data)
 
     return data
 
 def get_is_moderated(video_id):
-    cache_key = _video_is_moderated_key(video_id)
-    value = cache.get(cache_key)
+    cache_group = _video_cache_group(video_id)
+    value = cache_group.get('is-moderated')
 
     if value is None:
         from videos.models import Video
         video = Video.objects.get(video_id=video_id)
         value = video.is_moderated
-        cache.set(cache_key, value, TIMEOUT)
+        cache_group.set('is-moderated', value)
 
     return value
 
 def get_download_filename(video_id):
-    cache_key = _video_filename_key(video_id)
-    value = cache.get(cache_key)
+    cache_group = _video_cache_group(video_id)
+    value = cache_group.get('filename')
 
     if value is None:
         from videos.models import Video
         video = Video.objects.get(video_id=video_id)
         value = video.get_download_filename()
-        cache.set(cache_key, value, TIMEOUT)
+        cache_group.set('filename', value)
 
     return value
 
 def get_visibility_policies(video_id):
-    cache_key = _video_visibility_policy_key(video_id)
-    value = cache.get(cache_key)
+    cache_group = _video_cache_group(video_id)
+    value = cache_group.get('visibility-policies')
 
     if value is None:
         from videos.models import Video
@@ -334,7 +307,7 @@ def get_visibility_policies(video_id):
             "team_id": team_id
         }
 
-        cache.set(cache_key, value, TIMEOUT)
+        cache_group.set('visibility-policies', value)
 
     return value
 
@@ -31,6 +31,7 @@ from django.shortcuts import (render, render, redirect,
                               get_object_or_404)
 from django.template import RequestContext
 from django.template.defaultfilters import urlize, linebreaks, force_escape
+from django.utils.cache import get_conditional_response
 from django.utils.encoding import iri_to_uri
 from django.utils.http import cookie_date
 from django.utils.translation import ugettext_lazy as _
@@ -277,10 +278,16 @@ def download_subtitles(request, format):
     if not format in babelsubs.get_available_formats():
         raise HttpResponseServerError("Format not found")
     
-    subs_text = babelsubs.to(version.get_subtitles(), format, language=version.language_code)
+    etag = version.rendered_subtitles_etag(format)
+    not_modified_response = get_conditional_response(request, etag=etag)
+    if not_modified_response is not None:
+        not_modified_response['ETag'] = etag
+        return not_modified_response
     # since this is a downlaod, we can afford not to escape tags, specially true
     # since speaker change is denoted by '>>' and that would get entirely stripped out
-    response = HttpResponse(subs_text, content_type="text/plain")
+    response = HttpResponse(version.get_rendered_subtitles(format),
+                            content_type="text/plain")
+    response['ETag'] = etag
     original_filename = '%s.%s' % (video.lang_filename(language.language_code), format)
 
     if not 'HTTP_USER_AGENT' in request.META or u'WebKit' in request.META['HTTP_USER_AGENT']:
@@ -90,7 +90,12 @@ class AmaraPlugin(object):
         MockRedis.persist = persist
 
     def pytest_runtest_teardown(self, item, nextitem):
+        from caching import cachegroup, lru
+        from utils import metrics
         self.patcher.reset_mocks()
+        cachegroup.clear_cache_pattern_memory()
+        lru.clear_all()
+        metrics.reset()
         get_redis_connection("default").flushdb()
         get_redis_connection("storage").flushdb()
 
@@ -177,6 +177,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'auth.middleware.AmaraAuthenticationMiddleware',
+    'teams.middleware.PermissionContextMiddleware',
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'openid_consumer.middleware.OpenIDMiddleware',
@@ -251,9 +252,50 @@ RQ_QUEUES = {
     }
 }
 RUN_JOBS_EAGERLY = False
+# Team notification delivery (see notifications.delivery)
+TEAM_NOTIFICATION_TIMEOUT = 10
+TEAM_NOTIFICATION_MAX_CONCURRENCY = 4
+TEAM_NOTIFICATION_RETRIES = 3
+TEAM_NOTIFICATION_RETRY_DELAY = 30
+TEAM_NOTIFICATION_THROTTLE_DELAY = 5
+TEAM_NOTIFICATION_BATCH_WINDOW = 10
+# Retrying failed subtitle syncs (see externalsites.retry)
+SYNC_RETRY_BATCH_SIZE = 200
+SYNC_RETRY_MAX_CONCURRENCY = 4
+SYNC_RETRY_SLOT_TIMEOUT = 60 * 30
+SYNC_RETRY_BACKOFF = 60
+SYNC_RETRY_CIRCUIT_THRESHOLD = 6
+SYNC_RETRY_CIRCUIT_OPEN_TIME = 60 * 60 * 2
 
 # feedworker management command setup
 FEEDWORKER_PASS_DURATION=3600
+# Poll interval range for video feeds (see VideoFeed.schedule_next_update())
+FEEDWORKER_MIN_INTERVAL = FEEDWORKER_PASS_DURATION
+FEEDWORKER_MAX_INTERVAL = 60 * 60 * 24 * 7
+
+# Cache pattern key sets are synced with redis this often, and keys that
+# haven't been used for CACHE_PATTERN_KEY_MAX_AGE are dropped (see
+# caching.cachegroup)
+CACHE_PATTERN_SYNC_INTERVAL = 60
+CACHE_PATTERN_KEY_MAX_AGE = 60 * 60 * 24
+# subtitle caching (see subtitles.cache)
+PARSED_SUBTITLES_LRU_SIZE = 200
+# How long to cache verified API credentials (see auth.apikeycache).  The
+# process-local cache can't be invalidated from other processes, so keep its
+# timeout short.
+API_AUTH_CACHE_TIMEOUT = 60 * 5
+API_AUTH_LOCAL_CACHE_TIMEOUT = 15
+API_AUTH_LRU_SIZE = 1000
+PRERENDER_SUBTITLES_ON_PUBLISH = False
+# codec for SubtitleVersion.serialized_subtitles (see utils.compress)
+SUBTITLE_STORAGE_CODEC = 'zlib-dfxp-1'
+# video search backend: 'database' or 'inverted-index' (see search.index).
+# Before switching to 'inverted-index', build the index for the existing
+# videos with "manage.py index_videos --inverted-index".
+SEARCH_BACKEND = 'database'
+# seconds to wait before running video_changed_tasks, so that calls for the
+# same video can be merged together
+VIDEO_CHANGED_TASKS_COALESCE_DELAY = 10
 
 REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': (
@@ -384,6 +426,11 @@ GOOGLE_CLIENT_SECRET = None
 GOOGLE_API_KEY = None
 GOOGLE_SERVICE_ACCOUNT = None
 GOOGLE_SERVICE_ACCOUNT_SECRET = None
+# How long to reuse an OAuth access token.  Google's tokens are valid for 1
+# hour, so this leaves a margin for clock skew and long-running requests.
+GOOGLE_ACCESS_TOKEN_TIMEOUT = 60 * 50
+# How long a worker can hold the lock while it refreshes an access token
+GOOGLE_ACCESS_TOKEN_LOCK_TIMEOUT = 30
 
 try:
     from commit import LAST_COMMIT_GUID
@@ -16,22 +16,178 @@
 # You should have received a copy of the GNU Affero General Public License along
 # with this program.  If not, see http://www.gnu.org/licenses/agpl-3.0.html.
 
-"""Django-ORM-friendly data compression."""
+"""Django-ORM-friendly data compression.
+
+Compressed data is a binary string that starts with a header byte that
+identifies the codec used to create it.  This lets us switch codecs without
+re-encoding all existing data at once.
+
+Data created before we had codecs is base64-encoded zlib data, with no
+header.  We can recognize it because base64 data never contains any of the
+header bytes.
+"""
 
 import base64, zlib
 
-def compress(data):
+class Codec(object):
+    """Compress/decompress data
+
+    Attributes:
+        name: name of the codec, used to select it in compress()
+        header: header byte for the codec.  This must never change once data
+            has been stored with the codec.
+    """
+    name = NotImplemented
+    header = NotImplemented
+
+    def encode(self, data):
+        raise NotImplementedError()
+
+    def decode(self, data):
+        raise NotImplementedError()
+
+class ZlibCodec(Codec):
+    name = 'zlib'
+    header = '\x01'
+
+    def encode(self, data):
+        return zlib.compress(data, 9)
+
+    def decode(self, data):
+        return zlib.decompress(data)
+
+class ZlibDictionaryCodec(Codec):
+    """zlib with a preset dictionary
+
+    Python 2's zlib module doesn't support preset dictionaries, so we emulate
+    them.  We compress the dictionary, then do a sync flush so that the
+    compressed data ends on a byte boundary.  That prefix is dropped from the
+    encoded data.  When decoding, we first feed our own compressed copy of the
+    dictionary to the decompressor, then decode the data.
+
+    The compressor and decompressor are primed once, then copied for each
+    call.
+    """
+    def __init__(self, name, header, dictionary):
+        self.name = name
+        self.header = header
+        self.dictionary = dictionary
+        self._compressor = zlib.compressobj(9)
+        prefix = (self._compressor.compress(dictionary) +
+                  self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self._decompressor = zlib.decompressobj()
+        self._decompressor.decompress(prefix)
+
+    def encode(self, data):
+        compressor = self._compressor.copy()
+        return compressor.compress(data) + compressor.flush()
+
+    def decode(self, data):
+        decompressor = self._decompressor.copy()
+        return decompressor.decompress(data) + decompressor.flush()
+
+# Preset dictionary for DFXP data, based on the documents that babelsubs
+# generates.  Later strings get shorter back-references, so the most common
+# strings go last.
+#
+# Don't ever change this.  If you want to improve it, create a new codec with
+# a new header byte.
+DFXP_DICTIONARY_1 = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<tt xmlns="http://www.w3.org/ns/ttml" '
+    'xmlns:tts="http://www.w3.org/ns/ttml#styling" '
+    'xmlns:ttm="http://www.w3.org/ns/ttml#metadata" '
+    'xmlns:ttp="http://www.w3.org/ns/ttml#parameter" '
+    'ttp:profile="http://www.w3.org/ns/ttml/profile/dfxp" '
+    'ttp:timeBase="media" xml:lang="en">\n'
+    '  <head>\n'
+    '    <metadata xmlns:ttm="http://www.w3.org/ns/ttml#metadata">\n'
+    '      <ttm:title></ttm:title>\n'
+    '      <ttm:title/>\n'
+    '      <ttm:description></ttm:description>\n'
+    '      <ttm:description/>\n'
+    '      <ttm:copyright/>\n'
+    '    </metadata>\n'
+    '    <styling xmlns:tts="http://www.w3.org/ns/ttml#styling">\n'
+    '      <style xml:id="amara-style" tts:color="white" '
+    'tts:fontFamily="proportionalSansSerif" tts:fontSize="18px" '
+    'tts:backgroundColor="transparent" tts:textOutline="black 1px 0px" '
+    'tts:textAlign="center"/>\n'
+    '    </styling>\n'
+    '    <layout xmlns:tts="http://www.w3.org/ns/ttml#styling">\n'
+    '      <region xml:id="bottom" style="amara-style" tts:extent="100% 20%" '
+    'tts:origin="0% 80%"/>\n'
+    '      <region xml:id="top" style="amara-style" tts:extent="100% 20%" '
+    'tts:origin="0% 0%"/>\n'
+    '    </layout>\n'
+    '  </head>\n'
+    '  <body region="bottom">\n'
+    '    <div>\n'
+    '      <p begin="99:59:59.999" end="99:59:59.999"></p>\n'
+    '    </div>\n'
+    '  </body>\n'
+    '</tt>\n'
+    '<span tts:textDecoration="underline"></span>'
+    '<span tts:fontWeight="bold"></span>'
+    '<span tts:fontStyle="italic"></span>'
+    '<br/>\n'
+    '    </div>\n'
+    '    <div>\n'
+    '      <p begin="00:00:00.000" end="00:00:00.000" region="top">'
+    '</p>\n'
+    '      <p begin="00:00:00.000" end="00:00:00.000">'
+    '</p>\n'
+    '      <p begin="00:00:00.000" end="00:00:00.000">'
+)
+
+CODECS = [
+    ZlibCodec(),
+    ZlibDictionaryCodec('zlib-dfxp-1', '\x02', DFXP_DICTIONARY_1),
+]
+_codecs_by_name = dict((codec.name, codec) for codec in CODECS)
+_codecs_by_header = dict((codec.header, codec) for codec in CODECS)
+
+DEFAULT_CODEC = 'zlib'
+LEGACY = 'legacy'
+
+def to_bytes(data):
+    # Binary DB columns can return buffer/memoryview objects and legacy text
+    # columns return unicode.  Convert everything to a bytestring.
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    elif isinstance(data, buffer):
+        return str(data)
+    elif isinstance(data, unicode):
+        return data.encode('ascii')
+    return data
+
+def compress(data, codec=DEFAULT_CODEC):
     """Compress a bytestring and return it in a form Django can store.
 
     If you want to store a Unicode string, you need to encode it to a bytestring
     yourself!
 
-    Django prefers to receive Unicode strings to store in a text field, which
-    will mangle normal zip data.  We base64 it to avoid the problem.
-
+    Args:
+        data: bytestring to compress
+        codec: name of the codec to use
     """
-    return base64.encodestring(zlib.compress(data))
+    codec = _codecs_by_name[codec]
+    return codec.header + codec.encode(data)
 
 def decompress(data):
     """Decompress data created with compress."""
-    return zlib.decompress(base64.decodestring(data))
+    data = to_bytes(data)
+    codec = _codecs_by_header.get(data[:1])
+    if codec is None:
+        return zlib.decompress(base64.decodestring(data))
+    return codec.decode(data[1:])
+
+def get_codec_name(data):
+    """Get the name of the codec used to compress data
+
+    Returns the codec name, or LEGACY for data stored before we had codecs.
+    """
+    codec = _codecs_by_header.get(to_bytes(data)[:1])
+    if codec is None:
+        return LEGACY
+    return codec.name
@@ -0,0 +1,71 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+extsort -- Sort iterables that are too big to fit in memory
+
+external_sort() reads the items in chunks, sorts each chunk and writes it to
+a temp file, then merges the sorted chunks together.  Items must be
+picklable.
+"""
+
+import cPickle as pickle
+import heapq
+import itertools
+import tempfile
+
+def external_sort(iterable, key, chunk_size=10000):
+    """Sort an iterable, keeping at most chunk_size items in memory
+
+    The sort is stable, like sorted().
+
+    Returns:
+        iterator that yields the sorted items
+    """
+    chunk_files = []
+    counter = itertools.count()
+    try:
+        iterator = iter(iterable)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            # Add a sequence number so that the sort is stable across chunks
+            # and we never need to compare the items themselves.
+            chunk = [(key(item), next(counter), item) for item in chunk]
+            chunk.sort()
+            chunk_files.append(_write_chunk(chunk))
+        for decorated in heapq.merge(*[_read_chunk(f) for f in chunk_files]):
+            yield decorated[2]
+    finally:
+        for f in chunk_files:
+            f.close()
+
+def _write_chunk(chunk):
+    f = tempfile.TemporaryFile()
+    for item in chunk:
+        pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+    f.seek(0)
+    return f
+
+def _read_chunk(f):
+    while True:
+        try:
+            yield pickle.load(f)
+        except EOFError:
+            return
@@ -0,0 +1,77 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+metrics -- Track counters and timings
+
+Like utils.requestdata, this module is a thin wrapper around newrelic so that
+it's easy to change things if we ever switch away from it.  We also keep
+process-local totals for the counters, which can be inspected by the
+unittests and the staff debugging views.
+
+Metric names are dotted strings, for example
+"subtitles.parsed-cache.local-hit".
+"""
+
+import collections
+import contextlib
+import time
+
+import newrelic.agent
+
+_counters = collections.Counter()
+
+def _newrelic_name(name):
+    return 'Custom/{}'.format(name.replace('.', '/'))
+
+def increment(name, amount=1):
+    """Increment a counter."""
+    _counters[name] += amount
+    newrelic.agent.record_custom_metric(_newrelic_name(name), amount)
+
+def record(name, value):
+    """Record a value, for example a latency or a queue size."""
+    newrelic.agent.record_custom_metric(_newrelic_name(name), value)
+
+@contextlib.contextmanager
+def timer(name):
+    """Record how long a block of code takes to run, in seconds."""
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        record(name, time.time() - start_time)
+
+def get_count(name):
+    """Get the process-local total for a counter."""
+    return _counters[name]
+
+def get_counts(prefix):
+    """Get all process-local counters that start with prefix
+
+    Returns:
+        dict mapping the counter names, with the prefix removed, to their
+        totals.
+    """
+    return dict((name[len(prefix):], value)
+                for name, value in _counters.items()
+                if name.startswith(prefix))
+
+def reset():
+    """Reset all process-local counters."""
+    _counters.clear()
@@ -0,0 +1,94 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""
+semaphore -- Limit how many jobs run at once across processes
+
+A Semaphore tracks its slots in a redis sorted set.  Each slot gets a random
+token, scored by the time when it expires.  Expired slots are dropped before
+we count the slots in use, so a slot leaked by a worker that died is only
+lost until its timeout passes.  A late release() after the slot expired
+just removes nothing, so the count can never go negative.
+
+Usage::
+
+    semaphore = Semaphore('my-jobs', limit=4, timeout=60)
+    token = semaphore.acquire()
+    if token is None:
+        # try again later
+        return
+    try:
+        do_work()
+    finally:
+        semaphore.release(token)
+"""
+
+from __future__ import absolute_import
+import time
+import uuid
+
+from django_redis import get_redis_connection
+
+class Semaphore(object):
+    """Redis-based counting semaphore
+
+    Args:
+        name: name of the semaphore.  Semaphores with the same name share
+            their slots.
+        limit: max number of slots that can be acquired at once
+        timeout: seconds until an acquired slot expires if it's not
+            released.  This should be longer than the work that the slot
+            protects ever takes.
+    """
+    def __init__(self, name, limit, timeout):
+        self.key = 'semaphore:{}'.format(name)
+        self.limit = limit
+        self.timeout = timeout
+
+    @property
+    def redis(self):
+        return get_redis_connection('storage')
+
+    def acquire(self):
+        """Try to acquire a slot
+
+        Returns:
+            token to pass to release(), or None if all slots are in use
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self.key, 0, now)
+        pipe.zadd(self.key, now + self.timeout, token)
+        pipe.zcard(self.key)
+        pipe.expire(self.key, int(self.timeout) + 1)
+        count = pipe.execute()[2]
+        if count > self.limit:
+            self.redis.zrem(self.key, token)
+            return None
+        return token
+
+    def release(self, token):
+        self.redis.zrem(self.key, token)
+
+    def count(self):
+        """Get the number of slots in use."""
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self.key, 0, time.time())
+        pipe.zcard(self.key)
+        return pipe.execute()[1]
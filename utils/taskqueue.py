@@ -3,25 +3,66 @@ utils.taskqueue -- Code to handle tasks
 
 This module wraps the django_rq API.  We use this rather than django_rq
 directly to simplify the process of switching to another task framework.
+
+Coalescing jobs
+---------------
+
+Some jobs get scheduled many times in a row for the same object, for
+example video_changed_tasks during a bulk upload.  Pass a coalesce_key
+function to @job to merge those calls together.  The first delay() call for
+a key schedules the job to run after coalesce_delay seconds.  Calls with the
+same key that happen before it runs get added to the pending job rather than
+creating new ones.  When the job runs, coalesce_merge is called with the list
+of (args, kwargs) tuples for all pending calls and returns the (args, kwargs)
+to run the function with once.
+
+The pending calls are stored in redis as JSON, so the arguments for
+coalesced jobs must be JSON-serializable.  The pending calls expire
+COALESCE_TTL_MARGIN seconds after the job should have run, so if the job
+gets lost, later calls schedule a new one instead of waiting for it.
 """
 
 from datetime import timedelta
+import importlib
+import json
 
 from django.conf import settings
+from django_redis import get_redis_connection
 
 import rq
 import django_rq
 
-def job(func=None, queue='default', timeout=None):
+from utils import metrics
+
+# maps "module.function" names to (func, merge) for coalesced jobs
+_coalesced_jobs = {}
+# How long after coalesce_delay we keep the pending calls for a coalesced job.
+# If the job hasn't run by then, we assume it was lost.
+COALESCE_TTL_MARGIN = 10 * 60
+
+def job(func=None, queue='default', timeout=None, coalesce_key=None,
+        coalesce_delay=0, coalesce_merge=None):
     """
     Decorator to allow a function to be run as a job in the worker process
 
     This works like the celery @task decorator, and the rq @job decorator.
+
+    Args:
+        coalesce_key: function that takes the job arguments and returns a
+            key.  delay() calls with the same key are merged into a single
+            job (see the module docstring).
+        coalesce_delay: seconds to wait before running a coalesced job.
+        coalesce_merge: function that merges the pending calls.  The default
+            runs the job with the arguments of the last call.
     """
     def wrapper(func):
         def delay(*args, **kwargs):
             if settings.RUN_JOBS_EAGERLY:
                 return func(*args, **kwargs)
+            if coalesce_key is not None:
+                return _delay_coalesced(func, queue, timeout, coalesce_delay,
+                                        coalesce_key(*args, **kwargs),
+                                        args, kwargs)
             rq_job = django_rq.get_queue(queue).enqueue(
                 func, timeout=timeout, args=args, kwargs=kwargs)
             return Job(rq_job)
@@ -35,6 +76,9 @@ def job(func=None, queue='default', timeout=None):
             return Job(rq_job)
         func.delay = delay
         func.enqueue_in = enqueue_in
+        if coalesce_key is not None:
+            _coalesced_jobs[_func_name(func)] = (
+                func, coalesce_merge or _merge_last_call)
         return func
 
     if func is None:
@@ -42,6 +86,62 @@ def job(func=None, queue='default', timeout=None):
     else:
         return wrapper(func)
 
+def _func_name(func):
+    return '{}.{}'.format(func.__module__, func.__name__)
+
+def _coalesce_keys(func_name, key):
+    prefix = 'taskqueue:coalesce:{}:{}'.format(func_name, key)
+    return prefix + ':pending', prefix + ':calls'
+
+def _merge_last_call(calls):
+    return calls[-1]
+
+def _delay_coalesced(func, queue, timeout, coalesce_delay, key, args,
+                     kwargs):
+    func_name = _func_name(func)
+    pending_key, calls_key = _coalesce_keys(func_name, key)
+    redis = get_redis_connection('storage')
+    # Both keys expire in case the job gets lost somehow
+    ttl = coalesce_delay + COALESCE_TTL_MARGIN
+    pipe = redis.pipeline()
+    pipe.rpush(calls_key, json.dumps([args, kwargs]))
+    pipe.expire(calls_key, ttl)
+    pipe.set(pending_key, 1, nx=True, ex=ttl)
+    scheduled = pipe.execute()[2]
+    if not scheduled:
+        metrics.increment('taskqueue.coalesced.{}'.format(func_name))
+        return None
+    job_args = (func_name, key)
+    if coalesce_delay:
+        scheduler = django_rq.get_scheduler(queue)
+        rq_job = scheduler.enqueue_in(timedelta(seconds=coalesce_delay),
+                                      run_coalesced_job, *job_args,
+                                      timeout=timeout)
+    else:
+        rq_job = django_rq.get_queue(queue).enqueue(
+            run_coalesced_job, timeout=timeout, args=job_args)
+    return Job(rq_job)
+
+def run_coalesced_job(func_name, key):
+    """Run a coalesced job with the merged arguments of the pending calls."""
+    importlib.import_module(func_name.rsplit('.', 1)[0])
+    func, merge = _coalesced_jobs[func_name]
+    pending_key, calls_key = _coalesce_keys(func_name, key)
+    redis = get_redis_connection('storage')
+    # Fetch the calls and clear the pending key atomically.  Calls after this
+    # point will schedule a new job.
+    pipe = redis.pipeline()
+    pipe.lrange(calls_key, 0, -1)
+    pipe.delete(calls_key)
+    pipe.delete(pending_key)
+    calls = [tuple(json.loads(call)) for call in pipe.execute()[0]]
+    if not calls:
+        return
+    metrics.record('taskqueue.coalesce-size.{}'.format(func_name),
+                   len(calls))
+    args, kwargs = merge(calls)
+    return func(*args, **kwargs)
+
 class Job(object):
     """
     Encapsulates a job in the task queue
@@ -21,6 +21,7 @@
 from __future__ import absolute_import
 
 from .api import *
+from .httpserver import *
 from .monkeypatch import *
 from .requests import *
 from .tools import *
@@ -0,0 +1,105 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+"""utils.test_utils.httpserver
+
+Local HTTP server to test code that makes real HTTP requests.
+"""
+from __future__ import absolute_import
+import BaseHTTPServer
+import collections
+import SocketServer
+import threading
+import time
+
+__all__ = ['StubHTTPServer', 'StubRequest', 'unused_url']
+
+StubRequest = collections.namedtuple('StubRequest', 'method path headers body')
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+class StubHTTPServer(object):
+    """Run an HTTP server on localhost that records requests
+
+    Set the attributes to control the responses.
+
+    Example:
+
+    with StubHTTPServer() as server:
+        server.status_code = 500
+        function_to_test(server.url)
+    assert_equal(server.requests[0].body, 'foo')
+
+    Attributes:
+        url: URL of the server
+        requests: list of StubRequest objects for each request received
+        status_code: status code to respond with
+        response_headers: dict of headers to respond with
+        delay: seconds to wait before responding
+    """
+    def __init__(self):
+        self.requests = []
+        self.status_code = 200
+        self.response_headers = {}
+        self.delay = 0
+
+    def __enter__(self):
+        self.httpd = _ThreadingHTTPServer(('127.0.0.1', 0),
+                                          self._make_handler_class())
+        self.url = 'http://127.0.0.1:{}/'.format(self.httpd.server_port)
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def _make_handler_class(self):
+        server = self
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def handle_request(self):
+                length = int(self.headers.get('content-length', 0))
+                body = self.rfile.read(length) if length else ''
+                server.requests.append(StubRequest(
+                    self.command, self.path, dict(self.headers), body))
+                if server.delay:
+                    time.sleep(server.delay)
+                self.send_response(server.status_code)
+                for name, value in server.response_headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+            def log_message(self, format, *args):
+                pass
+        return Handler
+
+def unused_url():
+    """Get a localhost URL that refuses connections."""
+    httpd = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                      BaseHTTPServer.BaseHTTPRequestHandler)
+    port = httpd.server_port
+    httpd.server_close()
+    return 'http://127.0.0.1:{}/'.format(port)
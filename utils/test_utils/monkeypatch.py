@@ -126,10 +126,12 @@ release_lock = mock.Mock(
 invalidate_widget_video_cache = mock.Mock()
 update_subtitles = mock.Mock()
 delete_subtitles = mock.Mock()
+update_video_subtitles = mock.Mock()
 update_all_subtitles = mock.Mock()
 fetch_subs_task = mock.Mock()
 import_videos_from_feed = mock.Mock()
 notifications_do_http_post = mock.Mock()
+notifications_do_batched_http_post = mock.Mock()
 
 class MonkeyPatcher(object):
     """Replace a functions with mock objects for the tests.
@@ -157,10 +159,14 @@ class MonkeyPatcher(object):
          invalidate_widget_video_cache),
         ('externalsites.tasks.update_subtitles', update_subtitles),
         ('externalsites.tasks.delete_subtitles', delete_subtitles),
+        ('externalsites.tasks.update_video_subtitles',
+         update_video_subtitles),
         ('externalsites.tasks.update_all_subtitles', update_all_subtitles),
         ('externalsites.tasks.fetch_subs', fetch_subs_task),
         ('videos.tasks.import_videos_from_feed', import_videos_from_feed),
         ('notifications.handlers.do_http_post', notifications_do_http_post),
+        ('notifications.handlers.do_batched_http_post',
+         notifications_do_batched_http_post),
     ]
     @classmethod
     def register_patch(cls, spec, mock_obj):
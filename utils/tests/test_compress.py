@@ -19,10 +19,13 @@
 
 from string import printable as chars
 from random import randint, choice
+import base64
+import zlib
 
 from django.test import TestCase
 
-from utils.compress import compress, decompress
+from utils.compress import (compress, decompress, get_codec_name,
+                            CODECS, DFXP_DICTIONARY_1, LEGACY)
 
 class CompressTest(TestCase):
     def test_compression(self):
@@ -53,3 +56,54 @@ class CompressTest(TestCase):
             round_tripped = decompress(compress(encoded_data)).decode('utf-8')
 
             self.assertEqual(data, round_tripped)
+
+    def test_codecs(self):
+        data = DFXP_DICTIONARY_1 + 'extra data'
+        for codec in CODECS:
+            compressed = compress(data, codec=codec.name)
+            self.assertEqual(get_codec_name(compressed), codec.name)
+            self.assertEqual(decompress(compressed), data)
+            # binary fields can return buffer objects
+            self.assertEqual(decompress(buffer(compressed)), data)
+
+    def test_legacy_data(self):
+        data = 'legacy data'
+        compressed = base64.encodestring(zlib.compress(data))
+        self.assertEqual(get_codec_name(compressed), LEGACY)
+        self.assertEqual(decompress(compressed), data)
+        self.assertEqual(decompress(unicode(compressed)), data)
+
+    def test_dfxp_dictionary(self):
+        # A small document, like the ones babelsubs generates.  It shares
+        # structure with the dictionary, but not the content.
+        data = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<tt xmlns="http://www.w3.org/ns/ttml" '
+            'xmlns:tts="http://www.w3.org/ns/ttml#styling" '
+            'xmlns:ttm="http://www.w3.org/ns/ttml#metadata" '
+            'xmlns:ttp="http://www.w3.org/ns/ttml#parameter" '
+            'ttp:profile="http://www.w3.org/ns/ttml/profile/dfxp" '
+            'ttp:timeBase="media" xml:lang="fr">\n'
+            '  <head>\n'
+            '    <metadata xmlns:ttm="http://www.w3.org/ns/ttml#metadata">\n'
+            '      <ttm:title>Une petite vid\xc3\xa9o</ttm:title>\n'
+            '      <ttm:description/>\n'
+            '      <ttm:copyright/>\n'
+            '    </metadata>\n'
+            '  </head>\n'
+            '  <body region="bottom">\n'
+            '    <div>\n'
+            '      <p begin="00:00:01.250" end="00:00:03.900">Bonjour '
+            '<span tts:fontStyle="italic">tout le monde</span></p>\n'
+            '      <p begin="00:00:04.100" end="00:00:07.020">Aujourd\'hui, '
+            'on parle de sous-titres.</p>\n'
+            '      <p begin="00:00:07.500" end="00:00:09.875">C\'est '
+            'parti !<br/>Allons-y.</p>\n'
+            '    </div>\n'
+            '  </body>\n'
+            '</tt>\n'
+        )
+        self.assertNotIn(data, DFXP_DICTIONARY_1)
+        compressed = compress(data, codec='zlib-dfxp-1')
+        self.assertEqual(decompress(compressed), data)
+        self.assertLess(len(compressed), len(compress(data, codec='zlib')))
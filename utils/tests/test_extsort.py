@@ -0,0 +1,38 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from django.test import TestCase
+from nose.tools import *
+
+from utils.extsort import external_sort
+
+class ExternalSortTest(TestCase):
+    def test_sort(self):
+        items = [(i * 7) % 23 for i in range(50)]
+        assert_equal(list(external_sort(items, key=lambda i: i,
+                                        chunk_size=6)),
+                     sorted(items))
+
+    def test_stable(self):
+        items = [('b', 1), ('a', 2), ('b', 3), ('a', 4), ('c', 5), ('a', 6)]
+        assert_equal(list(external_sort(items, key=lambda i: i[0],
+                                        chunk_size=2)),
+                     sorted(items, key=lambda i: i[0]))
+
+    def test_empty(self):
+        assert_equal(list(external_sort([], key=lambda i: i)), [])
@@ -0,0 +1,60 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+import time
+
+from django.test import TestCase
+from nose.tools import *
+import mock
+
+from utils.semaphore import Semaphore
+
+def time_after(seconds):
+    return time.time() + seconds
+
+class SemaphoreTest(TestCase):
+    def setUp(self):
+        self.semaphore = Semaphore('test', limit=2, timeout=60)
+
+    def test_limit(self):
+        token1 = self.semaphore.acquire()
+        token2 = self.semaphore.acquire()
+        assert_not_equal(token1, None)
+        assert_not_equal(token2, None)
+        assert_equal(self.semaphore.acquire(), None)
+        assert_equal(self.semaphore.count(), 2)
+        self.semaphore.release(token1)
+        assert_not_equal(self.semaphore.acquire(), None)
+
+    def test_leaked_slots_expire(self):
+        self.semaphore.acquire()
+        self.semaphore.acquire()
+        with mock.patch('time.time', return_value=time_after(61)):
+            assert_equal(self.semaphore.count(), 0)
+            assert_not_equal(self.semaphore.acquire(), None)
+
+    def test_release_after_expire(self):
+        # Releasing an expired slot shouldn't free up another slot
+        token = self.semaphore.acquire()
+        with mock.patch('time.time', return_value=time_after(61)):
+            self.semaphore.acquire()
+            self.semaphore.acquire()
+            self.semaphore.release(token)
+            assert_equal(self.semaphore.count(), 2)
+            assert_equal(self.semaphore.acquire(), None)
@@ -0,0 +1,98 @@
+# Amara, universalsubtitles.org
+#
+# Copyright (C) 2018 Participatory Culture Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see
+# http://www.gnu.org/licenses/agpl-3.0.html.
+
+from __future__ import absolute_import
+
+from django.test import TestCase
+from django_redis import get_redis_connection
+from django.test.utils import override_settings
+from nose.tools import *
+import mock
+
+from utils import metrics
+from utils.taskqueue import job, _coalesce_keys, COALESCE_TTL_MARGIN
+
+job_calls = []
+
+def merge_calls(calls):
+    values = []
+    for args, kwargs in calls:
+        values.extend(kwargs['values'])
+    return (calls[0][0][0],), {'values': values}
+
+@job(coalesce_key=lambda item_id, values: item_id,
+     coalesce_merge=merge_calls)
+def coalesced_job(item_id, values):
+    job_calls.append((item_id, values))
+
+@job(timeout=120, coalesce_key=lambda item_id: item_id, coalesce_delay=10)
+def delayed_coalesced_job(item_id):
+    job_calls.append(item_id)
+
+@override_settings(RUN_JOBS_EAGERLY=False)
+class CoalesceTest(TestCase):
+    def setUp(self):
+        del job_calls[:]
+        self.queue = mock.Mock()
+        patcher = mock.patch('django_rq.get_queue', return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_enqueued_jobs(self):
+        for call in self.queue.enqueue.call_args_list:
+            func = call[0][0]
+            func(*call[1]['args'])
+        self.queue.enqueue.reset_mock()
+
+    def test_coalesce(self):
+        coalesced_job.delay(1, values=['a'])
+        coalesced_job.delay(1, values=['b'])
+        coalesced_job.delay(2, values=['c'])
+        coalesced_job.delay(1, values=['d'])
+        assert_equal(self.queue.enqueue.call_count, 2)
+        assert_equal(metrics.get_count(
+            'taskqueue.coalesced.utils.tests.test_taskqueue.coalesced_job'),
+            2)
+        self.run_enqueued_jobs()
+        assert_items_equal(job_calls, [
+            (1, ['a', 'b', 'd']),
+            (2, ['c']),
+        ])
+
+    def test_calls_after_run_schedule_a_new_job(self):
+        coalesced_job.delay(1, values=['a'])
+        self.run_enqueued_jobs()
+        coalesced_job.delay(1, values=['b'])
+        assert_equal(self.queue.enqueue.call_count, 1)
+        self.run_enqueued_jobs()
+        assert_equal(job_calls, [(1, ['a']), (1, ['b'])])
+
+    def test_pending_calls_expire(self):
+        coalesced_job.delay(1, values=['a'])
+        pending_key, calls_key = _coalesce_keys(
+            'utils.tests.test_taskqueue.coalesced_job', 1)
+        redis = get_redis_connection('storage')
+        for key in (pending_key, calls_key):
+            assert_true(0 < redis.ttl(key) <= COALESCE_TTL_MARGIN)
+
+    @mock.patch('django_rq.get_scheduler')
+    def test_delayed_job_timeout(self, mock_get_scheduler):
+        delayed_coalesced_job.delay(1)
+        scheduler = mock_get_scheduler.return_value
+        assert_equal(scheduler.enqueue_in.call_count, 1)
+        assert_equal(scheduler.enqueue_in.call_args[1]['timeout'], 120)